@@ -0,0 +1,267 @@
+"""
+Address Recognizer
+Finds US street addresses and PO Boxes in text and splits them into
+components (number, street, suffix, unit, city, state, ZIP).
+
+Text is split into word tokens once and read left to right. Street
+suffixes ("St", "Avenue", "Blvd", ...) are looked up in a character
+trie built when the module loads, so a suffix only counts as a whole
+word that follows a house number and a street name - unlike checking
+whether 'st' or 'dr' appears anywhere in the text.
+
+Patterns follow reference/extraction_patterns.md.
+"""
+
+import re
+
+# Street suffixes and their standard abbreviations
+STREET_SUFFIXES = {
+    'street': 'St', 'st': 'St', 'avenue': 'Ave', 'ave': 'Ave', 'av': 'Ave',
+    'road': 'Rd', 'rd': 'Rd', 'boulevard': 'Blvd', 'blvd': 'Blvd',
+    'drive': 'Dr', 'dr': 'Dr', 'lane': 'Ln', 'ln': 'Ln', 'way': 'Way',
+    'court': 'Ct', 'ct': 'Ct', 'circle': 'Cir', 'cir': 'Cir',
+    'place': 'Pl', 'pl': 'Pl', 'parkway': 'Pkwy', 'pkwy': 'Pkwy',
+    'highway': 'Hwy', 'hwy': 'Hwy', 'trail': 'Trl', 'trl': 'Trl',
+    'terrace': 'Ter', 'ter': 'Ter', 'square': 'Sq', 'sq': 'Sq',
+    'plaza': 'Plz', 'plz': 'Plz', 'loop': 'Loop', 'pike': 'Pike',
+    'freeway': 'Fwy', 'fwy': 'Fwy', 'expressway': 'Expy', 'expy': 'Expy',
+    'center': 'Ctr', 'ctr': 'Ctr', 'alley': 'Aly', 'run': 'Run',
+    'crossing': 'Xing', 'xing': 'Xing', 'path': 'Path', 'row': 'Row',
+    'turnpike': 'Tpke', 'tpke': 'Tpke'
+}
+
+UNIT_WORDS = {'suite', 'ste', 'unit', 'apt', 'apartment', 'room', 'rm',
+              'bldg', 'building', 'floor', 'fl', '#'}
+
+DIRECTIONS = {'n', 's', 'e', 'w', 'ne', 'nw', 'se', 'sw',
+              'north', 'south', 'east', 'west'}
+
+STATE_CODES = {
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI',
+    'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN',
+    'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH',
+    'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA',
+    'WV', 'WI', 'WY', 'PR', 'GU', 'VI', 'AS', 'MP'
+}
+
+STATE_NAMES = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR',
+    'california': 'CA', 'colorado': 'CO', 'connecticut': 'CT',
+    'delaware': 'DE', 'district of columbia': 'DC', 'florida': 'FL',
+    'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL',
+    'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS', 'kentucky': 'KY',
+    'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
+    'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN',
+    'mississippi': 'MS', 'missouri': 'MO', 'montana': 'MT',
+    'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH',
+    'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
+    'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH',
+    'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA',
+    'rhode island': 'RI', 'south carolina': 'SC', 'south dakota': 'SD',
+    'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT',
+    'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV',
+    'wisconsin': 'WI', 'wyoming': 'WY', 'puerto rico': 'PR', 'guam': 'GU'
+}
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9'.#/-]*|#|,")
+HOUSE_NUMBER = re.compile(r'^\d{1,6}[A-Za-z]?$|^\d{1,6}-\d{1,6}$')
+ZIP_CODE = re.compile(r'^\d{5}(?:-\d{4})?$')
+
+# Lowercase words allowed inside a street name ("Alameda de las Pulgas")
+NAME_PARTICLES = {'de', 'del', 'la', 'las', 'los', 'el', 'of', 'the', 'van', 'von'}
+
+MAX_STREET_WORDS = 5
+MAX_CITY_WORDS = 4
+
+
+def build_trie(words):
+    """Build a character trie; the '$' key marks the end of a word"""
+    trie = {}
+    for word, canonical in words.items():
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node['$'] = canonical
+    return trie
+
+
+SUFFIX_TRIE = build_trie(STREET_SUFFIXES)
+
+
+def lookup_suffix(word):
+    """Return the standard suffix for a word, or None"""
+    node = SUFFIX_TRIE
+    for char in word:
+        node = node.get(char)
+        if node is None:
+            return None
+    return node.get('$')
+
+
+def is_name_word(token):
+    """Street name words are capitalized, short numbers, or ordinals (5th)"""
+    if token.isdigit():
+        return len(token) <= 3
+    return token[0].isupper() or token[0].isdigit() or token in NAME_PARTICLES
+
+
+def clean(token):
+    """Lowercase a token and drop trailing periods ("St." -> "st")"""
+    return token.rstrip('.').lower()
+
+
+class AddressRecognizer:
+    def parse(self, text):
+        """
+        Find the first address in text and return its components
+
+        Returns a dict such as
+            {'number': '1000', 'street': 'San Leandro', 'suffix': 'Blvd',
+             'city': 'San Leandro', 'state': 'CA', 'zip': '94577'}
+        or None if the text has no street address or PO Box.
+        """
+        tokens = TOKEN_PATTERN.findall(text)
+        for i in range(len(tokens)):
+            address = self.parse_street(tokens, i) or self.parse_po_box(tokens, i)
+            if address:
+                return address
+        return None
+
+    def looks_like_address(self, text):
+        return self.parse(text) is not None
+
+    def parse_street(self, tokens, start):
+        """Number, street name words, then a suffix: '1000 San Leandro Blvd'"""
+        if not HOUSE_NUMBER.match(tokens[start]):
+            return None
+
+        # The suffix must follow at least one street name word
+        end = min(len(tokens), start + 2 + MAX_STREET_WORDS)
+        for i in range(start + 2, end):
+            if tokens[i] == ',' or not is_name_word(tokens[i - 1]):
+                break
+            suffix = lookup_suffix(clean(tokens[i]))
+            if suffix:
+                address = {
+                    'number': tokens[start],
+                    'street': " ".join(tokens[start + 1:i]),
+                    'suffix': suffix
+                }
+                position = self.parse_direction_and_unit(tokens, i + 1, address)
+                self.parse_city_state_zip(tokens, position, address)
+                return address
+
+        # "123 Main, Anytown, CA 94000" has no suffix but a full last line
+        address = {'number': tokens[start]}
+        for i in range(start + 1, end):
+            if tokens[i] == ',':
+                if i > start + 1:
+                    address['street'] = " ".join(tokens[start + 1:i])
+                    position = self.parse_direction_and_unit(tokens, i, address)
+                    if self.parse_city_state_zip(tokens, position, address) and 'zip' in address:
+                        return address
+                break
+            if not is_name_word(tokens[i]):
+                break
+        return None
+
+    def parse_po_box(self, tokens, start):
+        """'PO Box 123', 'P.O. Box 123' or 'Post Office Box 123'"""
+        word = clean(tokens[start]).replace('.', '')
+        if word == 'po':
+            box_at = start + 1
+        elif word == 'post' and start + 1 < len(tokens) and clean(tokens[start + 1]) == 'office':
+            box_at = start + 2
+        else:
+            return None
+
+        if box_at + 1 >= len(tokens) or clean(tokens[box_at]) != 'box':
+            return None
+        if not tokens[box_at + 1].isdigit():
+            return None
+
+        address = {'po_box': tokens[box_at + 1]}
+        self.parse_city_state_zip(tokens, box_at + 2, address)
+        return address
+
+    def parse_direction_and_unit(self, tokens, position, address):
+        if position < len(tokens) and clean(tokens[position]) in DIRECTIONS:
+            address['direction'] = tokens[position].rstrip('.').upper()
+            position += 1
+
+        # Units may come after a comma: "100 Main St, Suite 200"
+        look = position + 1 if position < len(tokens) and tokens[position] == ',' else position
+        if look < len(tokens) and clean(tokens[look]) in UNIT_WORDS and look + 1 < len(tokens):
+            separator = "" if tokens[look] == '#' else " "
+            address['unit'] = f"{tokens[look]}{separator}{tokens[look + 1]}"
+            position = look + 2
+        return position
+
+    def parse_city_state_zip(self, tokens, position, address):
+        """
+        Read ', City, ST 12345' after the street line, if present
+
+        Returns True when a state was found.
+        """
+        if position < len(tokens) and tokens[position] == ',':
+            position += 1
+
+        # City words run until a comma or the state
+        end = min(len(tokens), position + MAX_CITY_WORDS + 3)
+        for i in range(position, end):
+            state, width = self.match_state(tokens, i)
+            if state and i > position:
+                city_end = i - 1 if tokens[i - 1] == ',' else i
+                address['city'] = " ".join(t for t in tokens[position:city_end] if t != ',')
+                address['state'] = state
+                after = i + width
+                if after < len(tokens) and ZIP_CODE.match(tokens[after]):
+                    address['zip'] = tokens[after]
+                return True
+            if tokens[i] == ',' and i > position and i + 1 < len(tokens):
+                # A second comma must be followed by the state
+                state, width = self.match_state(tokens, i + 1)
+                if not state:
+                    return False
+        return False
+
+    def match_state(self, tokens, i):
+        """Return (state code, tokens used) for a state at position i"""
+        token = tokens[i].rstrip('.')
+        if len(token) == 2 and token.isupper() and token in STATE_CODES:
+            return token, 1
+        for width in (3, 2, 1):
+            name = " ".join(clean(t) for t in tokens[i:i + width])
+            if name in STATE_NAMES:
+                return STATE_NAMES[name], width
+        return None, 0
+
+
+def format_address(address):
+    """Rebuild a one-line address from parsed components"""
+    if 'po_box' in address:
+        street_line = f"PO Box {address['po_box']}"
+    else:
+        parts = [address.get('number'), address.get('street'),
+                 address.get('suffix'), address.get('direction')]
+        street_line = " ".join(part for part in parts if part)
+        if address.get('unit'):
+            street_line += f", {address['unit']}"
+
+    last_line = " ".join(part for part in (address.get('state'), address.get('zip')) if part)
+    return ", ".join(part for part in (street_line, address.get('city'), last_line) if part)
+
+
+# Example usage
+if __name__ == "__main__":
+    recognizer = AddressRecognizer()
+    samples = [
+        "1000 San Leandro Blvd, San Leandro, CA 94577",
+        "Visit us at 2000 Alameda de las Pulgas, Suite 100, San Mateo, CA 94403",
+        "P.O. Box 1234, Sacramento, California 95814",
+        "Open Monday-Friday 8am-5pm. Call Dr. Smith at 555-123-4567",
+        "Services for 2024 and beyond: first-aid, street safety",
+    ]
+    for sample in samples:
+        print(sample)
+        print(f"  -> {recognizer.parse(sample)}")
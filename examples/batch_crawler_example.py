@@ -4,15 +4,77 @@ Shows how to crawl multiple health departments from state CSV files
 """
 
 import csv
+import queue
+import threading
 import time
 import json
 from datetime import datetime
-from categorized_example import CategorizedHealthCrawler
+from urllib.parse import urlparse
+from zip_gazetteer import in_community
 
 class BatchHealthCrawler:
-    def __init__(self):
-        self.crawler = CategorizedHealthCrawler()
+    def __init__(self, store=None, crawler_options=None):
+        """
+        Args:
+            store: Optional SQLiteResultStore that also receives every
+                   site's results as the crawl runs
+            crawler_options: Keyword arguments for every
+                             CategorizedHealthCrawler we create, e.g.
+                             {'template_cache': HostTemplateCache()}
+                             or {'rate_controller': AdaptiveRateController()}
+        """
+        # The page crawler (and requests/BeautifulSoup) is only loaded
+        # when we actually crawl, so reports on saved results start fast
+        self._crawler = None
         self.results = []
+        self.store = store
+        self.crawler_options = crawler_options or {}
+        self.data_dir = "../data/websites"
+        # {community_id: row} from url_health_sweep.load_sweep(), set with
+        # use_sweep(); dead URLs are skipped
+        self.sweep = None
+    
+    @property
+    def crawler(self):
+        """The page crawler used by crawl_state, created on first use"""
+        if self._crawler is None:
+            self._crawler = self.new_crawler()
+        return self._crawler
+    
+    @crawler.setter
+    def crawler(self, crawler):
+        self._crawler = crawler
+    
+    @property
+    def adaptive_rate(self):
+        """True when a rate controller sets the pace instead of a fixed delay"""
+        return self.crawler_options.get('rate_controller') is not None
+    
+    def new_crawler(self):
+        """Create a page crawler (imports requests and BeautifulSoup)"""
+        from categorized_example import CategorizedHealthCrawler
+        return CategorizedHealthCrawler(**self.crawler_options)
+    
+    def use_sweep(self, sweep):
+        """
+        Skip the dead URLs of a URL sweep and fetch moved sites at their final URL
+        
+        pha_url stays the CSV address, so results, page stores and
+        reprocessing all use the same key. The redirects go to the page
+        crawler's RedirectMap instead (an in-memory one if none was given).
+        
+        Args:
+            sweep: {community_id: row} from url_health_sweep.load_sweep()
+        
+        Returns the number of redirects added to the map.
+        """
+        from redirect_map import RedirectMap
+        self.sweep = sweep
+        if self.crawler_options.get('redirect_map') is None:
+            self.crawler_options['redirect_map'] = RedirectMap(filename=None)
+            if self._crawler is not None:
+                self._crawler.redirect_map = self.crawler_options['redirect_map']
+        return self.crawler_options['redirect_map'].seed_from_sweep(sweep.values())
     
     def load_state_websites(self, state_code):
         """
@@ -21,7 +83,7 @@ class BatchHealthCrawler:
         Args:
             state_code: Two-letter state code (e.g., 'ca', 'or', 'tx')
         """
-        filename = f"../data/websites/us-{state_code.lower()}.csv"
+        filename = f"{self.data_dir}/us-{state_code.lower()}.csv"
         websites = []
         try:
             with open(filename, 'r', newline='', encoding='utf-8') as file:
@@ -30,12 +92,18 @@ class BatchHealthCrawler:
                     # Use columns from the current CSV format
                     websites.append({
                         'name': row.get('name', 'Unknown'),
+                        'community_id': row.get('community_id', ''),
                         'pha_url': row.get('pha_url', ''),
                         'state_id': row.get('state_id', ''),
                         'category': row.get('category', ''),
                         'population': row.get('population_proper', 'Unknown')
                     })
             print(f"Loaded {len(websites)} health departments for {state_code.upper()}")
+            if self.sweep:
+                from url_health_sweep import apply_sweep
+                loaded = len(websites)
+                websites = apply_sweep(websites, self.sweep)
+                print(f"Skipping {loaded - len(websites)} dead URLs found by the sweep")
             return websites
         except FileNotFoundError:
             print(f"File not found: {filename}")
@@ -53,6 +121,21 @@ class BatchHealthCrawler:
             max_sites: Maximum number of sites to crawl (for testing)
             delay: Seconds to wait between requests
         """
+        for results in self.iter_state(state_code, max_sites, delay):
+            self.results.append(results)
+    
+    def iter_state(self, state_code, max_sites=5, delay=2):
+        """
+        Crawl a state one site at a time, yielding each site's results
+        
+        Nothing is kept in self.results, and the next site is only
+        fetched when the caller asks for it, so a slow consumer never
+        builds up a backlog.
+        
+        Example:
+            for results in batch_crawler.iter_state('ca'):
+                load_into_dashboard(results)
+        """
         print(f"\n=== Crawling {state_code.upper()} Health Departments ===")
         
         websites = self.load_state_websites(state_code)
@@ -62,34 +145,190 @@ class BatchHealthCrawler:
         # Limit for testing/demo purposes
         websites = websites[:max_sites]
         
-        for i, site in enumerate(websites, 1):
-            print(f"\n[{i}/{len(websites)}] {site['name']}")
-            print(f"Category: {site['category']}")
-            print(f"URL: {site['pha_url']}")
-            
-            # Crawl the main page
-            results = self.crawler.crawl_page_with_categories(site['pha_url'])
-            
-            # Add metadata
-            results.update({
-                'name': site['name'],
-                'category': site['category'],
-                'state_id': site['state_id'],
-                'population': site['population'],
-                'crawled_at': datetime.now().isoformat()
-            })
-            
-            # Store results
-            self.results.append(results)
-            
-            # Show quick summary
-            total_resources = len(results.get('resources', []))
-            print(f"Found {total_resources} resources")
-            
-            # Be polite - wait between requests
-            if i < len(websites):
-                print(f"Waiting {delay} seconds...")
-                time.sleep(delay)
+        run_id = self.store.start_run(state_code) if self.store else None
+        try:
+            for i, site in enumerate(websites, 1):
+                print(f"\n[{i}/{len(websites)}] {site['name']}")
+                print(f"Category: {site['category']}")
+                print(f"URL: {site['pha_url']}")
+                
+                results = self.crawl_site(self.crawler, site)
+                if self.store:
+                    self.store.add_site_result(run_id, results)
+                
+                # Show quick summary
+                total_resources = len(results.get('resources', []))
+                print(f"Found {total_resources} resources")
+                
+                yield results
+                
+                # Be polite - wait between requests
+                if i < len(websites) and not self.adaptive_rate:
+                    print(f"Waiting {delay} seconds...")
+                    time.sleep(delay)
+        finally:
+            # Also runs when the consumer stops early or a crawl raises
+            if self.store:
+                self.store.finish_run(run_id)
+                print(f"Results stored in {self.store.path} (run {run_id})")
+    
+    def iter_state_concurrent(self, state_code, max_sites=5, delay=2, workers=4, buffer_size=8):
+        """
+        Crawl a state with several worker threads, yielding results as they finish
+        
+        Args:
+            state_code: Two-letter state code
+            max_sites: Maximum number of sites to crawl
+            delay: Seconds to wait between requests to the same host
+            workers: Number of worker threads
+            buffer_size: Results allowed to wait for the consumer; workers
+                         pause when the buffer is full (backpressure)
+        
+        Results come out in the order they finish, not CSV order.
+        """
+        websites = self.load_state_websites(state_code)[:max_sites]
+        
+        # Sites on the same host are crawled by one worker, in order
+        by_host = {}
+        for site in websites:
+            by_host.setdefault(urlparse(site['pha_url']).netloc.lower(), []).append(site)
+        hosts = queue.Queue()
+        for sites in by_host.values():
+            hosts.put(sites)
+        
+        buffer = queue.Queue(maxsize=buffer_size)
+        stop = threading.Event()
+        finished = object()
+        
+        def put(item):
+            # Wait for room in the buffer, unless the consumer went away
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def worker():
+            crawler = self.new_crawler()
+            try:
+                while not stop.is_set():
+                    try:
+                        sites = hosts.get_nowait()
+                    except queue.Empty:
+                        return
+                    for i, site in enumerate(sites):
+                        if i > 0 and not self.adaptive_rate:
+                            time.sleep(delay)
+                        if not put(self.crawl_site(crawler, site)):
+                            return
+            finally:
+                put(finished)
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        
+        run_id = self.store.start_run(state_code) if self.store else None
+        try:
+            running = len(threads)
+            while running:
+                item = buffer.get()
+                if item is finished:
+                    running -= 1
+                    continue
+                if self.store:
+                    self.store.add_site_result(run_id, item)
+                yield item
+        finally:
+            # Stops the workers if the consumer breaks out early
+            stop.set()
+            if self.store:
+                self.store.finish_run(run_id)
+    
+    async def aiter_state(self, state_code, max_sites=5, delay=2, workers=4, buffer_size=8):
+        """
+        Async version of iter_state_concurrent for asyncio consumers
+        
+        Example:
+            async for results in batch_crawler.aiter_state('ca'):
+                await send_to_loader(results)
+        """
+        import asyncio
+        
+        results_iter = self.iter_state_concurrent(state_code, max_sites, delay, workers, buffer_size)
+        try:
+            while True:
+                results = await asyncio.to_thread(next, results_iter, None)
+                if results is None:
+                    break
+                yield results
+        finally:
+            results_iter.close()
+    
+    def crawl_site(self, crawler, site):
+        """
+        Crawl one site's main page and add the CSV metadata to the results
+        """
+        results = crawler.crawl_page_with_categories(site['pha_url'], site['state_id'])
+        return self.add_site_metadata(results, site)
+    
+    def add_site_metadata(self, results, site, crawled_at=None):
+        """
+        Add the CSV row's details to one page's results
+        
+        Args:
+            results: Results from the page crawler
+            site: The site dict from load_state_websites
+            crawled_at: When the page was fetched (default: now)
+        """
+        results.update({
+            'name': site['name'],
+            'community_id': site['community_id'],
+            'category': site['category'],
+            'state_id': site['state_id'],
+            'population': site['population'],
+            'crawled_at': crawled_at or datetime.now().isoformat()
+        })
+        
+        # Addresses checked against the ZIP gazetteer: are they in this county/town?
+        for resource in results.get('resources', []):
+            if resource.get('place'):
+                inside = in_community(resource['place'], site['name'], site['category'])
+                if inside is not None:
+                    resource['in_community'] = inside
+        return results
+    
+    def render_js_pages(self, renderer):
+        """
+        Re-crawl the pages flagged as JavaScript-built through a headless browser
+        
+        Run this after the normal crawl, so only the few flagged pages pay
+        for a browser. Updates self.results in place (a result store keeps
+        the first, static result).
+        
+        Args:
+            renderer: A HeadlessRenderer from js_renderer.py
+        """
+        flagged = [r for r in self.results if r.get('needs_rendering') and r.get('url')]
+        if not flagged:
+            return
+        if not renderer.available:
+            print(f"{len(flagged)} pages need JavaScript, but no headless browser was found")
+            return
+        
+        print(f"\nRendering {len(flagged)} JavaScript pages...")
+        futures = [(result, renderer.submit(self.crawler, result['url'], result.get('state_id')))
+                   for result in flagged]
+        for result, future in futures:
+            rendered = future.result()
+            if rendered is None:
+                continue
+            result['resources'] = rendered['resources']
+            result['rendered'] = True
+            del result['needs_rendering']
+            print(f"{result['name']}: {len(result['resources'])} resources after rendering")
     
     def save_results(self, filename=None):
         """
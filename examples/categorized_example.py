@@ -3,19 +3,100 @@ Categorized Health Resource Crawler
 This example shows how to extract and categorize health resources with tags.
 """
 
+import copy
 import requests
 from bs4 import BeautifulSoup
 import re
 import time
 import json
 from datetime import datetime
+from urllib.parse import urlparse
+from address_parser import AddressRecognizer
+from structured_data import anchor_contacts, is_site_wide, nodes_to_resources, structured_items
+from js_renderer import needs_rendering
+from page_encoding import decode_html
+from near_duplicates import PageFingerprint
+from area_codes import AreaCodeValidator, CONFIDENCE_FACTORS, INVALID
+from zip_gazetteer import ZipGazetteer, CONFIDENCE_FACTORS as ZIP_CONFIDENCE_FACTORS
+
+# Cheap byte-level patterns used by the prefilter before any HTML parsing
+SCRIPT_STYLE_BYTES = re.compile(rb'<(script|style)\b.*?</\1\s*>', re.I | re.S)
+TAG_BYTES = re.compile(rb'<[^>]*>')
+PHONE_BYTES = re.compile(rb'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b')
+# Facility terms specific enough to count as a signal next to an address;
+# bare 'health' or 'department' appear on nearly every city or county page
+FACILITY_BYTES = [b'clinic', b'hospital', b'medical center', b'health center',
+                  b'health department', b'public health', b'pharmacy', b'dental',
+                  b'urgent care']
+ADDRESS_BYTES = re.compile(rb'\b\d{1,6}\s+(?:[a-z0-9.]+\s+){1,4}(?:st|street|ave|avenue|rd|road|'
+                           rb'blvd|boulevard|dr|drive|ln|lane|way|ct|court|pl|place|pkwy|'
+                           rb'parkway|hwy|highway)\b|\b[a-z]{2}\s+\d{5}(?:-\d{4})?\b|p\.?\s*o\.?\s+box')
 
 class CategorizedHealthCrawler:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Educational-Health-Crawler/1.0 (Learning Purpose)'
-        })
+    # (CSS selector, context) pairs searched by each extractor
+    PHONE_CONTEXTS = [
+        ('.contact-info', 'contact information'),
+        ('.emergency', 'emergency services'),
+        ('.crisis', 'crisis services'),
+        ('.appointment', 'appointment scheduling'),
+        ('body', 'general content')
+    ]
+    
+    ADDRESS_SELECTORS = [
+        ('.address', 'facility_address'),
+        ('.location', 'service_location'), 
+        ('[itemtype*="PostalAddress"]', 'structured_address'),
+        ('address', 'html_address_tag')
+    ]
+    
+    FACILITY_SELECTORS = [
+        ('h1, h2, h3', 'heading'),
+        ('.facility-name', 'explicit_facility'),
+        ('.clinic-name', 'clinic_listing'),
+        ('.location-name', 'location_listing')
+    ]
+    
+    def __init__(self, prefilter=True, template_cache=None, rate_controller=None,
+                 connection_cache=None, page_store=None, profiler=None, redirect_map=None,
+                 near_duplicates=None, timeout=30):
+        """
+        Args:
+            prefilter: Skip the full parse on pages with no phone numbers
+                       and no address near a facility term or health keyword
+            template_cache: Optional HostTemplateCache that learns which
+                            selectors work on each host
+            rate_controller: Optional AdaptiveRateController; when set,
+                             fetch_page waits for it before each request
+            connection_cache: Optional ConnectionCache shared by crawlers
+                              to reuse DNS answers and TLS sessions
+            page_store: Optional RawPageStore that keeps every fetched
+                        page so it can be reprocessed later
+            profiler: Optional OutlierProfiler that saves a profile for
+                      pages that take unusually long to process
+            redirect_map: Optional RedirectMap; known redirects are
+                          skipped by fetching the final URL directly
+            near_duplicates: Optional NearDuplicateIndex; pages that are
+                             near-copies of an extracted page reuse its
+                             resources and only extract changed blocks
+            timeout: Seconds to wait for each page request
+        """
+        # The HTTP session is created the first time a page is fetched
+        self._session = None
+        self.prefilter = prefilter
+        self.template_cache = template_cache
+        self.rate_controller = rate_controller
+        self.connection_cache = connection_cache
+        self.page_store = page_store
+        self.profiler = profiler
+        self.redirect_map = redirect_map
+        self.near_duplicates = near_duplicates
+        self.timeout = timeout
+        # time.time() by which requests must finish; set by DeadlineCrawler
+        self.deadline = None
+        self._keyword_bytes = None
+        self.address_recognizer = AddressRecognizer()
+        self.area_codes = AreaCodeValidator()
+        self.gazetteer = ZipGazetteer()
         
         # Define health topic keywords for auto-tagging
         self.health_keywords = {
@@ -32,18 +113,124 @@ class CategorizedHealthCrawler:
             'opioid_treatment': ['opioid', 'methadone', 'suboxone', 'narcan']
         }
     
-    def get_page(self, url):
-        """Fetch a web page and return the soup object"""
+    @property
+    def session(self):
+        """HTTP session with polite headers, created on first use"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update({
+                'User-Agent': 'Educational-Health-Crawler/1.0 (Learning Purpose)'
+            })
+            if self.connection_cache:
+                self.connection_cache.mount(self._session)
+        return self._session
+    
+    def fetch_page(self, url):
+        """Fetch a web page and return the response, or None on error"""
+        response = None
+        if self.redirect_map:
+            # Skip redirects we have seen before
+            target = self.redirect_map.resolve(url)
+            if target != url:
+                response = self.download(target)
+                if response is None:
+                    # The shortcut broke; follow the redirects again
+                    self.redirect_map.forget(url)
+        if response is None:
+            response = self.download(url)
+        if response is None:
+            return None
+        
+        # Update the map when this fetch was redirected, or when a URL that
+        # used to redirect no longer does
+        if self.redirect_map and (response.history or response.url.rstrip('/') == url.rstrip('/')):
+            self.redirect_map.record(url, response)
+        if self.page_store:
+            self.page_store.save(url, response.content, response.headers.get('Content-Type'))
+        return response
+    
+    def download(self, url, retry=True):
+        """
+        One GET request (following redirects); the response, or None on error
+        
+        A 429 or 503 with a short enough Retry-After is tried once more,
+        after the rate controller has waited it out.
+        """
+        if self.rate_controller:
+            self.rate_controller.wait(url)
+        start = time.time()
         try:
             print(f"Fetching: {url}")
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout())
+            if self.rate_controller:
+                self.rate_controller.record_response(url, response, time.time() - start)
+                if retry and self.rate_controller.should_retry(response, self.deadline):
+                    print(f"Server asked to retry later: {url}")
+                    return self.download(url, retry=False)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return soup
+            return response
         except requests.RequestException as e:
+            if self.rate_controller and getattr(e, 'response', None) is None:
+                # No response at all (timeout, refused connection)
+                self.rate_controller.record(url, None, time.time() - start)
             print(f"Error fetching {url}: {e}")
             return None
     
+    def request_timeout(self):
+        """The request timeout, cut short so a request cannot outlast the deadline"""
+        if self.deadline is None:
+            return self.timeout
+        return max(1, min(self.timeout, self.deadline - time.time()))
+    
+    def get_page(self, url):
+        """Fetch a web page and return the soup object"""
+        response = self.fetch_page(url)
+        if response is None:
+            return None
+        text, _ = decode_html(response.content, response.headers.get('Content-Type'))
+        return BeautifulSoup(text, 'html.parser')
+    
+    def has_health_signal(self, html):
+        """
+        Quick check on the raw page bytes, before BeautifulSoup runs
+        
+        Scripts, styles and tags are stripped with simple regexes, then
+        the remaining text must contain a phone-like number, or something
+        address-like (street, ZIP, PO Box) together with a specific
+        facility term (clinic, hospital, health center, ...) or one of the
+        health_keywords. A keyword on its own is not enough: words like
+        'children' or 'emergency' are on almost every government page.
+        Pages without these (cookie walls, redirect stubs, news and
+        council pages) skip the full parse.
+        """
+        if isinstance(html, str):
+            html = html.encode('utf-8', 'ignore')
+        
+        # Structured data and tel:/mailto: links live in markup, so look before stripping
+        if b'application/ld+json' in html or b'itemscope' in html:
+            return True
+        if b'tel:' in html or b'mailto:' in html:
+            return True
+        
+        text = TAG_BYTES.sub(b' ', SCRIPT_STYLE_BYTES.sub(b' ', html)).lower()
+        
+        # Phone numbers need at least 10 digits on the page
+        digits = sum(text.count(digit) for digit in b'0123456789')
+        if digits >= 10 and PHONE_BYTES.search(text) is not None:
+            return True
+        
+        if not ADDRESS_BYTES.search(text):
+            return False
+        if any(word in text for word in FACILITY_BYTES):
+            return True
+        if self._keyword_bytes is None:
+            # Very short keywords like 'er' would match almost any page
+            self._keyword_bytes = sorted({
+                keyword.encode() for words in self.health_keywords.values()
+                for keyword in words if len(keyword) > 2
+            })
+        return any(keyword in text for keyword in self._keyword_bytes)
+    
     def auto_tag_content(self, text, context_text=""):
         """
         Automatically assign tags based on keywords found in text and context
@@ -85,21 +272,26 @@ class CategorizedHealthCrawler:
         
         return full_text[:200]  # Fallback to first 200 chars
     
-    def extract_phone_with_category(self, soup):
+    def extract_phone_with_category(self, soup, phone_contexts=None, state_id=None,
+                                    known_numbers=None):
         """
         Extract phone numbers and categorize them
+        
+        Args:
+            soup: Parsed page
+            phone_contexts: (selector, context) pairs to search, defaults
+                            to PHONE_CONTEXTS
+            state_id: State of the site (e.g. 'CA'); numbers from another
+                      state's area code get a lower confidence
+            known_numbers: 10-digit numbers already found in tel: links
+                           or structured data; these are skipped
         """
         results = []
         phone_pattern = r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b'
         
         # Look for phone numbers in different contexts
-        phone_contexts = [
-            ('.contact-info', 'contact information'),
-            ('.emergency', 'emergency services'),
-            ('.crisis', 'crisis services'),
-            ('.appointment', 'appointment scheduling'),
-            ('body', 'general content')
-        ]
+        if phone_contexts is None:
+            phone_contexts = self.PHONE_CONTEXTS
         
         for selector, context_type in phone_contexts:
             elements = soup.select(selector)
@@ -108,6 +300,14 @@ class CategorizedHealthCrawler:
                 phones = re.findall(phone_pattern, text)
                 
                 for phone in phones:
+                    if known_numbers and self.area_codes.digits(phone) in known_numbers:
+                        continue
+                    
+                    # Drop ZIP+4 codes, dates and IDs before the costly context work
+                    check, region = self.area_codes.check(phone, state_id)
+                    if check == INVALID:
+                        continue
+                    
                     # Get surrounding context for better tagging
                     context = self.get_surrounding_context(element, phone)
                     tags = self.auto_tag_content(phone, context)
@@ -118,64 +318,76 @@ class CategorizedHealthCrawler:
                         if 'crisis' in context.lower() or 'suicide' in context.lower():
                             tags.append('crisis_hotline')
                     
-                    results.append({
+                    resource = {
                         'category': category,
                         'type': 'phone_number',
                         'value': phone,
                         'tags': tags,
                         'context': context_type,
-                        'confidence': 0.8
-                    })
+                        'confidence': round(0.8 * CONFIDENCE_FACTORS[check], 2)
+                    }
+                    if CONFIDENCE_FACTORS[check] < 1:
+                        resource['phone_check'] = f"{check} ({region})"
+                    results.append(resource)
         
         return results
     
-    def extract_addresses_with_category(self, soup):
+    def extract_addresses_with_category(self, soup, address_selectors=None, state_id=None):
         """
         Extract addresses and categorize them
+        
+        Args:
+            soup: Parsed page
+            address_selectors: (selector, context) pairs to search,
+                               defaults to ADDRESS_SELECTORS
+            state_id: State of the site; addresses whose ZIP is in another
+                      state get a lower confidence
         """
         results = []
         
         # Look for addresses in specific contexts
-        address_selectors = [
-            ('.address', 'facility_address'),
-            ('.location', 'service_location'), 
-            ('[itemtype*="PostalAddress"]', 'structured_address'),
-            ('address', 'html_address_tag')
-        ]
+        if address_selectors is None:
+            address_selectors = self.ADDRESS_SELECTORS
         
         for selector, context_type in address_selectors:
             elements = soup.select(selector)
             for element in elements:
-                text = element.get_text(strip=True)
-                if self.looks_like_address(text):
+                # Keep spaces between child elements so words don't run together
+                text = element.get_text(" ", strip=True)
+                components = self.address_recognizer.parse(text)
+                if components:
                     # Get surrounding context
                     context = self.get_surrounding_context(element, text)
                     tags = self.auto_tag_content(text, context)
                     
-                    results.append({
+                    # Check the ZIP offline and note its county
+                    check, place = self.gazetteer.check(components, state_id)
+                    resource = {
                         'category': 'LOCATION',
                         'type': 'address',
                         'value': text,
+                        'components': components,
                         'tags': tags,
                         'context': context_type,
-                        'confidence': 0.7
-                    })
+                        'confidence': round(0.7 * ZIP_CONFIDENCE_FACTORS[check], 2)
+                    }
+                    if ZIP_CONFIDENCE_FACTORS[check] < 1:
+                        resource['zip_check'] = check
+                    if place and 'county' in place:
+                        resource['place'] = place
+                    results.append(resource)
         
         return results
     
-    def extract_facilities_with_category(self, soup):
+    def extract_facilities_with_category(self, soup, facility_selectors=None):
         """
         Extract facility names and categorize them
         """
         results = []
         
         # Look for facility names in headings and specific elements
-        facility_selectors = [
-            ('h1, h2, h3', 'heading'),
-            ('.facility-name', 'explicit_facility'),
-            ('.clinic-name', 'clinic_listing'),
-            ('.location-name', 'location_listing')
-        ]
+        if facility_selectors is None:
+            facility_selectors = self.FACILITY_SELECTORS
         
         for selector, context_type in facility_selectors:
             elements = soup.select(selector)
@@ -207,14 +419,7 @@ class CategorizedHealthCrawler:
     
     def looks_like_address(self, text):
         """Check if text looks like an address"""
-        street_words = ['street', 'st', 'avenue', 'ave', 'road', 'rd', 
-                       'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln']
-        
-        text_lower = text.lower()
-        has_number = any(char.isdigit() for char in text)
-        has_street_word = any(word in text_lower for word in street_words)
-        
-        return has_number and has_street_word and len(text) > 10
+        return self.address_recognizer.parse(text) is not None
     
     def looks_like_facility_name(self, text):
         """Check if text looks like a healthcare facility name"""
@@ -227,25 +432,228 @@ class CategorizedHealthCrawler:
         
         return has_health_keyword and is_reasonable_length
     
-    def crawl_page_with_categories(self, url):
+    def crawl_page_with_categories(self, url, state_id=None):
         """
         Main function to crawl a page and extract categorized resources
+        
+        Args:
+            url: Page to crawl
+            state_id: State of the site, used to check phone area codes
         """
-        soup = self.get_page(url)
-        if not soup:
+        response = self.fetch_page(url)
+        if response is None:
             return {}
         
         # Extract all categorized resources
+        content_type = response.headers.get('Content-Type')
+        if self.profiler:
+            extract = lambda html, page_url: self.crawl_html(html, page_url, state_id, content_type)
+            replay = lambda html, page_url: self.replay_copy().crawl_html(html, page_url, state_id,
+                                                                          content_type)
+            results = self.profiler.run(extract, response.content, url, replay)
+        else:
+            results = self.crawl_html(response.content, url, state_id, content_type)
+        
+        # An empty result may mean the page is built by JavaScript
+        if not results['resources']:
+            reason = needs_rendering(response.content)
+            if reason:
+                results['needs_rendering'] = reason
+        return results
+    
+    def replay_copy(self):
+        """
+        A copy of this crawler for running a page a second time
+        
+        The profiler replays slow pages; the copy leaves out the template
+        cache and near-duplicate index, so the replay does not learn the
+        host twice or find the page as a copy of itself.
+        """
+        replay = copy.copy(self)
+        replay.template_cache = None
+        replay.near_duplicates = None
+        return replay
+    
+    def crawl_html(self, html, url="", state_id=None, content_type=None):
+        """
+        Run the extractors over HTML we already have (no network request)
+        
+        Args:
+            html: Page bytes (or text)
+            url: Where the page came from
+            state_id: State of the site, used to check phones and ZIPs
+            content_type: Content-Type header, used to pick the encoding
+        """
         results = {
             'url': url,
             'timestamp': datetime.now().isoformat(),
             'resources': []
         }
         
-        # Add all extracted resources
-        results['resources'].extend(self.extract_phone_with_category(soup))
-        results['resources'].extend(self.extract_addresses_with_category(soup))
-        results['resources'].extend(self.extract_facilities_with_category(soup))
+        # Low-signal pages take the minimal path: no parse, no extractors
+        if self.prefilter and not self.has_health_signal(html):
+            results['prefilter'] = 'low_signal'
+            return results
+        
+        # Decode once here, so BeautifulSoup does not guess the encoding
+        text, results['encoding'] = decode_html(html, content_type)
+        
+        # A near-copy of a page we already extracted: only the changed
+        # blocks are parsed
+        page = None
+        if self.near_duplicates:
+            page = PageFingerprint(text)
+            match = self.near_duplicates.find(page, state_id)
+            if match:
+                resources = self.near_duplicates.extract_changed(self, page, match, state_id)
+                if resources is not None:
+                    results['resources'] = resources
+                    results['near_duplicate_of'] = match['url']
+                    return results
+        
+        soup = BeautifulSoup(text, 'html.parser')
+        results['resources'] = self.extract_page(soup, url, state_id)
+        if page is not None:
+            self.near_duplicates.add(page, url, state_id, results['resources'])
+        return results
+    
+    def extract_page(self, soup, url, state_id=None):
+        """Run the extractors, with the host's learned template if there is one"""
+        if self.template_cache is None:
+            return self.extract_resources(soup, state_id=state_id)
+        
+        # Use the selectors learned for this host, once we have them
+        host = urlparse(url).netloc.lower()
+        template = self.template_cache.template_for(host)
+        resources = self.extract_resources(soup, template, state_id)
+        
+        if template is None:
+            self.template_cache.learn(host, soup, resources, self.default_template())
+        elif not resources:
+            # The template found nothing; fall back to every selector
+            resources = self.extract_resources(soup, state_id=state_id)
+            self.template_cache.record_miss(host)
+        return resources
+    
+    def default_template(self):
+        """The full selector lists, in the same shape as a learned template"""
+        return {
+            'phone': self.PHONE_CONTEXTS,
+            'address': self.ADDRESS_SELECTORS,
+            'facility': self.FACILITY_SELECTORS
+        }
+    
+    def extract_resources(self, soup, template=None, state_id=None):
+        """
+        Run every extractor over a parsed page and return all resources
+        
+        Args:
+            soup: Parsed page
+            template: Optional dict of 'phone', 'address' and 'facility'
+                      selector lists to use instead of the defaults
+            state_id: State of the site, used to check phone area codes
+                      and address ZIP codes
+        """
+        template = template or {}
+        
+        # Structured data comes first. Each heuristic extractor only runs
+        # when the structured data gave nothing of its type, except when
+        # all there is is the site owner's organization block.
+        pairs = structured_items(soup)
+        resources = self.extract_structured_data(soup, pairs)
+        structured_types = set() if is_site_wide(pairs) else {resource['type'] for resource in resources}
+        
+        # tel:, mailto: and hCard links are exact too; the text search
+        # below skips the numbers they already gave us
+        known_numbers = {self.area_codes.digits(resource['value']) for resource in resources
+                         if resource['type'] == 'phone_number'}
+        seen = {(resource['type'], resource['value']) for resource in resources}
+        for resource in self.extract_anchor_contacts(soup, state_id):
+            digits = self.area_codes.digits(resource['value']) if resource['type'] == 'phone_number' else None
+            if (resource['type'], resource['value']) in seen or (digits and digits in known_numbers):
+                continue
+            seen.add((resource['type'], resource['value']))
+            known_numbers.add(digits)
+            resources.append(resource)
+        
+        if 'phone_number' not in structured_types:
+            resources.extend(self.extract_phone_with_category(soup, template.get('phone'), state_id,
+                                                              known_numbers))
+        
+        found = []
+        if 'address' not in structured_types:
+            found.extend(self.extract_addresses_with_category(soup, template.get('address'), state_id))
+        if 'facility_name' not in structured_types:
+            found.extend(self.extract_facilities_with_category(soup, template.get('facility')))
+        covered = {self.resource_key(resource) for resource in resources}
+        for resource in found:
+            if self.resource_key(resource) not in covered:
+                resources.append(resource)
+        return resources
+    
+    def resource_key(self, resource):
+        """
+        Key that is the same for one address or name written two ways
+        
+        Addresses compare by house number (or PO Box) and ZIP, so
+        '1000 San Leandro Blvd, San Leandro, CA 94577' from JSON-LD
+        matches the same address found in the page text.
+        """
+        if resource['type'] == 'address':
+            components = resource.get('components') or self.address_recognizer.parse(resource['value'])
+            if components and components.get('zip'):
+                number = components.get('number') or components.get('po_box')
+                return ('address', number, components['zip'][:5])
+        return (resource['type'], " ".join(str(resource['value']).lower().split()))
+    
+    def extract_anchor_contacts(self, soup, state_id=None):
+        """
+        Extract phone numbers and emails from tel:, mailto: and hCard links
+        
+        Args:
+            soup: Parsed page
+            state_id: State of the site, used to check phone area codes
+        """
+        results = []
+        for resource, description in anchor_contacts(soup):
+            if resource['type'] == 'phone_number':
+                check, region = self.area_codes.check(resource['value'], state_id)
+                if check == INVALID:
+                    continue
+                resource['confidence'] = round(resource['confidence'] * CONFIDENCE_FACTORS[check], 2)
+                if CONFIDENCE_FACTORS[check] < 1:
+                    resource['phone_check'] = f"{check} ({region})"
+            
+            resource['tags'] = self.auto_tag_content(resource['value'], description)
+            if 'crisis' in description.lower() or 'suicide' in description.lower():
+                resource['tags'].append('crisis_hotline')
+            results.append(resource)
+        return results
+    
+    def extract_structured_data(self, soup, pairs=None):
+        """
+        Extract resources from schema.org JSON-LD and microdata
+        
+        Sites that publish MedicalClinic, GovernmentOrganization or
+        PostalAddress data give us exact names, phones and addresses.
+        
+        Args:
+            soup: Parsed page
+            pairs: (source, node) pairs from structured_items(), if already read
+        """
+        results = []
+        seen = set()
+        if pairs is None:
+            pairs = structured_items(soup)
+        for resource, description in nodes_to_resources(pairs):
+            key = (resource['type'], resource['value'])
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            tags = self.auto_tag_content(resource['value'], description)
+            resource['tags'] = tags + [tag for tag in resource['tags'] if tag not in tags]
+            results.append(resource)
         
         return results
     
@@ -0,0 +1,236 @@
+"""
+Connection Setup Caching
+Small county pages often take longer to connect to than to download.
+This module cuts the connection setup cost for large crawls:
+
+- DNSCache remembers getaddrinfo() answers for a while and can resolve
+  the hosts a worker will visit next in the background.
+- ResumingSSLContext keeps the last TLS session for each host name and
+  offers it on the next connection, so the server can resume it instead
+  of running a full handshake.
+
+ConnectionCache bundles both and mounts them on a requests.Session.
+Share one ConnectionCache between all workers of a crawl.
+"""
+
+import ipaddress
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+
+class DNSCache:
+    def __init__(self, ttl=300, negative_ttl=30, prefetch_workers=4):
+        """
+        Args:
+            ttl: Seconds to keep an answer. getaddrinfo() does not report
+                 the record's real TTL, so one fixed value is used.
+            negative_ttl: Seconds to remember that a host does not resolve
+            prefetch_workers: Threads used for background lookups
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefetch_workers = prefetch_workers
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._original = None
+        self._pool = None
+
+    def install(self):
+        """Route socket.getaddrinfo (used by urllib3) through the cache"""
+        if self._original is None:
+            self._original = socket.getaddrinfo
+            socket.getaddrinfo = self.getaddrinfo
+
+    def uninstall(self):
+        if self._original is not None:
+            socket.getaddrinfo = self._original
+            self._original = None
+
+    def _lookup(self, host):
+        """Return the cached answer for a host, resolving it if needed"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        resolve = self._original or socket.getaddrinfo
+        try:
+            answer = resolve(host, 0, 0, socket.SOCK_STREAM)
+            expires = now + self.ttl
+        except socket.gaierror as e:
+            answer = e
+            expires = now + self.negative_ttl
+        with self.lock:
+            self.entries[host] = (expires, answer)
+        return answer
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Drop-in replacement for socket.getaddrinfo"""
+        resolve = self._original or socket.getaddrinfo
+        # Only cache plain TCP lookups of host names
+        if (not isinstance(host, str) or is_ip_address(host) or flags
+                or type not in (0, socket.SOCK_STREAM)
+                or not (port is None or isinstance(port, int))):
+            return resolve(host, port, family, type, proto, flags)
+
+        answer = self._lookup(host)
+        if isinstance(answer, Exception):
+            raise answer
+
+        results = []
+        for entry_family, entry_type, entry_proto, canonname, sockaddr in answer:
+            if family and entry_family != family:
+                continue
+            # Cached addresses were resolved without a port
+            sockaddr = (sockaddr[0], port or 0) + tuple(sockaddr[2:])
+            results.append((entry_family, entry_type, entry_proto, canonname, sockaddr))
+        if not results:
+            return resolve(host, port, family, type, proto, flags)
+        return results
+
+    def prefetch(self, hosts):
+        """Resolve hosts in the background so the answer is ready later"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.prefetch_workers)
+        now = time.time()
+        for host in hosts:
+            if not host or is_ip_address(host):
+                continue
+            with self.lock:
+                entry = self.entries.get(host)
+            if entry is None or entry[0] <= now:
+                self._pool.submit(self._lookup, host)
+
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+    def close(self):
+        # TLS 1.3 tickets arrive after the handshake, so save again here
+        if isinstance(self.context, ResumingSSLContext):
+            self.context.save_session(self.server_hostname, self)
+        super().close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSLContext that offers each host's previous TLS session again"""
+
+    sslsocket_class = ResumingSSLSocket
+
+    def setup_session_cache(self):
+        self.sessions = {}
+        self.session_lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        if session is None and server_hostname:
+            session = self.saved_session(server_hostname)
+        ssl_sock = super().wrap_socket(
+            sock, server_side=server_side,
+            do_handshake_on_connect=do_handshake_on_connect,
+            suppress_ragged_eofs=suppress_ragged_eofs,
+            server_hostname=server_hostname, session=session
+        )
+        with self.session_lock:
+            self.handshakes += 1
+            if ssl_sock.session_reused:
+                self.resumed += 1
+        self.save_session(server_hostname, ssl_sock)
+        return ssl_sock
+
+    def saved_session(self, host):
+        with self.session_lock:
+            session = self.sessions.get(host)
+        if session and time.time() < session.time + session.timeout:
+            return session
+        return None
+
+    def save_session(self, host, ssl_sock):
+        try:
+            session = ssl_sock.session
+        except (ValueError, OSError):
+            return
+        if host and session is not None and session.has_ticket:
+            with self.session_lock:
+                self.sessions[host] = session
+
+
+def create_resuming_context():
+    """A verifying client context (same checks as requests' default)"""
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.setup_session_cache()
+    try:
+        import certifi
+        context.load_verify_locations(certifi.where())
+    except ImportError:
+        context.load_default_certs()
+    return context
+
+
+class CachingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools all share one SSL context"""
+
+    def __init__(self, ssl_context, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        if verify is True:
+            # The shared context already holds the CA bundle; do not make
+            # urllib3 load it again for every new connection
+            conn.ca_certs = None
+
+
+class ConnectionCache:
+    def __init__(self, dns_ttl=300):
+        """
+        Args:
+            dns_ttl: Seconds to keep a host's DNS answer
+        """
+        self.dns = DNSCache(ttl=dns_ttl)
+        self.ssl_context = create_resuming_context()
+
+    def mount(self, session):
+        """Use the DNS cache and shared TLS sessions for a requests.Session"""
+        self.dns.install()
+        session.mount('https://', CachingAdapter(self.ssl_context))
+
+    def prefetch(self, urls):
+        """Start resolving the hosts of URLs that will be fetched soon"""
+        self.dns.prefetch(urlparse(url).hostname for url in urls if url)
+
+    def close(self):
+        """Give socket.getaddrinfo back to the rest of the process"""
+        self.dns.uninstall()
+        if self.dns._pool is not None:
+            self.dns._pool.shutdown(wait=False)
+            self.dns._pool = None
+
+    def print_summary(self):
+        print(f"DNS cache: {self.dns.hits} hits, {self.dns.misses} lookups")
+        print(f"TLS: {self.ssl_context.resumed} of {self.ssl_context.handshakes} "
+              f"connections resumed a session")
@@ -0,0 +1,323 @@
+"""
+Health Crawler Command Line
+One entry point for the crawler examples:
+
+    python crawler_cli.py crawl ca --max-sites 10
+    python crawler_cli.py crawl ca or tx --workers 8
+    python crawler_cli.py report batch_crawl_results_20241215_164530.json
+    python crawler_cli.py query crawl_results.db --tag crisis_hotline
+    python crawler_cli.py split US.csv
+    python crawler_cli.py bench page1.html page2.html
+    python crawler_cli.py reprocess page_store ca --workers 4
+    python crawler_cli.py sweep --output url_sweep.csv
+
+Each command only imports what it needs, so report and query commands
+start quickly without loading requests or BeautifulSoup.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+EXAMPLES_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(EXAMPLES_DIR, "..", "data", "websites")
+
+
+def load_results_file(filename):
+    """Read a batch JSON file in either the list or crawl_info layout"""
+    import json
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        return data.get('results', [data])
+    return data
+
+
+def cmd_crawl(args):
+    crawler_options = {}
+    if args.learn_templates:
+        from host_templates import HostTemplateCache
+        crawler_options['template_cache'] = HostTemplateCache()
+    if args.adaptive:
+        from rate_control import AdaptiveRateController
+        crawler_options['rate_controller'] = AdaptiveRateController(initial_delay=args.delay)
+    if args.reuse_connections:
+        from connection_cache import ConnectionCache
+        crawler_options['connection_cache'] = ConnectionCache()
+    if args.page_store:
+        from page_store import RawPageStore
+        crawler_options['page_store'] = RawPageStore(args.page_store)
+    if args.profile_outliers:
+        from page_profiler import OutlierProfiler
+        crawler_options['profiler'] = OutlierProfiler(mode=args.profile_outliers)
+    if args.redirect_map:
+        from redirect_map import RedirectMap
+        crawler_options['redirect_map'] = RedirectMap(args.redirect_map)
+    if args.near_duplicates:
+        from near_duplicates import NearDuplicateIndex
+        crawler_options['near_duplicates'] = NearDuplicateIndex()
+
+    try:
+        run_crawl(args, crawler_options)
+    finally:
+        if args.reuse_connections:
+            # The DNS cache patches socket.getaddrinfo for the whole process
+            crawler_options['connection_cache'].close()
+
+
+def run_crawl(args, crawler_options):
+    if args.deadline:
+        from deadline_crawler import DeadlineCrawler
+        batch_crawler = DeadlineCrawler(workers=args.workers, crawler_options=crawler_options)
+    elif args.workers > 1 or len(args.states) > 1:
+        from national_crawler import NationalBatchCrawler
+        batch_crawler = NationalBatchCrawler(workers=args.workers, crawler_options=crawler_options)
+    elif args.sitemaps:
+        from sitemap_discovery import SitemapBatchCrawler
+        batch_crawler = SitemapBatchCrawler(page_delay=args.delay, crawler_options=crawler_options)
+    else:
+        from batch_crawler_example import BatchHealthCrawler
+        batch_crawler = BatchHealthCrawler(crawler_options=crawler_options)
+    batch_crawler.data_dir = DATA_DIR
+
+    if args.store:
+        from result_store import SQLiteResultStore
+        batch_crawler.store = SQLiteResultStore(args.store)
+    if args.sweep:
+        from url_health_sweep import load_sweep
+        added = batch_crawler.use_sweep(load_sweep(args.sweep))
+        print(f"Added {added} redirects from the sweep to the redirect map")
+
+    if args.deadline:
+        batch_crawler.crawl_until(args.deadline * 60, args.states, delay=args.delay)
+        batch_crawler.print_coverage()
+    elif hasattr(batch_crawler, 'crawl_all'):
+        batch_crawler.crawl_all(args.states, delay=args.delay, max_sites=args.max_sites)
+    else:
+        batch_crawler.crawl_state(args.states[0], max_sites=args.max_sites, delay=args.delay)
+
+    if args.render_js:
+        from js_renderer import HeadlessRenderer
+        renderer = HeadlessRenderer()
+        batch_crawler.render_js_pages(renderer)
+        renderer.close()
+
+    batch_crawler.print_summary()
+    if args.adaptive:
+        print("\nDelay per host:")
+        crawler_options['rate_controller'].print_summary()
+    if args.reuse_connections:
+        crawler_options['connection_cache'].print_summary()
+    if args.profile_outliers:
+        crawler_options['profiler'].print_summary()
+    if args.near_duplicates:
+        crawler_options['near_duplicates'].print_summary()
+    if args.redirect_map:
+        crawler_options['redirect_map'].print_summary()
+        crawler_options['redirect_map'].save()
+    batch_crawler.save_results(args.output)
+    if batch_crawler.store:
+        batch_crawler.store.close()
+
+
+def cmd_reprocess(args):
+    from national_crawler import NationalBatchCrawler
+    from page_store import RawPageStore
+
+    # Loading the CSVs only needs the csv module, not the crawler
+    batch_crawler = NationalBatchCrawler(data_dir=DATA_DIR, timings_file=None)
+    sites = {site['pha_url']: site for site in batch_crawler.load_all_websites(args.states or None)}
+
+    store = RawPageStore(args.folder)
+    start = time.perf_counter()
+    state_ids = {url: site['state_id'] for url, site in sites.items()}
+    for results in store.reprocess(urls=sites, workers=args.workers, state_ids=state_ids):
+        batch_crawler.results.append(
+            batch_crawler.add_site_metadata(results, sites[results['url']], results['fetched_at'])
+        )
+    print(f"Reprocessed {len(batch_crawler.results)} pages in {time.perf_counter() - start:.1f} s")
+    store.close()
+
+    batch_crawler.print_summary()
+    batch_crawler.save_results(args.output)
+
+
+def cmd_sweep(args):
+    from national_crawler import NationalBatchCrawler
+    from url_health_sweep import UrlHealthSweep
+
+    loader = NationalBatchCrawler(data_dir=DATA_DIR, timings_file=None)
+    websites = loader.load_all_websites(args.states or None)
+
+    url_sweep = UrlHealthSweep(workers=args.workers, per_host=args.per_host, timeout=args.timeout)
+    rows = url_sweep.sweep(websites)
+    url_sweep.print_summary(rows)
+    url_sweep.write_csv(rows, args.output)
+
+
+def cmd_report(args):
+    from batch_crawler_example import BatchHealthCrawler
+
+    batch_crawler = BatchHealthCrawler()
+    for filename in args.files:
+        batch_crawler.results.extend(load_results_file(filename))
+    batch_crawler.print_summary()
+
+
+def cmd_query(args):
+    from result_store import SQLiteResultStore
+
+    store = SQLiteResultStore(args.database)
+    if args.lost:
+        runs = store.list_runs(args.state)
+        if len(runs) < 2:
+            print("Need at least two runs to compare")
+        else:
+            old_run, new_run = runs[-2][0], runs[-1][0]
+            lost = store.communities_that_lost_tag(args.lost, old_run, new_run)
+            print(f"{len(lost)} communities lost '{args.lost}' between run {old_run} and run {new_run}:")
+            for community_id in lost:
+                print(f"  {community_id}")
+    else:
+        resources = store.find_resources(community_id=args.community, tag=args.tag,
+                                         value=args.value, run_id=args.run)
+        for resource in resources:
+            print(f"[run {resource['run_id']}] {resource['community_id']}: "
+                  f"{resource['type']} {resource['value']}")
+        print(f"{len(resources)} resources")
+    store.close()
+
+
+def cmd_split(args):
+    import importlib.util
+
+    script = os.path.join(EXAMPLES_DIR, "..", ".admin", "split_by_state.py")
+    spec = importlib.util.spec_from_file_location("split_by_state", script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.split_by_state(args.input, args.output_dir)
+
+
+def cmd_bench(args):
+    from categorized_example import CategorizedHealthCrawler
+
+    crawler = CategorizedHealthCrawler()
+    total_seconds = 0.0
+    for filename in args.files:
+        with open(filename, 'rb') as file:
+            html = file.read()
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = crawler.crawl_html(html, filename)
+        seconds = (time.perf_counter() - start) / args.repeat
+        total_seconds += seconds
+
+        print(f"{filename}: {seconds * 1000:.1f} ms/page, "
+              f"{len(html) / 1024:.0f} KB, {len(results['resources'])} resources")
+
+    if args.files:
+        print(f"Average: {total_seconds / len(args.files) * 1000:.1f} ms/page")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Health resource crawler tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    crawl = commands.add_parser('crawl', help="Crawl one or more states")
+    crawl.add_argument('states', nargs='+', help="Two-letter state codes")
+    crawl.add_argument('--max-sites', type=int, help="Crawl at most this many sites (default: all)")
+    crawl.add_argument('--delay', type=float, default=2)
+    crawl.add_argument('--adaptive', action='store_true',
+                       help="Adjust the delay per host from response times and 429/503 replies")
+    crawl.add_argument('--reuse-connections', action='store_true',
+                       help="Cache DNS answers and resume TLS sessions across workers")
+    crawl.add_argument('--render-js', action='store_true',
+                       help="Re-crawl JavaScript-built pages with a local headless Chrome")
+    crawl.add_argument('--workers', type=int, default=1)
+    crawl.add_argument('--deadline', type=float, metavar='MINUTES',
+                       help="Stop after MINUTES, crawling the largest and stalest places first")
+    crawl.add_argument('--store', help="SQLite result store to write to")
+    crawl.add_argument('--output', help="JSON file for the results")
+    crawl.add_argument('--sitemaps', action='store_true',
+                       help="Also crawl health pages listed in each site's sitemap "
+                            "(one state, one worker)")
+    crawl.add_argument('--profile-outliers', nargs='?', const='replay', choices=['replay', 'sampling'],
+                       help="Save profiles of pages slower than the 95th percentile to profiles/")
+    crawl.add_argument('--page-store', metavar='FOLDER',
+                       help="Keep every fetched page in a raw page store")
+    crawl.add_argument('--learn-templates', action='store_true',
+                       help="Learn per-host selectors from the first pages of each host")
+    crawl.add_argument('--redirect-map', nargs='?', const='redirect_map.json', metavar='JSON',
+                       help="Remember redirects and fetch final URLs directly on later runs")
+    crawl.add_argument('--near-duplicates', action='store_true',
+                       help="Reuse results for near-copies of already extracted pages")
+    crawl.add_argument('--sweep', metavar='CSV',
+                       help="Skip dead URLs and follow redirects found by a URL sweep")
+    crawl.set_defaults(handler=cmd_crawl)
+
+    sweep = commands.add_parser('sweep', help="Check every pha_url with fast HEAD requests")
+    sweep.add_argument('states', nargs='*', help="State codes (default: all)")
+    sweep.add_argument('--workers', type=int, default=64)
+    sweep.add_argument('--per-host', type=int, default=2)
+    sweep.add_argument('--timeout', type=float, default=10)
+    sweep.add_argument('--output', default="url_sweep.csv")
+    sweep.set_defaults(handler=cmd_sweep)
+
+    report = commands.add_parser('report', help="Summarize saved batch JSON files")
+    report.add_argument('files', nargs='+')
+    report.set_defaults(handler=cmd_report)
+
+    query = commands.add_parser('query', help="Look up resources in a SQLite result store")
+    query.add_argument('database')
+    query.add_argument('--tag')
+    query.add_argument('--community')
+    query.add_argument('--value')
+    query.add_argument('--run', type=int)
+    query.add_argument('--state', help="Limit --lost to runs for one state")
+    query.add_argument('--lost', metavar='TAG', help="Communities that lost TAG since the previous run")
+    query.set_defaults(handler=cmd_query)
+
+    split = commands.add_parser('split', help="Split a national CSV into per-state files")
+    split.add_argument('input', nargs='?', default='US.csv')
+    split.add_argument('--output-dir', default=DATA_DIR)
+    split.set_defaults(handler=cmd_split)
+
+    reprocess = commands.add_parser('reprocess', help="Run the extractors again over stored pages")
+    reprocess.add_argument('folder', help="Raw page store folder")
+    reprocess.add_argument('states', nargs='*', help="State codes (default: all)")
+    reprocess.add_argument('--workers', type=int, default=4)
+    reprocess.add_argument('--output', help="JSON file for the results")
+    reprocess.set_defaults(handler=cmd_reprocess)
+
+    bench = commands.add_parser('bench', help="Time the extractors on saved HTML files")
+    bench.add_argument('files', nargs='+')
+    bench.add_argument('--repeat', type=int, default=5)
+    bench.set_defaults(handler=cmd_bench)
+
+    return parser
+
+
+def crawl_args_problem(args):
+    """Why a combination of crawl flags cannot run as asked, or None"""
+    if args.sitemaps and (args.workers > 1 or len(args.states) > 1 or args.deadline):
+        return "--sitemaps only works for one state with one worker, without --deadline"
+    if args.deadline and args.max_sites:
+        return "--deadline chooses which sites to crawl; it cannot be combined with --max-sites"
+    return None
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'crawl':
+        problem = crawl_args_problem(args)
+        if problem:
+            parser.error(problem)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Deadline Crawler
+Crawls for a fixed amount of time and spends it where it helps the most
+people. Instead of CSV order, each site gets a score:
+
+    population  x  staleness  x  success rate
+    -----------------------------------------
+         expected seconds to crawl it
+
+- population comes from population_proper in the CSV
+- staleness grows from 0 (crawled just now) toward 1 (long ago / never)
+- success rate is how often past crawls of the site found resources
+  (needs a SQLiteResultStore; otherwise every site gets the same rate)
+
+Workers always take the best-scoring site they can start right now.
+When a host turns out slower than expected, its remaining sites are
+scored again with the measured time, so the plan adapts as it runs.
+Sites that cannot finish before the deadline are skipped.
+"""
+
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+from national_crawler import NationalBatchCrawler, host_key
+
+DEFAULT_SUCCESS_RATE = 0.8
+
+
+def naive_utc(moment):
+    """
+    A datetime as naive UTC, so stored times of either kind compare
+
+    Naive values are local time (datetime.now().isoformat() in the
+    crawlers); aware ones come from imported or archived results.
+    """
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class DeadlineCrawler(NationalBatchCrawler):
+    def __init__(self, workers=8, store=None, data_dir="../data/websites",
+                 timings_file="crawl_timings.json", crawler_options=None,
+                 stale_days=30):
+        """
+        Args:
+            workers: Number of worker threads
+            store: Optional SQLiteResultStore; its history gives staleness
+                   and success rates, and it receives the new results
+            data_dir: Folder with the us-*.csv files
+            timings_file: JSON file of past crawl times per community_id
+            crawler_options: Keyword arguments for each worker's crawler
+            stale_days: A result this many days old counts as ~63% stale
+        """
+        super().__init__(workers=workers, store=store, data_dir=data_dir,
+                         timings_file=timings_file, crawler_options=crawler_options)
+        self.stale_days = stale_days
+        self.history = {}
+        self.host_seconds = {}
+        self.skipped = []
+        self.websites = []
+
+    def site_value(self, site, now):
+        """How much a fresh result for this site is worth"""
+        try:
+            population = float(site['population'] or 0)
+        except ValueError:
+            population = 0.0
+
+        last_crawled, pages, useful = self.history.get(site['community_id'], (None, 0, 0))
+        staleness = 1.0
+        if last_crawled:
+            try:
+                crawled = naive_utc(datetime.fromisoformat(last_crawled))
+                age_days = (now - crawled).total_seconds() / 86400
+                staleness = 1 - math.exp(-max(age_days, 0) / self.stale_days)
+            except ValueError:
+                pass
+
+        # Smoothed so one failure does not write a site off
+        success_rate = (useful + DEFAULT_SUCCESS_RATE) / (pages + 1)
+        return max(population, 1.0) * staleness * success_rate
+
+    def expected_seconds(self, site, delay):
+        """Measured time on this host if we have it, otherwise an estimate"""
+        measured = self.host_seconds.get(host_key(site['pha_url']))
+        if measured is not None:
+            return measured + delay
+        return self.estimate_cost(site, delay)
+
+    def known_seconds(self, site):
+        """Measured or past crawl time for a site, or None if we only have a guess"""
+        measured = self.host_seconds.get(host_key(site['pha_url']))
+        if measured is not None:
+            return measured
+        return self.past_timings.get(site['community_id'])
+
+    def score(self, site, delay):
+        return site['value'] / self.expected_seconds(site, delay)
+
+    def plan(self, websites, delay):
+        """Score every site and return them as a heap"""
+        now = naive_utc(datetime.now())
+        heap = []
+        for order, site in enumerate(websites):
+            site['value'] = self.site_value(site, now)
+            heap.append((-self.score(site, delay), order, site))
+        heapq.heapify(heap)
+        return heap
+
+    def take_next(self, heap, busy_hosts, next_allowed, deadline, delay):
+        """
+        Pop the best site that can start now (call with self.lock held)
+
+        Returns a site, 'wait' if every remaining site is blocked by a
+        busy host or its polite delay, or None when nothing is left.
+        """
+        now = time.time()
+        blocked = []
+        chosen = None
+        while heap:
+            negative_score, order, site = heapq.heappop(heap)
+            host = host_key(site['pha_url'])
+
+            # Re-plan: the host was slower than planned, so score it again
+            score = self.score(site, delay)
+            if score < -negative_score * 0.9:
+                heapq.heappush(heap, (-score, order, site))
+                continue
+
+            if host in busy_hosts or next_allowed.get(host, 0) > now:
+                blocked.append((negative_score, order, site))
+                continue
+            # Only real timings can rule a site out; estimates are rough
+            seconds = self.known_seconds(site)
+            if seconds is not None and now + seconds > deadline:
+                self.skipped.append(site)
+                continue
+
+            chosen = site
+            busy_hosts.add(host)
+            break
+
+        for entry in blocked:
+            heapq.heappush(heap, entry)
+        if chosen:
+            return chosen
+        return 'wait' if blocked else None
+
+    def deadline_worker(self, worker_id, heap, state, run_id, deadline, delay):
+        crawler = self.new_crawler()
+        # A slow server cannot hold a worker past the deadline
+        crawler.deadline = deadline
+        while time.time() < deadline:
+            with self.lock:
+                site = self.take_next(heap, state['busy'], state['next_allowed'], deadline, delay)
+            if site is None:
+                return
+            if site == 'wait':
+                time.sleep(0.2)
+                continue
+
+            results = self.crawl_site(crawler, site)
+            host = host_key(site['pha_url'])
+            with self.lock:
+                # Smoothed seconds per page on this host
+                previous = self.host_seconds.get(host)
+                seconds = results['crawl_seconds']
+                self.host_seconds[host] = seconds if previous is None else 0.5 * previous + 0.5 * seconds
+                state['busy'].discard(host)
+                if not self.adaptive_rate:
+                    state['next_allowed'][host] = time.time() + delay
+
+                self.results.append(results)
+                if self.store:
+                    self.store.add_site_result(run_id, results)
+                done = len(self.results)
+
+            remaining = max(0, deadline - time.time())
+            print(f"[worker {worker_id}] ({done}) {site['state_id']} {site['name']} "
+                  f"(pop {site['population']}): {len(results.get('resources', []))} resources, "
+                  f"{remaining:.0f}s left")
+
+    def crawl_until(self, deadline_seconds, state_codes=None, delay=2):
+        """
+        Crawl the most valuable sites until the time runs out
+
+        Args:
+            deadline_seconds: Length of the crawl window in seconds
+            state_codes: List of state codes, or None for every CSV file
+            delay: Seconds to wait between requests to the same host
+        """
+        deadline = time.time() + deadline_seconds
+        self.websites = self.load_all_websites(state_codes)
+        if self.store:
+            self.history = self.store.community_history()
+        heap = self.plan(self.websites, delay)
+        print(f"\n=== Crawling up to {len(heap)} sites for {deadline_seconds:.0f} seconds "
+              f"with {self.workers} workers ===")
+
+        label = ",".join(code.upper() for code in state_codes) if state_codes else "US"
+        run_id = self.store.start_run(label) if self.store else None
+
+        state = {'busy': set(), 'next_allowed': {}}
+        threads = [
+            threading.Thread(target=self.deadline_worker,
+                             args=(i, heap, state, run_id, deadline, delay))
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.skipped.extend(site for _, _, site in heap)
+        if self.store:
+            self.store.finish_run(run_id)
+        self.save_timings()
+
+    def print_coverage(self):
+        """How much of the population got a fresh result"""
+        def population(site):
+            try:
+                return float(site['population'] or 0)
+            except ValueError:
+                return 0.0
+
+        total = sum(population(site) for site in self.websites)
+        crawled = {r['community_id'] for r in self.results if r.get('resources')}
+        covered = sum(population(site) for site in self.websites if site['community_id'] in crawled)
+        print(f"\n=== DEADLINE COVERAGE ===")
+        print(f"Sites crawled: {len(self.results)} of {len(self.websites)} "
+              f"({len(self.skipped)} not reached)")
+        if total:
+            print(f"Population with fresh results: {covered:,.0f} of {total:,.0f} "
+                  f"({covered / total:.0%})")
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl the most valuable sites within a time limit")
+    parser.add_argument('states', nargs='*', help="State codes (default: all states)")
+    parser.add_argument('--minutes', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=2)
+    parser.add_argument('--store', help="SQLite result store with past runs")
+    args = parser.parse_args()
+
+    store = None
+    if args.store:
+        from result_store import SQLiteResultStore
+        store = SQLiteResultStore(args.store)
+
+    deadline_crawler = DeadlineCrawler(workers=args.workers, store=store)
+    deadline_crawler.crawl_until(args.minutes * 60, args.states or None, delay=args.delay)
+    deadline_crawler.print_summary()
+    deadline_crawler.print_coverage()
+    deadline_crawler.save_results()
+    if store:
+        store.close()
@@ -0,0 +1,404 @@
+"""
+Distributed Health Resource Crawler
+Splits a crawl between one coordinator and any number of worker
+processes. Community rows are leased from a shared SQLite queue file;
+workers keep their leases alive with heartbeats and write results back
+into the same file, where the coordinator collects them into one sink.
+
+Usage:
+    python distributed_crawler.py coordinator ca or tx
+    python distributed_crawler.py worker            (start as many as you like)
+    python distributed_crawler.py local --processes 4 ca
+
+The queue file must live on a filesystem with working file locks (a
+local disk, or a network share that supports SQLite locking).
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from national_crawler import NationalBatchCrawler, host_key
+from result_store import SQLiteResultStore
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    community_id TEXT,
+    host TEXT,
+    site TEXT,
+    status TEXT DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    next_allowed REAL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    result_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER,
+    worker TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_work_status ON work_items (status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_work_host ON work_items (host, status);
+"""
+
+DEFAULT_LEASE_SECONDS = 120
+
+
+class SharedWorkQueue:
+    def __init__(self, path="crawl_queue.db", lease_seconds=None, max_attempts=3):
+        """
+        Args:
+            path: SQLite file shared by the coordinator and workers
+            lease_seconds: How long a lease lasts without a heartbeat. When
+                           given it is stored in the queue file; when None
+                           the stored value is used, so workers follow the
+                           coordinator's setting
+            max_attempts: Leases per item before it is marked failed
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # Autocommit mode so we can control transactions with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(QUEUE_SCHEMA)
+        # Workers may start before the coordinator has written the setting
+        self.follow_stored_lease = lease_seconds is None
+        if lease_seconds is not None:
+            self.transaction(lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('lease_seconds', ?)",
+                (str(lease_seconds),)
+            ))
+            self.lease_seconds = lease_seconds
+        else:
+            self.lease_seconds = self.stored_lease_seconds(self.conn)
+
+    def stored_lease_seconds(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'lease_seconds'").fetchone()
+        return float(row[0]) if row else DEFAULT_LEASE_SECONDS
+
+    def transaction(self, statements):
+        """Run a function inside one write transaction and return its result"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = statements(self.conn)
+                self.conn.execute("COMMIT")
+                return value
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, websites):
+        """Add community rows (dicts from load_state_websites) to the queue"""
+        rows = [(site['community_id'], host_key(site['pha_url']), json.dumps(site))
+                for site in websites]
+
+        def add(conn):
+            conn.executemany(
+                "INSERT INTO work_items (community_id, host, site) VALUES (?, ?, ?)", rows
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO hosts (host) VALUES (?)",
+                {(row[1],) for row in rows}
+            )
+        self.transaction(add)
+        return len(rows)
+
+    def clear(self):
+        """Remove the items and results of an earlier run"""
+        def remove(conn):
+            conn.execute("DELETE FROM results")
+            return conn.execute("DELETE FROM work_items").rowcount
+        return self.transaction(remove)
+
+    def requeue_expired(self):
+        """Put items whose lease ran out back into the queue"""
+        now = time.time()
+
+        def requeue(conn):
+            conn.execute(
+                "UPDATE work_items SET status = 'failed', lease_owner = NULL "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            return conn.execute(
+                "UPDATE work_items SET status = 'pending', lease_owner = NULL "
+                "WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).rowcount
+        return self.transaction(requeue)
+
+    def lease(self, worker_id):
+        """
+        Lease the next item whose host is not busy, or return None
+
+        A host is busy while another worker holds one of its items, or
+        until its polite delay has passed since the last request.
+        """
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute(
+                "SELECT w.item_id, w.site FROM work_items w JOIN hosts h ON h.host = w.host "
+                "WHERE w.status = 'pending' AND h.next_allowed <= ? "
+                "AND w.host NOT IN (SELECT host FROM work_items WHERE status = 'leased') "
+                "ORDER BY w.item_id LIMIT 1", (now,)
+            ).fetchone()
+            if not row:
+                return None
+            if self.follow_stored_lease:
+                self.lease_seconds = self.stored_lease_seconds(conn)
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', lease_owner = ?, "
+                "lease_expires = ?, attempts = attempts + 1 WHERE item_id = ?",
+                (worker_id, now + self.lease_seconds, row[0])
+            )
+            return row[0], json.loads(row[1])
+        return self.transaction(take)
+
+    def heartbeat(self, worker_id, item_id):
+        """Extend a lease we still hold; returns False if it was lost"""
+        def extend(conn):
+            return conn.execute(
+                "UPDATE work_items SET lease_expires = ? "
+                "WHERE item_id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, item_id, worker_id)
+            ).rowcount == 1
+        return self.transaction(extend)
+
+    def complete(self, worker_id, item_id, result, delay):
+        """
+        Store a result and mark the item done
+
+        The result is dropped if our lease expired and the item was given
+        to someone else, so each item ends up in the sink only once.
+        """
+        def finish(conn):
+            updated = conn.execute(
+                "UPDATE work_items SET status = 'done' "
+                "WHERE item_id = ? AND lease_owner = ? AND status = 'leased'",
+                (item_id, worker_id)
+            ).rowcount
+            if not updated:
+                return False
+            conn.execute(
+                "INSERT INTO results (item_id, worker, result) VALUES (?, ?, ?)",
+                (item_id, worker_id, json.dumps(result, ensure_ascii=False))
+            )
+            conn.execute(
+                "UPDATE hosts SET next_allowed = ? "
+                "WHERE host = (SELECT host FROM work_items WHERE item_id = ?)",
+                (time.time() + delay, item_id)
+            )
+            return True
+        return self.transaction(finish)
+
+    def fetch_results(self, after_id=0):
+        """Return (result_id, result dict) pairs newer than after_id"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT result_id, result FROM results WHERE result_id > ? ORDER BY result_id",
+                (after_id,)
+            ).fetchall()
+        return [(result_id, json.loads(result)) for result_id, result in rows]
+
+    def progress(self):
+        """Return a dict of item counts by status"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM work_items GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.conn.close()
+
+
+class DistributedWorker:
+    def __init__(self, queue_path="crawl_queue.db", delay=2, idle_timeout=30):
+        """
+        Args:
+            queue_path: Shared queue file written by the coordinator
+            delay: Seconds between requests to the same host (all workers)
+            idle_timeout: Stop after this many seconds without work
+        """
+        self.queue = SharedWorkQueue(queue_path)
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.delay = delay
+        self.idle_timeout = idle_timeout
+        self.batch = NationalBatchCrawler(workers=1, timings_file=None)
+
+    def keep_lease_alive(self, item_id, stop_event):
+        """Heartbeat thread: renew the lease until the item is finished"""
+        interval = self.queue.lease_seconds / 3
+        while not stop_event.wait(interval):
+            if not self.queue.heartbeat(self.worker_id, item_id):
+                print(f"[{self.worker_id}] Lost lease on item {item_id}")
+                return
+
+    def run(self):
+        """Lease and crawl items until the queue stays empty"""
+        print(f"[{self.worker_id}] Worker started")
+        idle_since = time.time()
+        crawled = 0
+
+        while True:
+            leased = self.queue.lease(self.worker_id)
+            if leased is None:
+                if time.time() - idle_since > self.idle_timeout:
+                    break
+                time.sleep(0.5)
+                continue
+
+            item_id, site = leased
+            stop_event = threading.Event()
+            heartbeat = threading.Thread(target=self.keep_lease_alive,
+                                         args=(item_id, stop_event), daemon=True)
+            heartbeat.start()
+            try:
+                result = self.batch.crawl_site(self.batch.crawler, site)
+            finally:
+                stop_event.set()
+                heartbeat.join()
+
+            if self.queue.complete(self.worker_id, item_id, result, self.delay):
+                crawled += 1
+                print(f"[{self.worker_id}] {site['name']}: "
+                      f"{len(result.get('resources', []))} resources")
+            idle_since = time.time()
+
+        print(f"[{self.worker_id}] No more work, crawled {crawled} sites")
+        self.queue.close()
+
+
+class CrawlCoordinator:
+    def __init__(self, queue_path="crawl_queue.db", store=None,
+                 lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Args:
+            queue_path: Shared queue file
+            store: Optional SQLiteResultStore that receives all results
+            lease_seconds: Lease length, stored in the queue file where
+                           every worker reads it
+        """
+        self.queue = SharedWorkQueue(queue_path, lease_seconds=lease_seconds)
+        self.store = store
+        self.results = []
+
+    def submit(self, state_codes=None, max_sites=None):
+        """
+        Load community rows and put them on the queue
+
+        A queue file left over from an earlier run is emptied first, so
+        its results are not collected again and its items not re-crawled.
+        """
+        loader = NationalBatchCrawler(workers=1, timings_file=None)
+        websites = loader.load_all_websites(state_codes)
+        if max_sites:
+            websites = websites[:max_sites]
+        cleared = self.queue.clear()
+        if cleared:
+            print(f"Cleared {cleared} items from an earlier run")
+        count = self.queue.enqueue(websites)
+        print(f"Queued {count} sites")
+        return count
+
+    def run(self, label="US", poll_interval=2):
+        """
+        Collect results until every item is done or failed
+
+        Expired leases are re-queued on every poll, so work held by a
+        crashed worker is picked up again by the others.
+        """
+        run_id = self.store.start_run(label) if self.store else None
+        last_result_id = 0
+
+        while True:
+            requeued = self.queue.requeue_expired()
+            if requeued:
+                print(f"Re-queued {requeued} expired leases")
+
+            for result_id, result in self.queue.fetch_results(last_result_id):
+                last_result_id = result_id
+                self.results.append(result)
+                if self.store:
+                    self.store.add_site_result(run_id, result)
+
+            counts = self.queue.progress()
+            remaining = counts.get('pending', 0) + counts.get('leased', 0)
+            print(f"Progress: {counts}")
+            if remaining == 0:
+                break
+            time.sleep(poll_interval)
+
+        if self.store:
+            self.store.finish_run(run_id)
+        return self.results
+
+    def save_results(self, filename=None):
+        """Save the collected results to one JSON file"""
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"distributed_crawl_results_{timestamp}.json"
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.results, file, indent=2, ensure_ascii=False)
+        print(f"\nResults saved to {filename}")
+
+
+def run_worker(queue_path, delay):
+    DistributedWorker(queue_path, delay=delay).run()
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Distributed crawl over a shared queue file")
+    parser.add_argument('mode', choices=['coordinator', 'worker', 'local'])
+    parser.add_argument('states', nargs='*', help="State codes to queue (default: all)")
+    parser.add_argument('--queue', default="crawl_queue.db")
+    parser.add_argument('--store', default=None, help="SQLite result store to write to")
+    parser.add_argument('--processes', type=int, default=4, help="Workers for local mode")
+    parser.add_argument('--delay', type=float, default=2)
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Lease length for workers (coordinator and local modes)")
+    parser.add_argument('--max-sites', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.mode == 'worker':
+        run_worker(args.queue, args.delay)
+    else:
+        store = SQLiteResultStore(args.store) if args.store else None
+        coordinator = CrawlCoordinator(args.queue, store=store, lease_seconds=args.lease_seconds)
+        coordinator.submit(args.states or None, max_sites=args.max_sites)
+
+        # Local mode starts the workers itself, for testing on one machine
+        workers = []
+        if args.mode == 'local':
+            for _ in range(args.processes):
+                process = multiprocessing.Process(target=run_worker, args=(args.queue, args.delay))
+                process.start()
+                workers.append(process)
+
+        label = ",".join(code.upper() for code in args.states) if args.states else "US"
+        coordinator.run(label)
+        for process in workers:
+            process.join()
+        coordinator.save_results()
+        if store:
+            store.close()
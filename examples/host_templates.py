@@ -0,0 +1,136 @@
+"""
+Host Template Cache
+Many counties share one host and one page template (for example every
+county page under www.alabamapublichealth.gov/{county}/index.html).
+This cache watches the first few pages from each host, remembers which
+selectors actually found resources and where the contact block lives,
+and then lets the crawler use only those selectors on later pages.
+"""
+
+import threading
+from collections import Counter
+
+# Elements too large to count as a "contact block"
+PAGE_LEVEL_TAGS = {'html', 'body', '[document]'}
+
+
+def block_selector(element):
+    """
+    Build a CSS selector for the nearest ancestor with an id or class
+
+    Attribute selectors are used so unusual characters in ids and
+    class names cannot break the selector.
+    """
+    for parent in [element] + list(element.parents):
+        if parent.name in PAGE_LEVEL_TAGS:
+            return None
+        if parent.get('id'):
+            return f'{parent.name}[id="{parent["id"]}"]'
+        if parent.get('class'):
+            return f'{parent.name}[class~="{parent["class"][0]}"]'
+    return None
+
+
+class HostTemplateCache:
+    def __init__(self, learn_pages=3, max_misses=3):
+        """
+        Args:
+            learn_pages: Pages per host to run with every selector before
+                         the learned template is used
+            max_misses: Template pages with no resources before the host
+                        is learned again from scratch
+        """
+        self.learn_pages = learn_pages
+        self.max_misses = max_misses
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _profile(self, host):
+        return self.hosts.setdefault(host, {
+            'pages': 0,
+            'hits': Counter(),
+            'blocks': Counter(),
+            'template': None,
+            'misses': 0
+        })
+
+    def template_for(self, host):
+        """Return the learned selectors for a host, or None while learning"""
+        with self.lock:
+            profile = self.hosts.get(host)
+            return profile['template'] if profile else None
+
+    def learn(self, host, soup, resources, defaults):
+        """
+        Record which selectors produced resources on one page
+
+        Args:
+            host: Host name of the page
+            soup: Parsed page
+            resources: Resources extracted with every selector
+            defaults: Dict of the crawler's full 'phone', 'address' and
+                      'facility' (selector, context) lists
+        """
+        contexts = {resource['context'] for resource in resources}
+
+        # Find the block that holds phones only the 'body' scan found
+        blocks = set()
+        for resource in resources:
+            if resource['type'] != 'phone_number' or resource['context'] != 'general content':
+                continue
+            text_node = soup.find(string=lambda text: resource['value'] in text)
+            if text_node is not None:
+                selector = block_selector(text_node.parent)
+                if selector:
+                    blocks.add(selector)
+
+        with self.lock:
+            profile = self._profile(host)
+            if profile['template'] is not None:
+                return
+            profile['pages'] += 1
+            for kind, selectors in defaults.items():
+                for selector, context in selectors:
+                    if context in contexts:
+                        profile['hits'][(kind, selector, context)] += 1
+            profile['blocks'].update(blocks)
+
+            if profile['pages'] >= self.learn_pages:
+                profile['template'] = self._build_template(profile, defaults)
+
+    def _build_template(self, profile, defaults):
+        template = {}
+        for kind, selectors in defaults.items():
+            template[kind] = [(selector, context) for selector, context in selectors
+                              if profile['hits'][(kind, selector, context)]]
+
+        # Search the learned contact blocks instead of the whole body
+        needed = max(1, profile['pages'] // 2)
+        blocks = [selector for selector, count in profile['blocks'].most_common(3)
+                  if count >= needed]
+        if blocks:
+            template['phone'] = [(selector, context) for selector, context in template['phone']
+                                 if selector != 'body']
+            template['phone'].extend((selector, 'contact block') for selector in blocks)
+        return template
+
+    def record_miss(self, host):
+        """A templated page found nothing; relearn after too many misses"""
+        with self.lock:
+            profile = self._profile(host)
+            profile['misses'] += 1
+            if profile['misses'] >= self.max_misses:
+                del self.hosts[host]
+
+    def print_summary(self):
+        """Show the learned selectors for each host"""
+        with self.lock:
+            for host, profile in sorted(self.hosts.items()):
+                template = profile['template']
+                if template is None:
+                    print(f"{host}: learning ({profile['pages']}/{self.learn_pages} pages)")
+                    continue
+                print(f"{host}:")
+                for kind, selectors in template.items():
+                    names = ", ".join(selector for selector, _ in selectors) or "(skipped)"
+                    print(f"  {kind}: {names}")
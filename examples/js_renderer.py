@@ -0,0 +1,152 @@
+"""
+Render-on-Demand for JavaScript Pages
+Some health department sites send an almost empty page and build the
+content with JavaScript, so the normal crawler finds nothing on them.
+
+needs_rendering() looks at a page that came back with no resources and
+decides (without parsing it) whether it is probably JavaScript-built.
+HeadlessRenderer then loads only those pages in a local headless
+Chrome/Chromium, with a small fixed number running at once, and runs
+the usual extractors on the rendered HTML.
+
+No browser installed? Pages are still flagged, just not rendered.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BROWSER_NAMES = ['chromium', 'chromium-browser', 'google-chrome',
+                 'google-chrome-stable', 'chrome']
+
+SCRIPT_BLOCK = re.compile(rb'<script\b[^>]*>.*?</script\s*>', re.I | re.S)
+STYLE_BLOCK = re.compile(rb'<style\b[^>]*>.*?</style\s*>', re.I | re.S)
+ANY_TAG = re.compile(rb'<[^>]+>')
+
+# Markers left by common JavaScript frameworks in the page they serve
+APP_SHELL_MARKERS = [
+    re.compile(rb'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.I),
+    re.compile(rb'\bng-app\b|\bdata-reactroot\b|__NEXT_DATA__|window\.__NUXT__', re.I),
+    re.compile(rb'<noscript[^>]*>[^<]*(?:enable|requires?)\s+javascript', re.I),
+]
+
+MIN_VISIBLE_TEXT = 400
+MAX_SCRIPT_SHARE = 0.6
+
+
+def needs_rendering(html):
+    """
+    Return a short reason if a page looks JavaScript-built, else None
+
+    Only meant for pages where the normal extractors found nothing.
+    """
+    if not html:
+        return None
+    if isinstance(html, str):
+        html = html.encode('utf-8', 'ignore')
+
+    for marker in APP_SHELL_MARKERS:
+        if marker.search(html):
+            return 'app_shell'
+
+    script_bytes = sum(len(block) for block in SCRIPT_BLOCK.findall(html))
+    without_code = STYLE_BLOCK.sub(b' ', SCRIPT_BLOCK.sub(b' ', html))
+    visible_text = b' '.join(ANY_TAG.sub(b' ', without_code).split())
+
+    if len(visible_text) < MIN_VISIBLE_TEXT and script_bytes:
+        return 'little_text'
+    if script_bytes / len(html) > MAX_SCRIPT_SHARE:
+        return 'script_heavy'
+    return None
+
+
+def find_browser():
+    """Path of a local Chrome/Chromium, or None"""
+    for name in BROWSER_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+class HeadlessRenderer:
+    def __init__(self, browser=None, max_concurrent=2, timeout=30, wait_ms=5000):
+        """
+        Args:
+            browser: Path to chrome/chromium (found on PATH if not given)
+            max_concurrent: Browsers allowed to run at the same time
+            timeout: Seconds before a render is abandoned
+            wait_ms: Time the page's scripts get to run before the DOM is saved
+        """
+        self.browser = browser or find_browser()
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.wait_ms = wait_ms
+        self._pool = None
+        self.lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+
+    @property
+    def available(self):
+        return self.browser is not None
+
+    def command(self, url):
+        command = [
+            self.browser, '--headless=new', '--disable-gpu', '--disable-extensions',
+            '--mute-audio', f'--virtual-time-budget={self.wait_ms}', '--dump-dom', url
+        ]
+        # Chrome refuses to run as root with its sandbox enabled
+        if hasattr(os, 'geteuid') and os.geteuid() == 0:
+            command.insert(1, '--no-sandbox')
+        return command
+
+    def render(self, url):
+        """Return the rendered HTML of a page as bytes, or None"""
+        if not self.available:
+            return None
+        try:
+            completed = subprocess.run(self.command(url), capture_output=True,
+                                       timeout=self.timeout, check=True)
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"Render failed for {url}: {e}")
+            with self.lock:
+                self.failed += 1
+            return None
+        with self.lock:
+            self.rendered += 1
+        return completed.stdout
+
+    def render_and_extract(self, crawler, url, state_id=None):
+        """Render a page and run the crawler's extractors on the result"""
+        html = self.render(url)
+        if not html:
+            return None
+        results = crawler.crawl_html(html, url, state_id)
+        results['rendered'] = True
+        return results
+
+    def submit(self, crawler, url, state_id=None):
+        """Queue a page for rendering; returns a Future"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent)
+        return self._pool.submit(self.render_and_extract, crawler, url, state_id)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    renderer = HeadlessRenderer()
+    print(f"Browser: {renderer.browser or 'not found'}")
+    for filename in sys.argv[1:]:
+        with open(filename, 'rb') as file:
+            print(f"{filename}: {needs_rendering(file.read()) or 'static'}")
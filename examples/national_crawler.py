@@ -0,0 +1,273 @@
+"""
+National Health Resource Crawler
+Crawls every state CSV in one run, spreading the work across several
+worker threads. Each worker owns a queue of hosts and steals work from
+the busiest worker when its own queue runs dry.
+"""
+
+import glob
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from batch_crawler_example import BatchHealthCrawler
+
+
+def host_key(url):
+    """Return the host of a URL without a leading 'www.'"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class WorkerQueue:
+    """A deque of work units plus the total expected cost still in it"""
+
+    def __init__(self):
+        self.units = deque()
+        self.cost = 0.0
+        self.lock = threading.Lock()
+
+    def push(self, unit):
+        with self.lock:
+            self.units.append(unit)
+            self.cost += unit['cost']
+
+    def pop_own(self):
+        """The owning worker takes the most expensive unit from the front"""
+        with self.lock:
+            if not self.units:
+                return None
+            unit = self.units.popleft()
+            self.cost -= unit['cost']
+            return unit
+
+    def upcoming_urls(self, count):
+        """First URL of each of the next few units, for DNS prefetching"""
+        with self.lock:
+            return [unit['sites'][0]['pha_url'] for unit in list(self.units)[:count]]
+
+    def steal(self):
+        """Another worker takes the cheapest unit from the back"""
+        with self.lock:
+            if not self.units:
+                return None
+            unit = self.units.pop()
+            self.cost -= unit['cost']
+            return unit
+
+
+class NationalBatchCrawler(BatchHealthCrawler):
+    def __init__(self, workers=8, store=None, data_dir="../data/websites",
+                 timings_file="crawl_timings.json", crawler_options=None):
+        """
+        Args:
+            workers: Number of worker threads
+            store: Optional SQLiteResultStore for the results
+            data_dir: Folder with the us-*.csv files
+            timings_file: JSON file of past crawl times per community_id,
+                          used to estimate cost (updated after each run)
+            crawler_options: Keyword arguments for each worker's crawler
+        """
+        super().__init__(store=store, crawler_options=crawler_options)
+        self.workers = workers
+        self.data_dir = data_dir
+        self.timings_file = timings_file
+        self.past_timings = self.load_timings()
+        self.lock = threading.Lock()
+
+    def load_timings(self):
+        """Load past crawl times, if a timings file exists"""
+        if not self.timings_file or not os.path.exists(self.timings_file):
+            return {}
+        with open(self.timings_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def save_timings(self):
+        """Remember how long each community took for the next run"""
+        if not self.timings_file:
+            return
+        for result in self.results:
+            if 'crawl_seconds' in result:
+                self.past_timings[result['community_id']] = result['crawl_seconds']
+        with open(self.timings_file, 'w', encoding='utf-8') as file:
+            json.dump(self.past_timings, file, indent=2)
+
+    def load_all_websites(self, state_codes=None):
+        """
+        Load every state CSV (or only the given states) into one list
+
+        Rows without a pha_url are skipped since there is nothing to crawl.
+        """
+        if state_codes:
+            codes = [code.lower() for code in state_codes]
+        else:
+            pattern = os.path.join(self.data_dir, "us-*.csv")
+            codes = sorted(os.path.basename(path)[3:-4] for path in glob.glob(pattern))
+            codes = [code for code in codes if code != 'test']
+
+        websites = []
+        for code in codes:
+            for site in self.load_state_websites(code):
+                if site['pha_url']:
+                    websites.append(site)
+        return websites
+
+    def estimate_cost(self, site, delay):
+        """
+        Estimate how many seconds a site will take
+
+        Past timings win when we have them. Otherwise larger communities
+        are assumed to have larger, slower sites.
+        """
+        if site['community_id'] in self.past_timings:
+            return self.past_timings[site['community_id']] + delay
+
+        try:
+            population = int(site['population'])
+        except (TypeError, ValueError):
+            population = 0
+        return 1.0 + math.log10(population + 1) / 2 + delay
+
+    def build_work_units(self, websites, delay):
+        """
+        Group sites by host so only one worker talks to a host at a time
+
+        Many counties share a host (for example every Alabama county page
+        lives on alabamapublichealth.gov), so a host is the unit of work.
+        """
+        by_host = {}
+        for site in websites:
+            by_host.setdefault(host_key(site['pha_url']), []).append(site)
+
+        units = []
+        for host, sites in by_host.items():
+            cost = sum(self.estimate_cost(site, delay) for site in sites)
+            units.append({'host': host, 'sites': sites, 'cost': cost})
+        return units
+
+    def assign_units(self, units):
+        """
+        Give each unit to the least loaded worker, most expensive first
+
+        Each worker queue ends up ordered from expensive to cheap, so
+        owners start on big hosts and thieves take the small ones.
+        """
+        queues = [WorkerQueue() for _ in range(self.workers)]
+        for unit in sorted(units, key=lambda u: u['cost'], reverse=True):
+            min(queues, key=lambda q: q.cost).push(unit)
+        return queues
+
+    def next_unit(self, worker_id, queues):
+        """Take work from our own queue, or steal from the busiest one"""
+        unit = queues[worker_id].pop_own()
+        if unit:
+            return unit
+
+        victims = sorted(
+            (q for i, q in enumerate(queues) if i != worker_id),
+            key=lambda q: q.cost, reverse=True
+        )
+        for victim in victims:
+            unit = victim.steal()
+            if unit:
+                return unit
+        return None
+
+    def crawl_site(self, crawler, site):
+        """Crawl one site and attach the CSV metadata"""
+        start = time.time()
+        try:
+            results = crawler.crawl_page_with_categories(site['pha_url'], site['state_id'])
+        except Exception as e:
+            results = {'url': site['pha_url'], 'error': str(e), 'resources': []}
+
+        self.add_site_metadata(results, site)
+        results['crawl_seconds'] = round(time.time() - start, 3)
+        return results
+
+    def worker_loop(self, worker_id, queues, run_id, delay):
+        # Each worker gets its own crawler so sessions are not shared
+        crawler = self.new_crawler()
+        while True:
+            unit = self.next_unit(worker_id, queues)
+            if unit is None:
+                return
+
+            # Resolve the next hosts while this one is being crawled
+            connection_cache = self.crawler_options.get('connection_cache')
+            if connection_cache:
+                connection_cache.prefetch(queues[worker_id].upcoming_urls(2))
+
+            for i, site in enumerate(unit['sites']):
+                # Only sites on the same host need a polite pause
+                if i > 0 and not self.adaptive_rate:
+                    time.sleep(delay)
+
+                results = self.crawl_site(crawler, site)
+                with self.lock:
+                    self.results.append(results)
+                    if self.store:
+                        self.store.add_site_result(run_id, results)
+                    done = len(self.results)
+
+                total_resources = len(results.get('resources', []))
+                print(f"[worker {worker_id}] ({done}) {site['state_id']} {site['name']}: "
+                      f"{total_resources} resources")
+
+    def crawl_all(self, state_codes=None, delay=2, max_sites=None):
+        """
+        Crawl all states (or the given list) with work stealing
+
+        Args:
+            state_codes: List of state codes, or None for every CSV file
+            delay: Seconds to wait between requests to the same host
+            max_sites: Optional limit on the total number of sites
+        """
+        websites = self.load_all_websites(state_codes)
+        if max_sites:
+            websites = websites[:max_sites]
+        if not websites:
+            print("No websites to crawl")
+            return
+
+        units = self.build_work_units(websites, delay)
+        queues = self.assign_units(units)
+        print(f"\n=== Crawling {len(websites)} sites on {len(units)} hosts "
+              f"with {self.workers} workers ===")
+
+        label = ",".join(code.upper() for code in state_codes) if state_codes else "US"
+        run_id = self.store.start_run(label) if self.store else None
+
+        threads = [
+            threading.Thread(target=self.worker_loop, args=(i, queues, run_id, delay))
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self.store:
+            self.store.finish_run(run_id)
+        self.save_timings()
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl several states at once")
+    parser.add_argument('states', nargs='*', help="State codes (default: all states)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=2)
+    parser.add_argument('--max-sites', type=int, default=None)
+    args = parser.parse_args()
+
+    national_crawler = NationalBatchCrawler(workers=args.workers)
+    national_crawler.crawl_all(args.states or None, delay=args.delay, max_sites=args.max_sites)
+    national_crawler.print_summary()
+    national_crawler.save_results()
@@ -0,0 +1,279 @@
+"""
+Near-Duplicate Page Detection
+Many county pages are copies of one state template: the same text with
+a different county name and phone number. Parsing and extracting each
+copy from scratch produces almost the same resources again.
+
+Each page gets a 64-bit SimHash of its words. Pages whose SimHashes
+differ in only a few bits are near-duplicates. The fingerprint is cut
+into 8 bands of 8 bits, and pages are filed under each band, so a page
+within 7 bits of an earlier page always shares at least one band with
+it and is found with 8 dict lookups instead of a scan.
+
+For a near-duplicate, the page is split into blocks (paragraphs, list
+items, table cells) and compared with the template page block by block:
+- template resources whose text is still on the page are reused
+- only the changed blocks are parsed and run through the extractors
+
+A resource's context comes from the containers around it (a phone in
+<div class="crisis"> is a crisis line). Each changed block is parsed
+inside copies of the start tags that enclose it on the page, found with
+one regex pass over the tags, so its resources get the same context as
+in a full extraction.
+"""
+
+import copy
+import hashlib
+import html
+import re
+import threading
+
+BLOCK_START = re.compile(r'(?=<(?:p|div|li|td|th|h[1-6]|address|section|article|tr|dd|dt)\b)',
+                         re.IGNORECASE)
+# JSON-LD stays: its text changes when the page's contact details change
+SCRIPT_STYLE = re.compile(r'<(script(?![^>]*ld\+json)|style)\b.*?</\1\s*>',
+                          re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r'<[^>]*>')
+START_END_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)\b[^>]*>')
+WORD = re.compile(r'\w+')
+NON_DIGITS = re.compile(r'\D')
+
+# Never closed, so never an ancestor
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+             'meta', 'source', 'track', 'wbr'}
+# Already wrapped around the changed blocks
+DOCUMENT_TAGS = {'html', 'head', 'body'}
+# Start tags that end an open element of the same kind (<li>..<li>)
+SELF_ENDING = {'p', 'li', 'td', 'th', 'tr', 'dt', 'dd', 'option'}
+
+BITS = 64
+BANDS = 8
+BAND_BITS = BITS // BANDS
+
+
+def split_blocks(text):
+    """Return [(block hash, block text, block html, offset)] for a decoded page"""
+    blocks = []
+    offset = 0
+    for chunk in BLOCK_START.split(text):
+        block_text = " ".join(html.unescape(TAG.sub(' ', SCRIPT_STYLE.sub(' ', chunk))).split())
+        if block_text:
+            digest = hashlib.blake2b(block_text.encode('utf-8'), digest_size=8).digest()
+            blocks.append((digest, block_text, chunk, offset))
+        offset += len(chunk)
+    return blocks
+
+
+def enclosing_tags(text, offsets):
+    """
+    Start tags of the elements open at each offset, outermost first
+
+    Args:
+        text: Decoded page
+        offsets: Positions in text, in ascending order
+
+    Returns one list of (tag name, start tag) per offset.
+    """
+    stack = []
+    enclosing = []
+    pending = iter(offsets)
+    offset = next(pending, None)
+    for match in START_END_TAG.finditer(SCRIPT_STYLE.sub(lambda m: ' ' * len(m.group()), text)):
+        while offset is not None and offset <= match.start():
+            enclosing.append(list(stack))
+            offset = next(pending, None)
+        if offset is None:
+            break
+        name = match.group(2).lower()
+        if name in VOID_TAGS or name in DOCUMENT_TAGS or match.group().endswith('/>'):
+            continue
+        if match.group(1):
+            names = [open_name for open_name, _ in stack]
+            if name in names:
+                del stack[len(names) - 1 - names[::-1].index(name):]
+        else:
+            if stack and stack[-1][0] in SELF_ENDING and (stack[-1][0] == name or name not in SELF_ENDING):
+                stack.pop()
+            stack.append((name, match.group()))
+    while offset is not None:
+        enclosing.append(list(stack))
+        offset = next(pending, None)
+    return enclosing
+
+
+def simhash(words, shingle=3):
+    """64-bit SimHash of the word shingles ('public health department', ...)"""
+    rows = []
+    for i in range(max(1, len(words) - shingle + 1)):
+        feature = " ".join(words[i:i + shingle]).encode('utf-8')
+        rows.append(format(int.from_bytes(hashlib.blake2b(feature, digest_size=8).digest(), 'big'),
+                           '064b'))
+    # Each bit is set when most features have it set; zip(*rows) walks the columns
+    half = len(rows) / 2
+    return int("".join('1' if column.count('1') > half else '0' for column in zip(*rows)), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class PageFingerprint:
+    """A decoded page's blocks and SimHash"""
+
+    def __init__(self, text):
+        self.text = text
+        self.blocks = split_blocks(text)
+        self.words = WORD.findall(" ".join(block[1] for block in self.blocks).lower())
+        self.value = simhash(self.words)
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance=6, min_words=80, max_pages=5000, max_changed=0.3):
+        """
+        Args:
+            max_distance: Differing SimHash bits that still count as a
+                          near-duplicate (at most BANDS - 1 = 7)
+            min_words: Shorter pages are always extracted in full
+            max_pages: Template pages kept in the index
+            max_changed: Extract in full when more than this share of
+                         the blocks changed
+        """
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance must be below {BANDS}")
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.max_pages = max_pages
+        self.max_changed = max_changed
+        self.tables = [{} for _ in range(BANDS)]
+        self.pages = []
+        self.lock = threading.Lock()
+        self.reused = 0
+        self.blocks_skipped = 0
+
+    def __getstate__(self):
+        # Worker processes each build their own index
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def bands(self, value):
+        mask = (1 << BAND_BITS) - 1
+        return [(value >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+    def find(self, page, state_id=None):
+        """
+        Return the closest indexed page to a fingerprint, or None
+
+        Only pages from the same state are used, since phone and ZIP
+        checks depend on the state.
+        """
+        if len(page.words) < self.min_words:
+            return None
+        best, best_distance = None, self.max_distance + 1
+        with self.lock:
+            for table, key in zip(self.tables, self.bands(page.value)):
+                for entry in table.get(key, ()):
+                    distance = hamming(page.value, entry['value'])
+                    if distance < best_distance and entry['state_id'] == state_id:
+                        best, best_distance = entry, distance
+        return best
+
+    def add(self, page, url, state_id, resources):
+        """Index a fully extracted page so later copies can reuse it"""
+        page.text = None  # Only needed while the page itself is extracted
+        if len(page.words) < self.min_words:
+            return
+        entry = {
+            'url': url,
+            'state_id': state_id,
+            'value': page.value,
+            'blocks': {block[0] for block in page.blocks},
+            'resources': copy.deepcopy(resources)
+        }
+        with self.lock:
+            if len(self.pages) >= self.max_pages:
+                return
+            self.pages.append(entry)
+            for table, key in zip(self.tables, self.bands(page.value)):
+                table.setdefault(key, []).append(entry)
+
+    def extract_changed(self, crawler, page, template, state_id=None):
+        """
+        Resources for a near-duplicate page, extracting only changed blocks
+
+        Args:
+            crawler: CategorizedHealthCrawler whose extractors to run
+            page: PageFingerprint of the new page
+            template: Index entry returned by find()
+            state_id: State of the site
+
+        Returns a list of resources, or None when too much changed and
+        the page should be extracted in full.
+        """
+        changed = [block for block in page.blocks if block[0] not in template['blocks']]
+        if len(changed) > self.max_changed * len(page.blocks):
+            return None
+        unchanged = [block for block in page.blocks if block[0] in template['blocks']]
+        unchanged_text = " ".join(block[1] + " " + block[2] for block in unchanged).lower()
+        # Phones from tel: links are written differently in the href
+        unchanged_digits = " ".join(NON_DIGITS.sub('', block[2]) for block in unchanged)
+
+        # Template resources still on the page, in its text or its links
+        # (drops the old county's phone)
+        resources = []
+        for resource in template['resources']:
+            value = str(resource['value'])
+            if resource['type'] == 'phone_number':
+                found = NON_DIGITS.sub('', value) in unchanged_digits
+            else:
+                found = value.lower() in unchanged_text
+            if found:
+                resources.append(copy.deepcopy(resource))
+        if changed:
+            seen = {(resource['type'], resource['value']) for resource in resources}
+            for resource in crawler.extract_resources(self.changed_soup(page, changed), state_id=state_id):
+                if (resource['type'], resource['value']) not in seen:
+                    seen.add((resource['type'], resource['value']))
+                    resources.append(resource)
+
+        with self.lock:
+            self.reused += 1
+            self.blocks_skipped += len(page.blocks) - len(changed)
+        return resources
+
+    def changed_soup(self, page, changed):
+        """Parse the changed blocks, each inside its enclosing start tags"""
+        from bs4 import BeautifulSoup
+
+        parts = ["<html><body>"]
+        for tags, block in zip(enclosing_tags(page.text, [block[3] for block in changed]), changed):
+            parts.extend(start_tag for _, start_tag in tags)
+            parts.append(block[2])
+            # Close whatever the block itself left open; extra end tags are ignored
+            parts.extend(f"</{name}>" for name, _ in reversed(tags))
+        parts.append("</body></html>")
+        return BeautifulSoup("".join(parts), 'html.parser')
+
+    def print_summary(self):
+        print(f"\nNear-duplicates: {self.reused} pages reused a template "
+              f"({self.blocks_skipped} unchanged blocks skipped), "
+              f"{len(self.pages)} template pages indexed")
+
+
+# Example usage
+if __name__ == "__main__":
+    paragraph = ("<p>The {county} County Public Health Department offers flu shots, "
+                 "immunizations for children and adults, WIC nutrition services, "
+                 "family planning, and testing for sexually transmitted infections. "
+                 "Walk-in hours are Monday through Friday from 8 to 5.</p>")
+    extra = "".join(f"<li>Service number {i} is available at every clinic location</li>" for i in range(12))
+    pages = {county: f"<html><body><h1>{county} County Health</h1>{paragraph.format(county=county)}"
+                     f"<ul>{extra}</ul><p>Call {phone}</p></body></html>"
+             for county, phone in [('Adams', '970-555-1234'), ('Baker', '541-523-8211')]}
+
+    fingerprints = {county: PageFingerprint(text) for county, text in pages.items()}
+    print(f"Distance: {hamming(fingerprints['Adams'].value, fingerprints['Baker'].value)} bits")
@@ -0,0 +1,117 @@
+"""
+Page Encoding
+Turns fetched page bytes into text before BeautifulSoup sees them.
+
+Given bytes, BeautifulSoup runs UnicodeDammit, which tries encoding after
+encoding over the whole page. On large pages that is slow, and on pages
+mixing UTF-8 and Windows-1252 it sometimes guesses wrong, which garbles
+names and addresses ("SeÃ±or", "Suite Â· 100").
+
+Most pages say what they are. We check, in order:
+1. a byte order mark (it always wins, as in browsers)
+2. the charset in the HTTP Content-Type header
+3. a <meta charset> / http-equiv tag in the first 2 KB
+4. strict UTF-8, which is what most undeclared pages are
+Only a page that fails all four goes through UnicodeDammit, trying
+Windows-1252 first.
+"""
+
+import codecs
+import re
+
+# These codecs remove the BOM while decoding
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Browsers read these labels as Windows-1252, and so do servers' pages
+WINDOWS_1252_ALIASES = {'iso-8859-1', 'latin-1', 'latin1', 'us-ascii', 'ascii'}
+
+HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_SCAN_BYTES = 2048
+
+
+def normalize_charset(label):
+    """Return a Python codec name for a charset label, or None if unknown"""
+    if not label:
+        return None
+    label = label.strip().lower()
+    if label in WINDOWS_1252_ALIASES:
+        return 'cp1252'
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+def resolve_charset(content, content_type=None):
+    """
+    Find a page's encoding without decoding it
+
+    Args:
+        content: Page bytes
+        content_type: The Content-Type response header, if known
+
+    Returns (encoding, source) where source is 'bom', 'header' or
+    'meta', or (None, None) if the page does not say.
+    """
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding, 'bom'
+
+    if content_type:
+        match = HEADER_CHARSET.search(content_type)
+        encoding = normalize_charset(match.group(1)) if match else None
+        if encoding:
+            return encoding, 'header'
+
+    match = META_CHARSET.search(content, 0, META_SCAN_BYTES)
+    if match:
+        encoding = normalize_charset(match.group(1).decode('ascii', 'ignore'))
+        # A page that was decoded to text before it was saved may still
+        # claim UTF-16; its bytes cannot be UTF-16 if the tag was readable
+        if encoding and not encoding.startswith('utf-16'):
+            return encoding, 'meta'
+    return None, None
+
+
+def decode_html(content, content_type=None):
+    """
+    Decode page bytes once; returns (text, encoding)
+
+    Text is returned unchanged. UnicodeDammit (slow) is only used when
+    the page declares nothing and is not valid UTF-8.
+    """
+    if isinstance(content, str):
+        return content, None
+
+    encoding, source = resolve_charset(content, content_type)
+    if encoding:
+        return content.decode(encoding, 'replace'), encoding
+
+    try:
+        return content.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    # Undeclared US pages that are not UTF-8 are nearly always Windows-1252
+    from bs4 import UnicodeDammit
+    dammit = UnicodeDammit(content, is_html=True, user_encodings=['windows-1252'])
+    if dammit.unicode_markup is None:
+        return content.decode('cp1252', 'replace'), 'cp1252'
+    return dammit.unicode_markup, dammit.original_encoding
+
+
+# Example usage
+if __name__ == "__main__":
+    samples = [
+        ("Señor".encode('utf-8'), 'text/html; charset=UTF-8'),
+        (b'<meta charset="windows-1252"><p>Se\xf1or</p>', None),
+        (codecs.BOM_UTF8 + "Señor".encode('utf-8'), 'text/html; charset=iso-8859-1'),
+        (b'<p>Se\xf1or Clinic</p>', 'text/html'),
+    ]
+    for content, content_type in samples:
+        print(f"{content_type}: {decode_html(content, content_type)}")
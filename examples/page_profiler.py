@@ -0,0 +1,212 @@
+"""
+Outlier Page Profiler
+Average timings hide the few county pages that take far longer to
+process than the rest. This profiler watches how long each page's
+extraction takes and saves a profile only for pages slower than a
+percentile of the pages seen so far (95th by default), together with
+the page URL and size.
+
+Two modes:
+- 'replay' (default): pages run normally and are timed. A slow page is
+  run through the extractors a second time under cProfile; the HTML is
+  already in memory, so this needs no new request. The crawler replays
+  on a copy without its template cache and near-duplicate index, so the
+  second run changes nothing. Saves a .prof file
+  (open with `python -m pstats` or snakeviz).
+- 'sampling': a background thread records the stack of each crawling
+  thread every few milliseconds while the page runs. Profiles of normal
+  pages are thrown away. Saves a .folded file (one "a;b;c count" line
+  per stack, the input format for flame graph tools).
+
+Every saved profile is listed in profiles/index.jsonl.
+"""
+
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from a background thread"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.active = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.active[thread_id] = Counter()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[fold_stack(frame)] += 1
+
+
+def fold_stack(frame):
+    """Turn a frame into 'outer;...;inner' with file and function names"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class OutlierProfiler:
+    def __init__(self, output_dir="profiles", percentile=95, min_pages=20,
+                 mode='replay', window=500, max_profiles=50, interval=0.005,
+                 min_seconds=0.25):
+        """
+        Args:
+            output_dir: Folder for the saved profiles
+            percentile: Pages slower than this percentile get profiled
+            min_pages: Pages to time before anything counts as an outlier
+            mode: 'replay' (cProfile) or 'sampling' (stack samples)
+            window: Recent pages the percentile is computed over
+            max_profiles: Stop saving once this many profiles exist
+            interval: Seconds between stack samples in sampling mode
+            min_seconds: Never profile pages faster than this, even
+                         above the percentile
+        """
+        if mode not in ('replay', 'sampling'):
+            raise ValueError("mode must be 'replay' or 'sampling'")
+        self.output_dir = output_dir
+        self.percentile = percentile
+        self.min_pages = min_pages
+        self.mode = mode
+        self.max_profiles = max_profiles
+        self.min_seconds = min_seconds
+        self.timings = deque(maxlen=window)
+        self.saved = []
+        # Profile slots taken, including profiles still being written
+        self.reserved = 0
+        self.lock = threading.Lock()
+        self.sampler = StackSampler(interval) if mode == 'sampling' else None
+
+    def threshold(self):
+        """Current outlier cutoff in seconds, or None while warming up"""
+        with self.lock:
+            if len(self.timings) < self.min_pages:
+                return None
+            ordered = sorted(self.timings)
+        return ordered[int(self.percentile / 100 * (len(ordered) - 1))]
+
+    def run(self, extract, html, url, replay=None):
+        """
+        Call extract(html, url), profiling it if it turns out to be slow
+
+        Used by CategorizedHealthCrawler when a profiler is passed in
+        crawler_options; returns whatever extract returns.
+
+        Args:
+            extract: Function to time
+            html: Page passed to extract
+            url: Page URL passed to extract
+            replay: Function run under cProfile for a slow page in replay
+                    mode (default: extract). Pass one without side effects
+                    when running extract twice would change shared state.
+        """
+        thread_id = threading.get_ident()
+        if self.sampler:
+            self.sampler.start(thread_id)
+        start = time.perf_counter()
+        try:
+            results = extract(html, url)
+        finally:
+            seconds = time.perf_counter() - start
+            stacks = self.sampler.stop(thread_id) if self.sampler else None
+
+        threshold = self.threshold()
+        # stacks is empty when the page was too quick for a single sample
+        sampled = stacks is None or bool(stacks)
+        with self.lock:
+            self.timings.append(seconds)
+            # Check and take a profile slot together, so threads racing
+            # past the check cannot save more than max_profiles
+            wanted = (sampled and threshold is not None
+                      and seconds > max(threshold, self.min_seconds)
+                      and self.reserved < self.max_profiles)
+            if wanted:
+                self.reserved += 1
+        if not wanted:
+            return results
+
+        try:
+            if self.sampler:
+                filename = self.save_folded(url, stacks)
+            else:
+                filename = self.save_replay(replay or extract, html, url)
+        except Exception:
+            with self.lock:
+                self.reserved -= 1
+            raise
+        self.record(url, html, seconds, threshold, filename)
+        return results
+
+    def profile_name(self, url, extension):
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', url).strip('_')[:80] or 'page'
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        return os.path.join(self.output_dir, f"{stamp}_{slug}.{extension}")
+
+    def save_replay(self, extract, html, url):
+        profile = cProfile.Profile()
+        profile.runcall(extract, html, url)
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = self.profile_name(url, 'prof')
+        profile.dump_stats(filename)
+        return filename
+
+    def save_folded(self, url, stacks):
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = self.profile_name(url, 'folded')
+        with open(filename, 'w', encoding='utf-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        return filename
+
+    def record(self, url, html, seconds, threshold, filename):
+        entry = {
+            'url': url,
+            'bytes': len(html),
+            'seconds': round(seconds, 4),
+            'threshold': round(threshold, 4),
+            'mode': self.mode,
+            'profile': os.path.basename(filename),
+            'saved_at': datetime.now().isoformat()
+        }
+        with self.lock:
+            self.saved.append(entry)
+            with open(os.path.join(self.output_dir, "index.jsonl"), 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + "\n")
+        print(f"Profiled slow page {url}: {seconds * 1000:.0f} ms "
+              f"(cutoff {threshold * 1000:.0f} ms) -> {filename}")
+
+    def print_summary(self):
+        """List the slowest profiled pages"""
+        threshold = self.threshold()
+        cutoff = f"{threshold * 1000:.0f} ms" if threshold is not None else "n/a"
+        print(f"\nPages timed: {len(self.timings)}, p{self.percentile} cutoff: {cutoff}")
+        for entry in sorted(self.saved, key=lambda e: e['seconds'], reverse=True)[:10]:
+            print(f"  {entry['seconds'] * 1000:.0f} ms, {entry['bytes'] / 1024:.0f} KB  "
+                  f"{entry['url']}  ({entry['profile']})")
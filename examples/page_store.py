@@ -0,0 +1,189 @@
+"""
+Raw Page Store
+Saves the HTML of every fetched page so improved extractors can be run
+again over old crawls without fetching anything.
+
+Pages are stored by the SHA-256 of their body and compressed with zlib,
+so a page that did not change between crawls (or a template shared by
+many counties) is only stored once:
+
+    page_store/
+        index.db              url -> hash, fetched_at, content_type
+        objects/3f/3fa2...z   compressed page bodies
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetches (
+    fetch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT,
+    hash TEXT,
+    fetched_at TEXT,
+    size INTEGER,
+    content_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fetches_url ON fetches (url, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_fetches_hash ON fetches (hash);
+"""
+
+
+class RawPageStore:
+    def __init__(self, folder="page_store", level=6):
+        """
+        Open (or create) a page store
+
+        Args:
+            folder: Folder for the index and the compressed pages
+            level: zlib compression level (1 = fastest, 9 = smallest)
+        """
+        self.folder = folder
+        self.level = level
+        os.makedirs(os.path.join(folder, "objects"), exist_ok=True)
+        # Crawler worker threads save pages through one connection
+        self.conn = sqlite3.connect(os.path.join(folder, "index.db"), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(fetches)")]
+        if 'content_type' not in columns:
+            # Stores created before the Content-Type was kept
+            self.conn.execute("ALTER TABLE fetches ADD COLUMN content_type TEXT")
+        self.lock = threading.Lock()
+
+    def object_path(self, page_hash):
+        return os.path.join(self.folder, "objects", page_hash[:2], page_hash + ".z")
+
+    def save(self, url, body, content_type=None):
+        """
+        Store one fetched body and record the fetch; returns its hash
+
+        Args:
+            url: The URL that was requested
+            body: Response body bytes
+            content_type: The Content-Type header, needed to decode the
+                          body the same way on reprocessing
+        """
+        page_hash = hashlib.sha256(body).hexdigest()
+        path = self.object_path(page_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary name so readers never see half a file
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(zlib.compress(body, self.level))
+            os.replace(temp_path, path)
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO fetches (url, hash, fetched_at, size, content_type) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, page_hash, datetime.now().isoformat(), len(body), content_type)
+            )
+        return page_hash
+
+    def load(self, page_hash):
+        """Return a stored page body as bytes"""
+        return load_object(self.folder, page_hash)
+
+    def latest_pages(self, urls=None):
+        """
+        Return (url, hash, fetched_at, content_type) for the newest fetch of each URL
+
+        Args:
+            urls: Only these URLs (default: every stored URL)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url, hash, MAX(fetched_at), content_type FROM fetches "
+                "GROUP BY url ORDER BY url"
+            ).fetchall()
+        if urls is not None:
+            wanted = set(urls)
+            rows = [row for row in rows if row[0] in wanted]
+        return rows
+
+    def history(self, url):
+        """Every stored fetch of a URL, oldest first"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT hash, fetched_at, size FROM fetches WHERE url = ? ORDER BY fetched_at",
+                (url,)
+            ).fetchall()
+
+    def stats(self):
+        """Number of fetches, distinct pages, raw bytes and bytes on disk"""
+        with self.lock:
+            fetches, pages, raw_bytes = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT hash), COALESCE(SUM(size), 0) FROM fetches"
+            ).fetchone()
+        disk_bytes = 0
+        for root, _, files in os.walk(os.path.join(self.folder, "objects")):
+            disk_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return {'fetches': fetches, 'pages': pages, 'raw_bytes': raw_bytes, 'disk_bytes': disk_bytes}
+
+    def reprocess(self, urls=None, workers=4, crawler_options=None, state_ids=None):
+        """
+        Run the current extractors over stored pages, in worker processes
+
+        Args:
+            urls: Only these URLs (default: every stored URL)
+            workers: Number of processes (extraction is CPU-bound)
+            crawler_options: Keyword arguments for each process's crawler
+            state_ids: {url: state_id}, so phones and ZIPs are checked
+                       against the site's state as in the original crawl
+
+        Returns a list of crawl results in the crawl_page_with_categories
+        format, with 'fetched_at' set to when the page was stored.
+        """
+        pages = self.latest_pages(urls)
+        state_ids = state_ids or {}
+        jobs = [(self.folder, url, page_hash, fetched_at, content_type, state_ids.get(url),
+                 crawler_options or {})
+                for url, page_hash, fetched_at, content_type in pages]
+        print(f"Reprocessing {len(jobs)} stored pages with {workers} processes...")
+
+        if workers <= 1:
+            return [extract_stored_page(job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(extract_stored_page, jobs, chunksize=8))
+
+    def close(self):
+        self.conn.close()
+
+
+def load_object(folder, page_hash):
+    path = os.path.join(folder, "objects", page_hash[:2], page_hash + ".z")
+    with open(path, 'rb') as file:
+        return zlib.decompress(file.read())
+
+
+# One crawler per worker process, created on its first page
+_process_crawler = None
+
+
+def extract_stored_page(job):
+    """Worker: decompress one stored page and run the extractors on it"""
+    global _process_crawler
+    folder, url, page_hash, fetched_at, content_type, state_id, crawler_options = job
+    if _process_crawler is None:
+        from categorized_example import CategorizedHealthCrawler
+        _process_crawler = CategorizedHealthCrawler(**crawler_options)
+
+    results = _process_crawler.crawl_html(load_object(folder, page_hash), url, state_id, content_type)
+    results['fetched_at'] = fetched_at
+    results['page_hash'] = page_hash
+    return results
+
+
+# Example usage
+if __name__ == "__main__":
+    store = RawPageStore()
+    stats = store.stats()
+    print(f"{stats['fetches']} fetches of {stats['pages']} distinct pages")
+    print(f"{stats['raw_bytes'] / 1024:.0f} KB of HTML stored in {stats['disk_bytes'] / 1024:.0f} KB")
+    store.close()
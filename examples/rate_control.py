@@ -0,0 +1,167 @@
+"""
+Adaptive Rate Control
+Replaces the fixed delay between requests with a delay per host that
+follows how the server is doing (AIMD - additive increase,
+multiplicative decrease, the same idea TCP uses):
+
+- A fast, successful response shortens the host's delay a little.
+- A slow response, a timeout or a server error doubles it.
+- 429 Too Many Requests and 503 Service Unavailable also double it, and
+  a Retry-After header is always honored. The crawler then retries the
+  request once, if the server asked for no more than max_retry_wait.
+
+So a sturdy CDN is crawled close to min_delay, while a struggling county
+server backs off on its own.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+BACKOFF_STATUSES = {429, 503}
+
+
+def parse_retry_after(value):
+    """Return Retry-After in seconds (it may be a number or an HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateController:
+    def __init__(self, initial_delay=2.0, min_delay=0.25, max_delay=60.0,
+                 step=0.25, backoff=2.0, slow_response=3.0, max_retry_wait=120.0):
+        """
+        Args:
+            initial_delay: Delay for a host we have not seen yet (seconds)
+            min_delay: Never wait less than this between requests to a host
+            max_delay: Never wait more than this (unless Retry-After says so)
+            step: Seconds taken off the delay after each fast response
+            backoff: Factor the delay is multiplied by when a host struggles
+            slow_response: Responses slower than this count as struggling
+            max_retry_wait: Longest Retry-After (seconds) worth waiting out
+                            to retry the same request
+        """
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.backoff = backoff
+        self.slow_response = slow_response
+        self.max_retry_wait = max_retry_wait
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled; worker processes get their own
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc.lower()
+        return self.hosts.setdefault(host, {
+            'delay': self.initial_delay,
+            'next_allowed': 0.0,
+            'requests': 0,
+            'backoffs': 0,
+            'latency': None
+        })
+
+    def wait(self, url):
+        """
+        Sleep until the host may be contacted again, and reserve the slot
+
+        Threads sharing the controller take turns on the same host.
+        Returns the number of seconds slept.
+        """
+        with self.lock:
+            state = self._host(url)
+            now = time.time()
+            start = max(now, state['next_allowed'])
+            state['next_allowed'] = start + state['delay']
+        pause = start - now
+        if pause > 0:
+            time.sleep(pause)
+        return pause
+
+    def record(self, url, status=None, latency=None, retry_after=None):
+        """
+        Update a host's delay after a request
+
+        Args:
+            url: URL that was requested
+            status: HTTP status code, or None if the request failed
+            latency: Seconds the request took
+            retry_after: Seconds the server asked us to wait, if any
+        """
+        with self.lock:
+            state = self._host(url)
+            state['requests'] += 1
+            if latency is not None:
+                # Smoothed response time, shown in the summary
+                previous = state['latency']
+                state['latency'] = latency if previous is None else 0.8 * previous + 0.2 * latency
+
+            struggling = (
+                status is None
+                or status in BACKOFF_STATUSES
+                or status >= 500
+                or (latency is not None and latency > self.slow_response)
+            )
+            if struggling:
+                state['delay'] = min(self.max_delay, max(state['delay'], self.min_delay) * self.backoff)
+                state['backoffs'] += 1
+            else:
+                state['delay'] = max(self.min_delay, state['delay'] - self.step)
+
+            next_allowed = time.time() + state['delay']
+            if retry_after is not None:
+                next_allowed = max(next_allowed, time.time() + retry_after)
+            state['next_allowed'] = max(state['next_allowed'], next_allowed)
+
+    def record_response(self, url, response, latency):
+        """Update a host's delay from a requests Response"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        self.record(url, response.status_code, latency, retry_after)
+
+    def should_retry(self, response, deadline=None):
+        """
+        Is a 429/503 response worth one retry after its Retry-After?
+
+        record_response() has already pushed the host's next slot past
+        the Retry-After, so wait() before the retry sleeps it out.
+
+        Args:
+            response: The requests Response
+            deadline: Optional time.time() value the wait must end before
+        """
+        if response.status_code not in BACKOFF_STATUSES:
+            return False
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None or retry_after > self.max_retry_wait:
+            return False
+        return deadline is None or time.time() + retry_after < deadline
+
+    def delay_for(self, url):
+        with self.lock:
+            return self._host(url)['delay']
+
+    def print_summary(self):
+        """Show the delay each host settled on"""
+        with self.lock:
+            for host, state in sorted(self.hosts.items()):
+                latency = f"{state['latency']:.2f}s" if state['latency'] is not None else "n/a"
+                print(f"{host}: delay {state['delay']:.2f}s, {state['requests']} requests, "
+                      f"{state['backoffs']} backoffs, latency {latency}")
@@ -0,0 +1,197 @@
+"""
+Persistent Redirect Map
+Many CSV URLs are old addresses (http://www.acphd.org) that redirect
+once or twice before the real page. Every run pays for those extra
+round trips again.
+
+The redirect map remembers where each URL ended up, in a JSON file:
+
+    {"http://www.acphd.org": {"final_url": "https://acphd.org/",
+                              "chain": ["http://www.acphd.org", "https://acphd.org/"],
+                              "checked_at": "2024-12-15T16:45:30"}}
+
+The crawler asks the map before fetching and goes straight to the final
+URL. Only chains of permanent redirects (301, 308) are kept; a 302 or
+307 may point somewhere else tomorrow. Entries older than max_age_days
+are still used, but a background thread checks them again (HEAD, or a
+GET for servers that reject HEAD) so the next run has fresh data. If a
+mapped URL fails, the entry is dropped and the original URL is fetched
+instead.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+PERMANENT_REDIRECTS = {301, 308}
+
+
+def is_permanent(status_codes):
+    """True for a non-empty chain of 301/308 redirects"""
+    return bool(status_codes) and all(int(code) in PERMANENT_REDIRECTS for code in status_codes)
+
+
+class RedirectMap:
+    def __init__(self, filename="redirect_map.json", max_age_days=7, refresh_workers=2):
+        """
+        Args:
+            filename: JSON file the map is loaded from and saved to
+            max_age_days: Entries older than this are refreshed in the background
+            refresh_workers: Threads used for background refreshes
+        """
+        self.filename = filename
+        self.max_age = timedelta(days=max_age_days)
+        self.refresh_workers = refresh_workers
+        self.entries = self.load()
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        self._pool = None
+        self._session = None
+        self.hits = 0
+        self.refreshes = 0
+
+    def __getstate__(self):
+        # Worker processes get a copy of the entries, without the threads
+        state = self.__dict__.copy()
+        del state['lock']
+        state['_pool'] = None
+        state['_session'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not self.filename or not os.path.exists(self.filename):
+            return {}
+        with open(self.filename, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def save(self):
+        """Wait for background refreshes, then write the map to disk"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        with self.lock:
+            data = json.dumps(self.entries, indent=2, sort_keys=True)
+        with open(self.filename, 'w', encoding='utf-8') as file:
+            file.write(data)
+
+    def resolve(self, url):
+        """
+        Return the URL to fetch for url: its known final URL, or url itself
+
+        A stale entry is still returned, and a refresh is queued for it.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return url
+            self.hits += 1
+            stale = datetime.now() - datetime.fromisoformat(entry['checked_at']) > self.max_age
+        if stale:
+            self.refresh_later(url)
+        return entry['final_url']
+
+    def record(self, url, response):
+        """
+        Remember where a fetch of url ended up
+
+        Args:
+            url: The URL that was requested
+            response: requests.Response (response.history holds the redirects)
+        """
+        chain = [r.url for r in response.history] + [response.url]
+        with self.lock:
+            if (response.url.rstrip('/') == url.rstrip('/')
+                    or not is_permanent([r.status_code for r in response.history])):
+                # No redirect (any more), or a temporary one: nothing to skip next time
+                self.entries.pop(url, None)
+            else:
+                self.entries[url] = {
+                    'final_url': response.url,
+                    'chain': chain,
+                    'checked_at': datetime.now().isoformat(timespec='seconds')
+                }
+
+    def forget(self, url):
+        with self.lock:
+            self.entries.pop(url, None)
+
+    def refresh_later(self, url):
+        """Check a stale entry again from a background thread"""
+        with self.lock:
+            if url in self.refreshing:
+                return
+            self.refreshing.add(url)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.refresh_workers)
+        self._pool.submit(self.refresh, url)
+
+    def refresh(self, url):
+        import requests
+        from url_health_sweep import RETRY_WITH_GET
+
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update({
+                'User-Agent': 'Educational-Health-Crawler/1.0 (Learning Purpose)'
+            })
+        try:
+            response = self._session.head(url, allow_redirects=True, timeout=15)
+            if response.status_code in RETRY_WITH_GET:
+                # Many servers reject HEAD; read the headers of a GET instead
+                response = self._session.get(url, allow_redirects=True, timeout=15, stream=True)
+                response.close()
+            if response.ok:
+                self.record(url, response)
+                self.refreshes += 1
+            else:
+                self.forget(url)
+        except requests.RequestException:
+            # Keep the old entry; the crawl itself will find out if it broke
+            pass
+        finally:
+            with self.lock:
+                self.refreshing.discard(url)
+
+    def seed_from_sweep(self, rows):
+        """
+        Add the permanent redirects found by url_health_sweep.py
+
+        Args:
+            rows: Rows from UrlHealthSweep.sweep() or load_sweep().values();
+                  rows without a 'redirects' column (older sweeps) are skipped
+        """
+        from url_health_sweep import is_dead, is_redirected
+
+        added = 0
+        with self.lock:
+            for row in rows:
+                permanent = is_permanent((row.get('redirects') or '').split())
+                if (permanent and is_redirected(row) and not is_dead(row)
+                        and row['pha_url'] not in self.entries):
+                    self.entries[row['pha_url']] = {
+                        'final_url': row['final_url'],
+                        'chain': [row['pha_url'], row['final_url']],
+                        'checked_at': datetime.now().isoformat(timespec='seconds')
+                    }
+                    added += 1
+        return added
+
+    def print_summary(self):
+        hops = sum(len(entry['chain']) - 1 for entry in self.entries.values())
+        print(f"\nRedirect map: {len(self.entries)} URLs ({hops} redirects), "
+              f"{self.hits} fetches went straight to the final URL, "
+              f"{self.refreshes} stale entries refreshed")
+
+
+# Example usage
+if __name__ == "__main__":
+    redirect_map = RedirectMap()
+    print(f"{len(redirect_map.entries)} known redirects in {redirect_map.filename}")
+    for url, entry in sorted(redirect_map.entries.items())[:20]:
+        print(f"  {url} -> {entry['final_url']} ({len(entry['chain']) - 1} hops, {entry['checked_at']})")
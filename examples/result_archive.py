@@ -0,0 +1,245 @@
+"""
+Crawl Result Archive
+Keeps every site result from past crawls in one append-only data file,
+with two sorted index files next to it:
+
+    results.dat        length-prefixed JSON records, appended only
+    results.dat.cid    (community_id, offset, length) sorted by community_id
+    results.dat.url    (URL hash, offset, length) sorted by hash
+
+All three files are memory-mapped. Looking up one county is a binary
+search in the index plus one slice of the data file, so a lookup does
+not read the rest of the archive. Community ids start with the state
+("us-ca-alameda"), so a state is one contiguous range of the index.
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+KEY_BYTES = 48
+LENGTH = struct.Struct('<I')
+# key, record offset, record length
+ENTRY = struct.Struct(f'<{KEY_BYTES}sQI')
+
+
+def url_key(url):
+    """Index key for a URL; trailing slashes and case do not matter"""
+    normalized = url.strip().rstrip('/').lower()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest().encode('ascii')
+
+
+def community_key(community_id):
+    return community_id.encode('utf-8')[:KEY_BYTES]
+
+
+class IndexView:
+    """Read-only sequence of keys in a memory-mapped index, for bisect"""
+
+    def __init__(self, path):
+        self.map = None
+        self.count = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.count = len(self.map) // ENTRY.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.map[i * ENTRY.size:i * ENTRY.size + KEY_BYTES].rstrip(b'\0')
+
+    def entry(self, i):
+        key, offset, length = ENTRY.unpack_from(self.map, i * ENTRY.size)
+        return key.rstrip(b'\0'), offset, length
+
+    def entries(self):
+        for i in range(self.count):
+            yield self.entry(i)
+
+    def range(self, low, high):
+        """Entries with low <= key < high"""
+        start = bisect.bisect_left(self, low)
+        end = bisect.bisect_left(self, high)
+        for i in range(start, end):
+            yield self.entry(i)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+class ResultArchive:
+    def __init__(self, path="crawl_archive.dat"):
+        """
+        Open (or create) an archive
+
+        Args:
+            path: Data file; the index files are stored next to it
+        """
+        self.path = path
+        self.pending = []
+        self.data_map = None
+        self.by_community = None
+        self.by_url = None
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        self._open_maps()
+
+    def _open_maps(self):
+        self._close_maps()
+        if os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as file:
+                self.data_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.by_community = IndexView(self.path + '.cid')
+        self.by_url = IndexView(self.path + '.url')
+
+    def _close_maps(self):
+        if self.data_map is not None:
+            self.data_map.close()
+            self.data_map = None
+        for index in (self.by_community, self.by_url):
+            if index:
+                index.close()
+
+    # --- Writing ---
+
+    def add(self, result):
+        """Append one site result; call commit() to update the indexes"""
+        record = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        with open(self.path, 'ab') as file:
+            offset = file.tell()
+            file.write(LENGTH.pack(len(record)))
+            file.write(record)
+
+        self.pending.append((
+            community_key(result.get('community_id') or ''),
+            url_key(result.get('url') or ''),
+            offset, LENGTH.size + len(record)
+        ))
+
+    def commit(self):
+        """Merge the pending entries into both sorted index files"""
+        if not self.pending:
+            return
+        new_community = sorted((c, offset, length) for c, _, offset, length in self.pending)
+        new_url = sorted((u, offset, length) for _, u, offset, length in self.pending)
+        self._merge_index(self.by_community, new_community, self.path + '.cid')
+        self._merge_index(self.by_url, new_url, self.path + '.url')
+        self.pending = []
+        self._open_maps()
+
+    def _merge_index(self, index, new_entries, filename):
+        # Existing entries are already sorted, so one merge pass is enough
+        old_entries = index.entries() if len(index) else iter(())
+        merged = merge_sorted(old_entries, new_entries)
+        temp_name = filename + '.tmp'
+        with open(temp_name, 'wb') as file:
+            for key, offset, length in merged:
+                file.write(ENTRY.pack(key, offset, length))
+        index.close()
+        os.replace(temp_name, filename)
+
+    def import_batch_json(self, filename):
+        """Add every result from a saved batch JSON file; returns the count"""
+        with open(filename, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        results = data.get('results', [data]) if isinstance(data, dict) else data
+        for result in results:
+            self.add(result)
+        self.commit()
+        print(f"Archived {len(results)} results from {filename}")
+        return len(results)
+
+    # --- Reading ---
+
+    def read(self, offset, length):
+        """Load one record from the data file"""
+        return json.loads(self.data_map[offset + LENGTH.size:offset + length])
+
+    def history(self, community_id):
+        """Every archived result for a community, oldest first"""
+        key = community_key(community_id)
+        results = [self.read(offset, length)
+                   for _, offset, length in self.by_community.range(key, key + b'\0')]
+        return [r for r in results if r.get('community_id') == community_id]
+
+    def get(self, community_id):
+        """The most recent archived result for a community, or None"""
+        results = self.history(community_id)
+        return results[-1] if results else None
+
+    def get_url(self, url):
+        """The most recent archived result for a URL, or None"""
+        key = url_key(url)
+        entries = list(self.by_url.range(key, key + b'\0'))
+        return self.read(*entries[-1][1:]) if entries else None
+
+    def scan_state(self, state_code, latest_only=True):
+        """
+        Yield archived results for one state, in community_id order
+
+        Args:
+            state_code: Two-letter state code ('ca')
+            latest_only: Only the newest result for each community
+        """
+        prefix = f"us-{state_code.lower()}-".encode('utf-8')
+        entries = list(self.by_community.range(prefix, prefix + b'\xff'))
+        for i, (key, offset, length) in enumerate(entries):
+            if latest_only and i + 1 < len(entries) and entries[i + 1][0] == key:
+                continue  # A newer result for this community follows
+            yield self.read(offset, length)
+
+    def __len__(self):
+        return len(self.by_community)
+
+    def close(self):
+        self.commit()
+        self._close_maps()
+
+
+def merge_sorted(old_entries, new_entries):
+    """Merge two sorted entry streams; old entries win ties (older offsets)"""
+    new_entries = iter(new_entries)
+    pending = next(new_entries, None)
+    for entry in old_entries:
+        while pending is not None and pending < entry:
+            yield pending
+            pending = next(new_entries, None)
+        yield entry
+    if pending is not None:
+        yield pending
+    yield from new_entries
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive and look up crawl results")
+    parser.add_argument('--archive', default="crawl_archive.dat")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('import').add_argument('files', nargs='+')
+    commands.add_parser('get').add_argument('community_id')
+    commands.add_parser('url').add_argument('url')
+    commands.add_parser('state').add_argument('state_code')
+    args = parser.parse_args()
+
+    archive = ResultArchive(args.archive)
+    if args.command == 'import':
+        for filename in args.files:
+            archive.import_batch_json(filename)
+        print(f"Archive now holds {len(archive)} results")
+    elif args.command in ('get', 'url'):
+        result = archive.get(args.community_id) if args.command == 'get' else archive.get_url(args.url)
+        print(json.dumps(result, indent=2) if result else "Not found")
+    else:
+        for result in archive.scan_state(args.state_code):
+            print(f"{result.get('community_id')}: {len(result.get('resources', []))} resources "
+                  f"({result.get('crawled_at', 'unknown date')})")
+    archive.close()
@@ -0,0 +1,282 @@
+"""
+SQLite Result Store
+Keeps crawl results from many runs in one indexed database file, so
+questions that span several crawls can be answered without loading
+every batch JSON file.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    state TEXT,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS communities (
+    community_id TEXT PRIMARY KEY,
+    name TEXT,
+    category TEXT,
+    state_id TEXT,
+    population TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    page_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER,
+    community_id TEXT,
+    url TEXT,
+    crawled_at TEXT,
+    error TEXT,
+    resource_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS resources (
+    resource_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    page_id INTEGER,
+    run_id INTEGER,
+    community_id TEXT,
+    category TEXT,
+    type TEXT,
+    value TEXT,
+    context TEXT,
+    confidence REAL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    resource_id INTEGER,
+    run_id INTEGER,
+    community_id TEXT,
+    tag TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pages_community ON pages (community_id, run_id);
+CREATE INDEX IF NOT EXISTS idx_resources_community ON resources (community_id, run_id);
+CREATE INDEX IF NOT EXISTS idx_resources_value ON resources (value);
+CREATE INDEX IF NOT EXISTS idx_tags_tag ON tags (tag, run_id, community_id);
+CREATE INDEX IF NOT EXISTS idx_tags_community ON tags (community_id, run_id);
+"""
+
+
+class SQLiteResultStore:
+    def __init__(self, path="crawl_results.db", batch_size=25):
+        """
+        Open (or create) a result database
+
+        Args:
+            path: SQLite file to write to
+            batch_size: Number of sites to buffer before writing them
+                        together in one transaction
+        """
+        self.path = path
+        self.batch_size = batch_size
+        # Batch runners may write from several threads (one at a time)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.pending = []
+
+    def start_run(self, state_code):
+        """Register a new crawl run and return its id"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO crawl_runs (state, started_at) VALUES (?, ?)",
+                (state_code.upper(), datetime.now().isoformat())
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        """Write any buffered results and mark the run as finished"""
+        self.flush()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE crawl_runs SET finished_at = ? WHERE run_id = ?",
+                (datetime.now().isoformat(), run_id)
+            )
+
+    def add_site_result(self, run_id, result):
+        """
+        Queue one site's results (the dict built by crawl_state)
+
+        Results are written in batches of self.batch_size sites so a
+        long crawl does not pay for one transaction per page.
+        """
+        self.pending.append((run_id, result))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write all queued site results in a single transaction"""
+        if not self.pending:
+            return
+
+        with self.conn:
+            for run_id, result in self.pending:
+                self._write_site_result(run_id, result)
+        self.pending = []
+
+    def _write_site_result(self, run_id, result):
+        community_id = result.get('community_id') or result.get('url', '')
+        resources = result.get('resources', [])
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO communities VALUES (?, ?, ?, ?, ?)",
+            (community_id, result.get('name', result.get('county')),
+             result.get('category'), result.get('state_id'),
+             result.get('population'))
+        )
+        cursor = self.conn.execute(
+            "INSERT INTO pages (run_id, community_id, url, crawled_at, error, resource_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, community_id, result.get('url'),
+             result.get('crawled_at', result.get('timestamp')),
+             result.get('error'), len(resources))
+        )
+        page_id = cursor.lastrowid
+
+        for resource in resources:
+            cursor = self.conn.execute(
+                "INSERT INTO resources (page_id, run_id, community_id, category, type, value, context, confidence) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (page_id, run_id, community_id, resource.get('category'),
+                 resource.get('type'), resource.get('value'),
+                 resource.get('context'), resource.get('confidence'))
+            )
+            resource_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO tags (resource_id, run_id, community_id, tag) VALUES (?, ?, ?, ?)",
+                [(resource_id, run_id, community_id, tag) for tag in resource.get('tags', [])]
+            )
+
+    def import_batch_json(self, filename, state_code=""):
+        """
+        Load an existing batch JSON file into the store as a new run
+
+        Accepts both the plain list written by BatchHealthCrawler and the
+        {"crawl_info": ..., "results": [...]} layout from MyBatchCrawler.
+        """
+        with open(filename, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+
+        if isinstance(data, dict):
+            state_code = state_code or data.get('crawl_info', {}).get('state', '')
+            data = data.get('results', [])
+
+        run_id = self.start_run(state_code)
+        for result in data:
+            self.add_site_result(run_id, result)
+        self.finish_run(run_id)
+        return run_id
+
+    def list_runs(self, state_code=None):
+        """Return (run_id, state, started_at, finished_at) rows, oldest first"""
+        query = "SELECT run_id, state, started_at, finished_at FROM crawl_runs"
+        params = ()
+        if state_code:
+            query += " WHERE state = ?"
+            params = (state_code.upper(),)
+        return self.conn.execute(query + " ORDER BY run_id", params).fetchall()
+
+    def latest_run_before(self, timestamp, state_code=None):
+        """Return the id of the last run started before an ISO timestamp"""
+        query = "SELECT MAX(run_id) FROM crawl_runs WHERE started_at < ?"
+        params = [timestamp]
+        if state_code:
+            query += " AND state = ?"
+            params.append(state_code.upper())
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def community_history(self):
+        """
+        Return {community_id: (last crawled_at, pages crawled, useful pages)}
+
+        A page counts as useful when it had no error and found resources.
+        """
+        self.flush()
+        rows = self.conn.execute(
+            "SELECT community_id, MAX(crawled_at), COUNT(*), "
+            "SUM(CASE WHEN error IS NULL AND resource_count > 0 THEN 1 ELSE 0 END) "
+            "FROM pages GROUP BY community_id"
+        ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def find_resources(self, community_id=None, tag=None, value=None, run_id=None):
+        """
+        Look up stored resources using the indexes
+
+        Any combination of filters may be given; results are dicts.
+        """
+        query = ("SELECT DISTINCT r.run_id, r.community_id, r.category, r.type, "
+                 "r.value, r.context, r.confidence FROM resources r")
+        conditions = []
+        params = []
+        if tag:
+            query += " JOIN tags t ON t.resource_id = r.resource_id"
+            conditions.append("t.tag = ?")
+            params.append(tag)
+        if community_id:
+            conditions.append("r.community_id = ?")
+            params.append(community_id)
+        if value:
+            conditions.append("r.value = ?")
+            params.append(value)
+        if run_id:
+            conditions.append("r.run_id = ?")
+            params.append(run_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        columns = ['run_id', 'community_id', 'category', 'type', 'value', 'context', 'confidence']
+        return [dict(zip(columns, row)) for row in self.conn.execute(query, params)]
+
+    def communities_with_tag(self, tag, run_id):
+        """Return the set of community ids that had a tag in a run"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT community_id FROM tags WHERE tag = ? AND run_id = ?",
+            (tag, run_id)
+        )
+        return {row[0] for row in rows}
+
+    def communities_that_lost_tag(self, tag, old_run_id, new_run_id):
+        """
+        Find communities that had a tag in one run but not in a later one
+
+        Only communities that were crawled in the newer run are reported,
+        so a county missing from a partial crawl is not counted as lost.
+
+        Example: communities_that_lost_tag('crisis_hotline', last_month, latest)
+        """
+        crawled = {row[0] for row in self.conn.execute(
+            "SELECT DISTINCT community_id FROM pages WHERE run_id = ?", (new_run_id,)
+        )}
+        before = self.communities_with_tag(tag, old_run_id)
+        after = self.communities_with_tag(tag, new_run_id)
+        return sorted((before - after) & crawled)
+
+    def close(self):
+        """Flush pending writes and close the database"""
+        self.flush()
+        self.conn.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    store = SQLiteResultStore()
+
+    # Import any batch JSON files given on the command line
+    for filename in sys.argv[1:]:
+        run_id = store.import_batch_json(filename)
+        print(f"Imported {filename} as run {run_id}")
+
+    runs = store.list_runs()
+    print(f"{len(runs)} runs stored in {store.path}")
+
+    # Compare the two most recent runs
+    if len(runs) >= 2:
+        old_run, new_run = runs[-2][0], runs[-1][0]
+        lost = store.communities_that_lost_tag('crisis_hotline', old_run, new_run)
+        print(f"Communities that lost a crisis hotline since run {old_run}:")
+        for community_id in lost:
+            print(f"  {community_id}")
+
+    store.close()
@@ -0,0 +1,490 @@
+"""
+Shared-Memory Batch Crawler
+Runs page fetching and extraction in worker processes. Instead of
+pickling every page's resource dicts back to the parent, workers write
+fixed-width records into one memory-mapped buffer that all processes
+share. The parent reads the buffer directly to build summaries, JSON
+and CSV output.
+
+Buffer layout (all little-endian):
+    header   uint32 counts of claimed record and address slots
+    sites    one SITE record per site (status, counts, timing, error)
+    records  RECORD entries; each site claims a run of slots under a lock
+             and then fills them in without holding it
+    addresses ADDRESS entries: parsed components, ZIP check and gazetteer
+             place of address resources, pointed to by their record
+
+Keys the fixed-width fields do not know, and the rare value too long
+for its field, go to a small JSON overflow file per site next to the
+buffer and are merged back in by to_results().
+"""
+
+import csv
+import glob
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from batch_crawler_example import BatchHealthCrawler
+from zip_gazetteer import IN_STATE, NO_ZIP, OTHER_STATE, UNKNOWN_ZIP
+
+CATEGORIES = ['', 'CONTACT_INFO', 'LOCATION', 'FACILITY', 'SERVICE']
+TYPES = ['', 'phone_number', 'address', 'facility_name', 'email']
+TAGS = [
+    'flu', 'covid19', 'vaccination', 'mental_health', 'pediatric', 'dental',
+    'emergency_room', 'urgent_care', 'crisis_services', 'substance_abuse',
+    'opioid_treatment', 'crisis_hotline', 'hospital', 'clinic', 'pharmacy'
+]
+TAG_BITS = {tag: 1 << i for i, tag in enumerate(TAGS)}
+
+VALUE_BYTES = 200
+CONTEXT_BYTES = 32
+CHECK_BYTES = 24
+
+# site index, category, type, flags, confidence, tag bits, address slot + 1
+# (0 = none), value, context, phone check ('other_state (NY)')
+RECORD = struct.Struct(f'<IBBBfII{VALUE_BYTES}s{CONTEXT_BYTES}s{CHECK_BYTES}s')
+# status, resource count, dropped records, seconds, error message,
+# timestamp, encoding, prefilter, needs_rendering, near_duplicate_of
+SITE = struct.Struct('<BIIf120s32s16s16s16s200s')
+SITE_FIELDS = ['timestamp', 'encoding', 'prefilter', 'needs_rendering', 'near_duplicate_of']
+# zip check, then the parsed address and the gazetteer place
+ADDRESS = struct.Struct('<B12s64s12s2s16s12s40s2s10s40s64s2s')
+COMPONENTS = ['number', 'street', 'suffix', 'direction', 'unit', 'po_box', 'city', 'state', 'zip']
+PLACE = ['city', 'county', 'state']
+# record cursor, address cursor
+CURSORS = struct.Struct('<II')
+
+ZIP_CHECKS = ['', IN_STATE, OTHER_STATE, UNKNOWN_ZIP, NO_ZIP]
+# Room for parsed addresses, as a share of the record slots
+ADDRESS_SHARE = 4
+
+# Keys the fixed-width fields hold; anything else goes to the overflow file
+RECORD_KEYS = {'category', 'type', 'value', 'tags', 'context', 'confidence',
+               'phone_check', 'components', 'zip_check', 'place'}
+SITE_KEYS = {'url', 'resources', 'error'} | set(SITE_FIELDS)
+
+STATUS_PENDING, STATUS_OK, STATUS_ERROR = 0, 1, 2
+FLAG_VALUE_TRUNCATED = 1
+FLAG_UNKNOWN_TAG = 2
+
+
+def encode_text(text, size):
+    """Encode text into a fixed-width field; returns (bytes, truncated)"""
+    data = str(text or '').encode('utf-8')
+    if len(data) <= size:
+        return data, False
+    # Cut on a character boundary so the value still decodes
+    return data[:size].decode('utf-8', 'ignore').encode('utf-8'), True
+
+
+def decode_text(data):
+    return data.rstrip(b'\0').decode('utf-8', 'ignore')
+
+
+def field_sizes(layout):
+    """Byte sizes of the 's' fields of a struct"""
+    return [int(size) for size in re.findall(r'(\d+)s', layout.format)]
+
+
+def encode_fields(values, sizes):
+    """Encode strings into fixed-width fields, or None if one does not fit"""
+    encoded = []
+    for value, size in zip(values, sizes):
+        data, truncated = encode_text(value, size)
+        if truncated:
+            return None
+        encoded.append(data)
+    return encoded
+
+
+class SharedResultBuffer:
+    def __init__(self, path, site_count, capacity, create=False):
+        """
+        Open (or create) a memory-mapped result buffer
+
+        Use SharedResultBuffer.create() in the parent; workers open the
+        same path with create=False.
+        """
+        self.path = path
+        self.site_count = site_count
+        self.capacity = capacity
+        self.address_capacity = max(1, capacity // ADDRESS_SHARE)
+        self.lock = None
+
+        self.sites_offset = CURSORS.size
+        self.records_offset = self.sites_offset + SITE.size * site_count
+        self.addresses_offset = self.records_offset + RECORD.size * capacity
+        self.size = self.addresses_offset + ADDRESS.size * self.address_capacity
+
+        if create:
+            with open(path, 'wb') as file:
+                file.truncate(self.size)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+
+    @classmethod
+    def create(cls, site_count, records_per_site=100):
+        """Create a buffer in shared memory (/dev/shm) when available"""
+        folder = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        handle, path = tempfile.mkstemp(prefix='crawl_results_', suffix='.buf', dir=folder)
+        os.close(handle)
+        return cls(path, site_count, max(1, site_count * records_per_site), create=True)
+
+    def layout(self):
+        """Arguments a worker needs to open the same buffer"""
+        return (self.path, self.site_count, self.capacity)
+
+    # --- Writing (worker side) ---
+
+    def claim(self, count, address_count):
+        """
+        Reserve up to count record slots and address_count address slots
+
+        Returns (first slot, slots granted, first address slot, address slots granted).
+        """
+        with self.lock:
+            cursor, address_cursor = CURSORS.unpack_from(self.map, 0)
+            granted = max(0, min(count, self.capacity - cursor))
+            addresses = max(0, min(address_count, self.address_capacity - address_cursor))
+            CURSORS.pack_into(self.map, 0, cursor + granted, address_cursor + addresses)
+        return cursor, granted, address_cursor, addresses
+
+    def overflow_path(self, site_index):
+        return f"{self.path}.{site_index}.json"
+
+    def pack_address(self, resource):
+        """ADDRESS fields for a resource, or None if a value does not fit"""
+        components = resource.get('components') or {}
+        place = resource.get('place') or {}
+        fields = encode_fields([components.get(name) for name in COMPONENTS]
+                               + [place.get(name) for name in PLACE], field_sizes(ADDRESS))
+        if fields is None:
+            return None
+        return [index_of(ZIP_CHECKS, resource.get('zip_check'))] + fields
+
+    def write_site(self, site_index, results, seconds):
+        """Copy one site's resources into the buffer"""
+        resources = results.get('resources', []) if results else []
+        addresses = {}
+        for position, resource in enumerate(resources):
+            if resource.get('components') or resource.get('place') or resource.get('zip_check'):
+                packed = self.pack_address(resource)
+                if packed is not None:
+                    addresses[position] = packed
+        first, granted, first_address, addresses_granted = self.claim(len(resources), len(addresses))
+        # Addresses that got no slot keep their details in the overflow file
+        address_slots = dict(zip(sorted(addresses)[:addresses_granted],
+                                 range(first_address, first_address + addresses_granted)))
+
+        overflow = {'site': {}, 'resources': {}}
+        for position, (slot, resource) in enumerate(zip(range(first, first + granted), resources)):
+            value, truncated = encode_text(resource.get('value'), VALUE_BYTES)
+            context, _ = encode_text(resource.get('context'), CONTEXT_BYTES)
+            phone_check, check_truncated = encode_text(resource.get('phone_check'), CHECK_BYTES)
+            flags = FLAG_VALUE_TRUNCATED if truncated else 0
+            tag_bits = 0
+            for tag in resource.get('tags', []):
+                if tag in TAG_BITS:
+                    tag_bits |= TAG_BITS[tag]
+                else:
+                    flags |= FLAG_UNKNOWN_TAG
+
+            extra = {key: value for key, value in resource.items() if key not in RECORD_KEYS}
+            if flags & FLAG_UNKNOWN_TAG:
+                extra['tags'] = resource['tags']
+            if check_truncated:
+                extra['phone_check'] = resource['phone_check']
+            address_slot = address_slots.get(position)
+            if address_slot is not None:
+                ADDRESS.pack_into(self.map, self.addresses_offset + address_slot * ADDRESS.size,
+                                  *addresses[position])
+            else:
+                extra.update({key: resource[key] for key in ('components', 'zip_check', 'place')
+                              if resource.get(key)})
+            if extra:
+                overflow['resources'][str(position)] = extra
+
+            RECORD.pack_into(
+                self.map, self.records_offset + slot * RECORD.size,
+                site_index,
+                index_of(CATEGORIES, resource.get('category')),
+                index_of(TYPES, resource.get('type')),
+                flags,
+                float(resource.get('confidence', 0) or 0),
+                tag_bits,
+                0 if address_slot is None else address_slot + 1,
+                value, context, phone_check
+            )
+
+        # A full buffer drops the rest; the drop is counted in the site row
+        status = STATUS_ERROR if not results or results.get('error') else STATUS_OK
+        error, _ = encode_text(results.get('error', '') if results else 'Failed to fetch page', 120)
+        site_fields = []
+        for key, size in zip(SITE_FIELDS, field_sizes(SITE)[1:]):
+            data, truncated = encode_text((results or {}).get(key), size)
+            if truncated:
+                overflow['site'][key] = results[key]
+                data = b''
+            site_fields.append(data)
+        overflow['site'].update({key: value for key, value in (results or {}).items()
+                                 if key not in SITE_KEYS})
+        SITE.pack_into(self.map, self.sites_offset + site_index * SITE.size,
+                       status, len(resources), len(resources) - granted, seconds, error,
+                       *site_fields)
+        if overflow['site'] or overflow['resources']:
+            # Rare: keys and values the fixed-width fields cannot hold
+            with open(self.overflow_path(site_index), 'w', encoding='utf-8') as file:
+                json.dump(overflow, file, ensure_ascii=False)
+
+    def read_overflow(self, site_index):
+        path = self.overflow_path(site_index)
+        if not os.path.exists(path):
+            return {'site': {}, 'resources': {}}
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    # --- Reading (parent side) ---
+
+    def iter_records(self):
+        """Yield raw record tuples straight from the buffer"""
+        cursor = CURSORS.unpack_from(self.map, 0)[0]
+        view = memoryview(self.map)
+        try:
+            end = self.records_offset + cursor * RECORD.size
+            yield from RECORD.iter_unpack(view[self.records_offset:end])
+        finally:
+            view.release()
+
+    def read_address(self, address_slot, resource):
+        """Add the components, zip_check and place stored in an address slot"""
+        fields = ADDRESS.unpack_from(self.map, self.addresses_offset + address_slot * ADDRESS.size)
+        texts = [decode_text(field) for field in fields[1:]]
+        components = {name: text for name, text in zip(COMPONENTS, texts) if text}
+        place = {name: text for name, text in zip(PLACE, texts[len(COMPONENTS):]) if text}
+        if components:
+            resource['components'] = components
+        if ZIP_CHECKS[fields[0]]:
+            resource['zip_check'] = ZIP_CHECKS[fields[0]]
+        if place:
+            resource['place'] = place
+
+    def site_rows(self):
+        """Return (status, resource count, dropped, seconds, error, ...) per site"""
+        return [
+            SITE.unpack_from(self.map, self.sites_offset + i * SITE.size)
+            for i in range(self.site_count)
+        ]
+
+    def category_counts(self):
+        """Count resources by category straight from the records"""
+        counts = {}
+        for record in self.iter_records():
+            category = CATEGORIES[record[1]] or 'Unknown'
+            counts[category] = counts.get(category, 0) + 1
+        return counts
+
+    def to_results(self, sites):
+        """Build the usual list of result dicts (for JSON output)"""
+        results = []
+        overflows = []
+        for site_index, (site, row) in enumerate(zip(sites, self.site_rows())):
+            status, count, dropped, seconds, error = row[:5]
+            overflows.append(self.read_overflow(site_index))
+            result = {
+                'url': site['pha_url'],
+                'name': site['name'],
+                'community_id': site['community_id'],
+                'category': site['category'],
+                'state_id': site['state_id'],
+                'population': site['population'],
+                'crawl_seconds': round(seconds, 3),
+                'resources': []
+            }
+            for key, field in zip(SITE_FIELDS, row[5:]):
+                if decode_text(field):
+                    result[key] = decode_text(field)
+            if status == STATUS_ERROR:
+                result['error'] = decode_text(error)
+            if dropped:
+                result['dropped_resources'] = dropped
+            result.update(overflows[site_index]['site'])
+            results.append(result)
+
+        for record in self.iter_records():
+            site_index, category, rtype, flags, confidence, tag_bits, address_slot = record[:7]
+            value, context, phone_check = record[7:]
+            resource = {
+                'category': CATEGORIES[category],
+                'type': TYPES[rtype],
+                'value': decode_text(value),
+                'tags': [tag for tag, bit in TAG_BITS.items() if tag_bits & bit],
+                'context': decode_text(context),
+                'confidence': round(confidence, 3)
+            }
+            if decode_text(phone_check):
+                resource['phone_check'] = decode_text(phone_check)
+            if address_slot:
+                self.read_address(address_slot - 1, resource)
+            if flags & FLAG_VALUE_TRUNCATED:
+                resource['truncated'] = True
+            # A site's records are contiguous, so its list position is the key
+            position = str(len(results[site_index]['resources']))
+            resource.update(overflows[site_index]['resources'].get(position, {}))
+            results[site_index]['resources'].append(resource)
+        return results
+
+    def write_summary_csv(self, sites, filename):
+        """Write per-site counts to CSV using only the buffer counters"""
+        per_site = [{} for _ in sites]
+        for record in self.iter_records():
+            counts = per_site[record[0]]
+            rtype = TYPES[record[2]]
+            counts[rtype] = counts.get(rtype, 0) + 1
+
+        with open(filename, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Community', 'Name', 'URL', 'Phones Found', 'Addresses Found',
+                             'Facilities Found', 'Total Resources', 'Seconds', 'Status'])
+            for site, counts, row in zip(sites, per_site, self.site_rows()):
+                status, total, _, seconds = row[:4]
+                writer.writerow([
+                    site['community_id'], site['name'], site['pha_url'],
+                    counts.get('phone_number', 0), counts.get('address', 0),
+                    counts.get('facility_name', 0), total, f"{seconds:.2f}",
+                    {STATUS_OK: 'SUCCESS', STATUS_ERROR: 'ERROR'}.get(status, 'PENDING')
+                ])
+        print(f"Summary CSV: {filename}")
+
+    def close(self, remove=False):
+        self.map.close()
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+            for path in glob.glob(f"{glob.escape(self.path)}.*.json"):
+                os.remove(path)
+
+
+def index_of(names, name):
+    return names.index(name) if name in names else 0
+
+
+def worker_main(layout, lock, sites, tasks, crawler_options, delay):
+    """
+    Worker process: crawl each host's sites and write into the buffer
+
+    Only small lists of site indexes come through the task queue; the
+    results never pass through pickle.
+    """
+    from categorized_example import CategorizedHealthCrawler
+
+    buffer = SharedResultBuffer(*layout)
+    buffer.lock = lock
+    crawler = CategorizedHealthCrawler(**crawler_options)
+    while True:
+        indexes = tasks.get()
+        if indexes is None:
+            break
+        for i, site_index in enumerate(indexes):
+            if i > 0 and crawler.rate_controller is None:
+                time.sleep(delay)
+            start = time.time()
+            try:
+                results = crawler.crawl_page_with_categories(sites[site_index]['pha_url'],
+                                                               sites[site_index]['state_id'])
+            except Exception as e:
+                results = {'error': str(e), 'resources': []}
+            buffer.write_site(site_index, results, time.time() - start)
+    buffer.close()
+
+
+class SharedMemoryBatchCrawler(BatchHealthCrawler):
+    def __init__(self, processes=4, records_per_site=100, store=None, crawler_options=None):
+        """
+        Args:
+            processes: Number of worker processes
+            records_per_site: Average resources per site to reserve room for
+            store: Optional SQLiteResultStore
+            crawler_options: Keyword arguments for each worker's crawler
+        """
+        super().__init__(store=store, crawler_options=crawler_options)
+        self.processes = processes
+        self.records_per_site = records_per_site
+        self.buffer = None
+        self.sites = []
+
+    def crawl_sites(self, sites, delay=2):
+        """Crawl a list of sites in worker processes"""
+        self.sites = sites
+        self.buffer = SharedResultBuffer.create(len(sites), self.records_per_site)
+        lock = multiprocessing.Lock()
+
+        # Sites on the same host go to one worker so the delay applies
+        by_host = {}
+        for index, site in enumerate(sites):
+            by_host.setdefault(urlparse(site['pha_url']).netloc.lower(), []).append(index)
+
+        tasks = multiprocessing.Queue()
+        for indexes in sorted(by_host.values(), key=len, reverse=True):
+            tasks.put(indexes)
+        for _ in range(self.processes):
+            tasks.put(None)
+
+        workers = [
+            multiprocessing.Process(
+                target=worker_main,
+                args=(self.buffer.layout(), lock, sites, tasks, self.crawler_options, delay)
+            )
+            for _ in range(self.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.results = [self.add_site_metadata(result, site)
+                        for result, site in zip(self.buffer.to_results(sites), sites)]
+        if self.store:
+            run_id = self.store.start_run(sites[0]['state_id'] if sites else '')
+            for result in self.results:
+                self.store.add_site_result(run_id, result)
+            self.store.finish_run(run_id)
+
+    def crawl_state(self, state_code, max_sites=5, delay=2):
+        websites = [site for site in self.load_state_websites(state_code) if site['pha_url']]
+        self.crawl_sites(websites[:max_sites], delay)
+
+    def print_summary(self):
+        if self.buffer is None:
+            return super().print_summary()
+
+        # Counts come straight from the shared buffer
+        rows = self.buffer.site_rows()
+        print(f"\n=== CRAWLING SUMMARY ===")
+        print(f"Total sites crawled: {len(rows)}")
+        print(f"Total resources found: {sum(row[1] for row in rows)}")
+        print(f"\nResources by category:")
+        for category, count in self.buffer.category_counts().items():
+            print(f"  {category}: {count}")
+
+    def close(self):
+        """Remove the shared buffer file"""
+        if self.buffer:
+            self.buffer.close(remove=True)
+            self.buffer = None
+
+
+# Example usage
+if __name__ == "__main__":
+    batch_crawler = SharedMemoryBatchCrawler(processes=4)
+    batch_crawler.crawl_state('ca', max_sites=8, delay=2)
+    batch_crawler.print_summary()
+    batch_crawler.save_results()
+    batch_crawler.buffer.write_summary_csv(batch_crawler.sites, "batch_ca_summary.csv")
+    batch_crawler.close()
@@ -7,6 +7,7 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import time
+from address_parser import AddressRecognizer
 
 class SimpleHealthCrawler:
     def __init__(self):
@@ -15,6 +16,9 @@ class SimpleHealthCrawler:
         self.session.headers.update({
             'User-Agent': 'Educational-Health-Crawler/1.0 (Learning Purpose)'
         })
+        
+        # Splits text into words and checks street suffixes as whole words
+        self.address_recognizer = AddressRecognizer()
     
     def get_page(self, url):
         """
@@ -69,7 +73,7 @@ class SimpleHealthCrawler:
         for selector in address_selectors:
             elements = soup.select(selector)
             for element in elements:
-                text = element.get_text(strip=True)
+                text = element.get_text(" ", strip=True)
                 if self.looks_like_address(text):
                     addresses.append(text)
         
@@ -79,15 +83,8 @@ class SimpleHealthCrawler:
         """
         Simple check to see if text looks like an address
         """
-        # Look for street indicators and numbers
-        street_words = ['street', 'st', 'avenue', 'ave', 'road', 'rd', 
-                       'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln']
-        
-        text_lower = text.lower()
-        has_number = any(char.isdigit() for char in text)
-        has_street_word = any(word in text_lower for word in street_words)
-        
-        return has_number and has_street_word and len(text) > 10
+        # A house number, street name and suffix ("123 Main St"), or a PO Box
+        return self.address_recognizer.parse(text) is not None
     
     def find_clinic_names(self, soup):
         """
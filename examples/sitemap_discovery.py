@@ -0,0 +1,286 @@
+"""
+Sitemap Page Discovery
+Most county sites publish a sitemap.xml listing every page, often with
+a <lastmod> date. Reading it finds the health pages of a site with a
+few requests, instead of following links page by page.
+
+For each site this module:
+1. reads robots.txt for "Sitemap:" lines (falls back to /sitemap.xml)
+2. streams each sitemap (plain or .gz) and follows sitemap indexes
+3. keeps same-host URLs whose path contains a health keyword
+4. remembers each URL's lastmod and resources, so the next run only
+   refetches pages that changed and reuses the resources of the rest;
+   pages without a lastmod are refetched once their copy is max_age_days old
+
+robots.txt and sitemap requests wait their turn like page requests: on
+the crawler's AdaptiveRateController when there is one, otherwise a
+fixed delay.
+"""
+
+import copy
+import gzip
+import io
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlparse
+
+from batch_crawler_example import BatchHealthCrawler
+
+PATH_KEYWORDS = [
+    'health', 'clinic', 'immuniz', 'vaccin', 'flu', 'covid', 'mental',
+    'behavioral', 'dental', 'wic', 'std', 'hiv', 'family-planning',
+    'substance', 'opioid', 'crisis', 'contact', 'location', 'hours', 'services'
+]
+
+
+def local_name(tag):
+    """'{http://www.sitemaps.org/schemas/sitemap/0.9}loc' -> 'loc'"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def same_host(url, base_url):
+    strip = lambda host: host.lower().removeprefix('www.')
+    return strip(urlparse(url).netloc) == strip(urlparse(base_url).netloc)
+
+
+class SitemapDiscovery:
+    def __init__(self, session=None, state_file="sitemap_state.json",
+                 keywords=None, max_sitemaps=10, max_pages=20, timeout=15,
+                 max_age_days=30, rate_controller=None, delay=1):
+        """
+        Args:
+            session: requests.Session to fetch with (a new one if not given)
+            state_file: JSON file with the lastmod and resources of each page
+            keywords: Path keywords that mark a page as health-related
+            max_sitemaps: Sitemap files read per site, at most
+            max_pages: Pages returned per site, at most
+            timeout: Seconds to wait for each sitemap request
+            max_age_days: Refetch a page without a lastmod once the last
+                          fetch is this old
+            rate_controller: Optional AdaptiveRateController that paces
+                             robots.txt and sitemap requests
+            delay: Seconds to wait before each of those requests when
+                   there is no rate controller
+        """
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update({'User-Agent': 'Educational-Health-Crawler/1.0 (Learning Purpose)'})
+        self.session = session
+        self.state_file = state_file
+        self.keywords = keywords or PATH_KEYWORDS
+        self.max_sitemaps = max_sitemaps
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.max_age = max_age_days * 86400
+        self.rate_controller = rate_controller
+        self.delay = delay
+        self.state = self.load_state()
+
+    def load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def save_state(self):
+        if self.state_file:
+            with open(self.state_file, 'w', encoding='utf-8') as file:
+                json.dump(self.state, file, indent=2)
+
+    def get(self, url, **kwargs):
+        """GET a robots.txt or sitemap, paced like the crawler's page requests"""
+        if self.rate_controller:
+            self.rate_controller.wait(url)
+        elif self.delay:
+            time.sleep(self.delay)
+        start = time.time()
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+        except Exception:
+            if self.rate_controller:
+                self.rate_controller.record(url, None, time.time() - start)
+            raise
+        if self.rate_controller:
+            self.rate_controller.record_response(url, response, time.time() - start)
+        return response
+
+    def sitemap_locations(self, site_url):
+        """Sitemaps listed in robots.txt, or the usual /sitemap.xml"""
+        robots_url = urljoin(site_url, '/robots.txt')
+        locations = []
+        try:
+            response = self.get(robots_url)
+            if response.ok:
+                for line in response.text.splitlines():
+                    if line.lower().startswith('sitemap:'):
+                        locations.append(urljoin(robots_url, line.split(':', 1)[1].strip()))
+        except Exception as e:
+            print(f"Could not read {robots_url}: {e}")
+        return locations or [urljoin(site_url, '/sitemap.xml')]
+
+    def iter_sitemap(self, url):
+        """
+        Stream one sitemap and yield ('sitemap' or 'url', loc, lastmod)
+
+        The file is parsed while it downloads and each entry is dropped
+        once read, so huge sitemaps do not have to fit in memory.
+        """
+        try:
+            response = self.get(url, stream=True)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Could not fetch sitemap {url}: {e}")
+            return
+
+        with response:
+            # Undo Content-Encoding: gzip, then check for a .gz file
+            response.raw.decode_content = True
+            response.raw.auto_close = False  # Let the buffered reader see EOF
+            stream = io.BufferedReader(response.raw)
+            if stream.peek(2)[:2] == b'\x1f\x8b':
+                stream = gzip.GzipFile(fileobj=stream)
+
+            loc = lastmod = None
+            try:
+                for _, element in ET.iterparse(stream, events=('end',)):
+                    name = local_name(element.tag)
+                    if name == 'loc':
+                        loc = (element.text or '').strip()
+                    elif name == 'lastmod':
+                        lastmod = (element.text or '').strip()
+                    elif name in ('url', 'sitemap'):
+                        if loc:
+                            yield name, loc, lastmod
+                        loc = lastmod = None
+                        element.clear()
+            except (ET.ParseError, OSError, EOFError) as e:
+                print(f"Stopped reading sitemap {url}: {e}")
+
+    def is_health_page(self, url):
+        path = urlparse(url).path.lower()
+        return any(keyword in path for keyword in self.keywords)
+
+    def discover(self, site_url):
+        """Return [(url, lastmod)] of health-related pages on a site"""
+        pending = self.sitemap_locations(site_url)
+        seen_sitemaps = set()
+        pages = {}
+
+        while pending and len(seen_sitemaps) < self.max_sitemaps:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in seen_sitemaps:
+                continue
+            seen_sitemaps.add(sitemap_url)
+
+            for kind, loc, lastmod in self.iter_sitemap(sitemap_url):
+                if kind == 'sitemap':
+                    pending.append(urljoin(sitemap_url, loc))
+                elif same_host(loc, site_url) and self.is_health_page(loc):
+                    pages[loc] = lastmod
+
+        # Shorter paths first: section pages before deep articles
+        ordered = sorted(pages.items(), key=lambda item: (item[0].count('/'), item[0]))
+        return ordered[:self.max_pages]
+
+    def is_changed(self, url, lastmod):
+        """
+        Is a discovered page new, or has it changed since the last fetch?
+
+        Without a lastmod there is no way to tell, so the page counts as
+        changed once the last fetch is older than max_age_days.
+        """
+        previous = self.state.get(url)
+        # Older state files kept only the lastmod, with no resources to reuse
+        if not isinstance(previous, dict):
+            return True
+        if lastmod:
+            return lastmod != previous['lastmod']
+        return time.time() - previous.get('fetched', 0) > self.max_age
+
+    def changed_pages(self, site_url):
+        """Discovered pages that are new or whose lastmod changed"""
+        return [(url, lastmod) for url, lastmod in self.discover(site_url)
+                if self.is_changed(url, lastmod)]
+
+    def previous_resources(self, url):
+        """Resources found on an unchanged page when it was last crawled"""
+        return copy.deepcopy(self.state[url]['resources'])
+
+    def mark_crawled(self, url, lastmod, resources):
+        self.state[url] = {'lastmod': lastmod or '', 'fetched': time.time(),
+                           'resources': copy.deepcopy(resources)}
+
+
+class SitemapBatchCrawler(BatchHealthCrawler):
+    def __init__(self, discovery=None, page_delay=1, store=None, crawler_options=None):
+        """
+        Crawl each site's main page plus its changed sitemap pages
+
+        Args:
+            discovery: SitemapDiscovery to use (a default one if not given)
+            page_delay: Seconds between pages of the same site
+            store: Optional SQLiteResultStore
+            crawler_options: Keyword arguments for the page crawler
+        """
+        super().__init__(store=store, crawler_options=crawler_options)
+        self._discovery = discovery
+        self.page_delay = page_delay
+
+    @property
+    def discovery(self):
+        if self._discovery is None:
+            self._discovery = SitemapDiscovery(
+                session=self.crawler.session,
+                rate_controller=self.crawler_options.get('rate_controller'),
+                delay=self.page_delay
+            )
+        return self._discovery
+
+    def crawl_site(self, crawler, site):
+        results = super().crawl_site(crawler, site)
+        results.setdefault('resources', [])
+        seen = {(r['type'], r['value']) for r in results['resources']}
+
+        pages = [(url, lastmod) for url, lastmod in self.discovery.discover(site['pha_url'])
+                 if url.rstrip('/') != site['pha_url'].rstrip('/')]
+        changed = [page for page in pages if self.discovery.is_changed(*page)]
+        print(f"Sitemap: {len(changed)} new or changed health pages, "
+              f"{len(pages) - len(changed)} unchanged")
+        results['pages_crawled'] = [site['pha_url']]
+        results['pages_unchanged'] = []
+        for url, lastmod in pages:
+            if (url, lastmod) in changed:
+                if not self.adaptive_rate:
+                    time.sleep(self.page_delay)
+                page_results = crawler.crawl_page_with_categories(url, site['state_id'])
+                if page_results is None or 'resources' not in page_results:
+                    continue
+                page_resources = page_results['resources']
+                self.discovery.mark_crawled(url, lastmod, page_resources)
+                results['pages_crawled'].append(url)
+            else:
+                # Not refetched: carry the last run's resources forward
+                page_resources = self.discovery.previous_resources(url)
+                results['pages_unchanged'].append(url)
+            for resource in page_resources:
+                key = (resource['type'], resource['value'])
+                if key not in seen:
+                    seen.add(key)
+                    resource['source_url'] = url
+                    results['resources'].append(resource)
+        return results
+
+    def crawl_state(self, state_code, max_sites=5, delay=2):
+        super().crawl_state(state_code, max_sites, delay)
+        self.discovery.save_state()
+
+
+# Example usage
+if __name__ == "__main__":
+    batch_crawler = SitemapBatchCrawler()
+    batch_crawler.crawl_state('ca', max_sites=3, delay=2)
+    batch_crawler.print_summary()
+    batch_crawler.save_results()
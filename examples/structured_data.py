@@ -0,0 +1,285 @@
+"""
+Structured Data Extraction
+Reads schema.org data that many CMS platforms publish, from JSON-LD
+<script type="application/ld+json"> blocks and from microdata
+(itemscope / itemprop attributes). Values published this way are exact,
+so they are returned with high confidence.
+
+Links are read the same way: tel: and mailto: hrefs, and hCard markup
+(class="tel" / "email" inside a vcard or h-card), already hold a clean
+phone number or email address.
+"""
+
+import json
+import re
+from urllib.parse import unquote
+
+# schema.org types we treat as a health facility or organization.
+# Plain Organization / LocalBusiness are left out: CMS themes put one on
+# every page for the site owner, with just a name and a switchboard number.
+FACILITY_TYPES = {
+    'MedicalClinic', 'Hospital', 'MedicalOrganization', 'MedicalBusiness',
+    'Physician', 'Pharmacy', 'Dentist', 'EmergencyService',
+    'GovernmentOrganization', 'GovernmentOffice', 'DiagnosticLab', 'MedicalCenter'
+}
+
+# Facility types that describe a whole organization rather than one
+# place; a site often puts one of these on every page for its owner
+ORGANIZATION_TYPES = {'GovernmentOrganization', 'MedicalOrganization'}
+
+STRUCTURED_CONFIDENCE = 0.95
+
+HCARD_CLASSES = ['vcard', 'h-card']
+HCARD_TEL_CLASSES = {'tel', 'p-tel'}
+HCARD_EMAIL_CLASSES = {'email', 'u-email'}
+# Elements small enough to describe the single link inside them
+DESCRIPTION_BLOCKS = ['li', 'p', 'td', 'dd', 'div']
+MAX_DESCRIPTION = 200
+EXTENSION = re.compile(r'(?:;|,|\s*\b(?:ext\.?|x)\s*\d).*$', re.IGNORECASE)
+
+
+def schema_types(node):
+    """Return the schema.org type names of a node as a set"""
+    types = node.get('@type', [])
+    if isinstance(types, str):
+        types = [types]
+    # Microdata types are full URLs like https://schema.org/MedicalClinic
+    return {str(t).rstrip('/').split('/')[-1] for t in types}
+
+
+def parse_json_ld(soup):
+    """Return every JSON-LD node on the page as a flat list of dicts"""
+    nodes = []
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or script.get_text())
+        except ValueError:
+            continue  # Broken JSON-LD is common; just skip it
+        collect_nodes(data, nodes)
+    return nodes
+
+
+def collect_nodes(data, nodes):
+    """Flatten lists and @graph containers into a list of nodes"""
+    if isinstance(data, list):
+        for item in data:
+            collect_nodes(item, nodes)
+    elif isinstance(data, dict):
+        if '@graph' in data:
+            collect_nodes(data['@graph'], nodes)
+        if '@type' in data:
+            nodes.append(data)
+
+
+def parse_microdata(soup):
+    """Return every top-level microdata item on the page as a dict"""
+    items = []
+    for element in soup.find_all(attrs={'itemscope': True}):
+        # Nested items are read as properties of their parent item
+        if element.has_attr('itemprop'):
+            continue
+        items.append(read_microdata_item(element))
+    return items
+
+
+def read_microdata_item(element):
+    item = {'@type': element.get('itemtype', '').split()}
+    for prop in iter_item_properties(element):
+        if prop.has_attr('itemscope'):
+            value = read_microdata_item(prop)
+        elif prop.has_attr('content'):
+            value = prop['content']
+        elif prop.name in ('a', 'link') and prop.has_attr('href') \
+                and not prop['href'].startswith(('tel:', 'mailto:')):
+            value = prop['href']
+        else:
+            value = prop.get_text(" ", strip=True)
+
+        for name in prop['itemprop'].split():
+            item.setdefault(name, value)
+    return item
+
+
+def iter_item_properties(element):
+    """Yield itemprop elements that belong to this item (not to nested items)"""
+    for child in element.find_all(True, recursive=False):
+        if child.has_attr('itemprop'):
+            yield child
+        if not child.has_attr('itemscope'):
+            yield from iter_item_properties(child)
+
+
+def first_value(value):
+    """JSON-LD allows lists almost everywhere; take the first entry"""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def format_address(address):
+    """Turn a PostalAddress node (or a plain string) into one line"""
+    address = first_value(address)
+    if isinstance(address, str):
+        return address.strip()
+    if not isinstance(address, dict):
+        return ""
+
+    street = first_value(address.get('streetAddress')) or ""
+    city = first_value(address.get('addressLocality')) or ""
+    region = first_value(address.get('addressRegion')) or ""
+    postal = first_value(address.get('postalCode')) or ""
+
+    region_line = " ".join(part for part in (str(region), str(postal)) if part)
+    return ", ".join(str(part).strip() for part in (street, city, region_line) if part)
+
+
+def structured_items(soup):
+    """Return (source, node) pairs from JSON-LD first, then microdata"""
+    pairs = [('json_ld', node) for node in parse_json_ld(soup)]
+    pairs.extend(('microdata', node) for node in parse_microdata(soup))
+    return pairs
+
+
+def nodes_to_resources(pairs):
+    """
+    Convert schema.org nodes into resource dicts (without tags)
+
+    Returns (resource, description) pairs so the caller can tag each
+    resource using the text that describes the node.
+    """
+    found = []
+    for source, node in pairs:
+        types = schema_types(node)
+        description = " ".join(
+            str(first_value(node.get(key)) or "") for key in ('name', 'description')
+        )
+
+        if types & FACILITY_TYPES:
+            name = first_value(node.get('name'))
+            if isinstance(name, str) and name.strip():
+                found.append((resource('FACILITY', 'facility_name', name.strip(), source, types), description))
+
+            for phone in as_list(node.get('telephone')):
+                found.append((resource('CONTACT_INFO', 'phone_number', str(phone).strip(), source, types), description))
+
+            for email in as_list(node.get('email')):
+                email = str(email).replace('mailto:', '').strip()
+                found.append((resource('CONTACT_INFO', 'email', email, source, types), description))
+
+            for address in as_list(node.get('address')):
+                text = format_address(address)
+                if text:
+                    found.append((resource('LOCATION', 'address', text, source, types), description))
+
+        elif 'PostalAddress' in types:
+            text = format_address(node)
+            if text:
+                found.append((resource('LOCATION', 'address', text, source, types), description))
+
+    return found
+
+
+def is_site_wide(pairs):
+    """
+    True when the only structured data is one organization-level node
+
+    That is the site owner's block repeated on every page (a county
+    GovernmentOrganization with its switchboard number), which says
+    nothing about the clinics and offices listed on the page itself.
+    """
+    facilities = [node for _, node in pairs if schema_types(node) & FACILITY_TYPES]
+    addresses = [node for _, node in pairs if 'PostalAddress' in schema_types(node)]
+    return (len(facilities) == 1 and not addresses
+            and schema_types(facilities[0]) & FACILITY_TYPES <= ORGANIZATION_TYPES)
+
+
+def as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def resource(category, resource_type, value, source, types):
+    # Facility tags straight from the schema.org type
+    tags = []
+    if types & {'Hospital', 'EmergencyService'}:
+        tags.append('hospital')
+    elif types & {'MedicalClinic', 'MedicalCenter'}:
+        tags.append('clinic')
+    elif 'Pharmacy' in types:
+        tags.append('pharmacy')
+
+    return {
+        'category': category,
+        'type': resource_type,
+        'value': value,
+        'tags': tags,
+        'context': source,
+        'confidence': STRUCTURED_CONFIDENCE
+    }
+
+
+def normalize_phone(text):
+    """'tel:+1 (510) 267-8000;ext=12' -> '510-267-8000', or None if not 10 digits"""
+    number = EXTENSION.sub('', unquote(text).split(':', 1)[-1])
+    digits = "".join(char for char in number if char.isdigit())
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]
+    if len(digits) != 10:
+        return None
+    return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+
+
+def block_text(anchor):
+    """
+    Text of the nearest li, p, td, dd or short div around a link
+
+    Longer blocks (a whole footer or sidebar) hold other numbers too, so
+    they would tag this one with what belongs to its neighbours.
+    """
+    block = anchor.find_parent(DESCRIPTION_BLOCKS)
+    if block is None:
+        return ""
+    text = block.get_text(" ", strip=True)
+    if len(text) > MAX_DESCRIPTION:
+        # A long li, p or td still beats nothing; a long div is a container
+        return "" if block.name == 'div' else text[:MAX_DESCRIPTION]
+    return text
+
+
+def anchor_contacts(soup):
+    """
+    Return (resource, description) pairs for phone and email links
+
+    One pass over the <a href> elements. tel: and mailto: hrefs are
+    used as they are; hCard links (class "tel" or "email") are read
+    from the link text when the href is something else.
+    """
+    found = []
+    for anchor in soup.find_all('a', href=True):
+        href = anchor['href'].strip()
+        scheme = href[:7].lower()
+        classes = set(anchor.get('class') or [])
+
+        if scheme.startswith('tel:') or classes & HCARD_TEL_CLASSES:
+            value = normalize_phone(href if scheme.startswith('tel:') else anchor.get_text())
+            resource_type, source = 'phone_number', 'tel_link'
+        elif scheme == 'mailto:' or classes & HCARD_EMAIL_CLASSES:
+            address = href[7:] if scheme == 'mailto:' else anchor.get_text()
+            value = unquote(address.split('?', 1)[0]).strip().lower()
+            value = value if '@' in value else None
+            resource_type, source = 'email', 'mailto_link'
+        else:
+            continue
+        if not value:
+            continue
+
+        if classes & (HCARD_TEL_CLASSES | HCARD_EMAIL_CLASSES) or anchor.find_parent(class_=HCARD_CLASSES):
+            source = 'hcard'
+        # The link's own text and labels, and the small block around it,
+        # say what the number is for
+        parts = (anchor.get_text(" ", strip=True), anchor.get('title', ''),
+                 anchor.get('aria-label', ''), block_text(anchor))
+        description = " ".join(part for part in parts if part)
+        found.append((resource('CONTACT_INFO', resource_type, value, source, set()), description))
+    return found
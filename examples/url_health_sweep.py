@@ -0,0 +1,248 @@
+"""
+URL Health Sweep
+Checks every pha_url in data/websites before a content crawl: which are
+dead, which redirect somewhere else, and which are slow.
+
+Only headers are requested (HEAD), many at a time, so the ~2,400 URLs
+take minutes instead of the hours a full crawl with per-site delays
+would. Servers that reject HEAD (405, 501, some 403s) get a GET whose
+body is never downloaded. At most a couple of requests go to the same
+host at once, so shared hosting providers are not flooded: each host has
+its own queue, and a URL is only handed to a worker while its host has
+a free slot, so workers never sit waiting on one busy host.
+
+Results are written to a CSV with one row per community_id:
+
+    community_id;state_id;pha_url;status;final_url;latency;method;error;redirects
+
+redirects lists the status code of each redirect followed ('301 302').
+error is DNSFailure, ConnectionRefused or Timeout for the usual
+failures, otherwise the name of the requests exception.
+
+A later crawl can read it with load_sweep() to skip dead URLs and start
+at the final redirect target (crawler_cli.py crawl --sweep FILE).
+"""
+
+import csv
+import socket
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from national_crawler import NationalBatchCrawler, host_key
+
+SWEEP_COLUMNS = ['community_id', 'state_id', 'pha_url', 'status', 'final_url',
+                 'latency', 'method', 'error', 'redirects']
+
+# Replies that often mean "HEAD not supported" rather than a broken page
+RETRY_WITH_GET = {400, 403, 405, 406, 501}
+
+# Replies that mean the page is gone; anything else is worth crawling
+DEAD_STATUSES = {404, 410}
+
+# Failures that mean there is no server; a timeout only means a slow one
+DEAD_ERRORS = {'DNSFailure', 'ConnectionRefused'}
+
+
+class UrlHealthSweep:
+    def __init__(self, workers=64, per_host=2, timeout=10):
+        """
+        Args:
+            workers: Requests in flight at once
+            per_host: Requests in flight to the same host, at most
+            timeout: Seconds to wait for each server
+        """
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Educational-Health-Crawler/1.0 (Learning Purpose)'
+        })
+        # One pooled connection per worker, instead of the default 10
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def check_url(self, url):
+        """
+        Return status, final_url, latency (seconds), method and error for one URL
+
+        status is 0 when no response came back at all; error then says why.
+        """
+        method = 'HEAD'
+        start = time.perf_counter()
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in RETRY_WITH_GET:
+                method = 'GET'
+                # stream=True: read the headers, never the body
+                response = self.session.get(url, allow_redirects=True,
+                                            timeout=self.timeout, stream=True)
+                response.close()
+            return {
+                'status': response.status_code,
+                'final_url': response.url,
+                'latency': round(time.perf_counter() - start, 3),
+                'method': method,
+                'error': '',
+                'redirects': " ".join(str(r.status_code) for r in response.history)
+            }
+        except requests.RequestException as e:
+            return {
+                'status': 0,
+                'final_url': '',
+                'latency': round(time.perf_counter() - start, 3),
+                'method': method,
+                'error': error_name(e),
+                'redirects': ''
+            }
+
+    def sweep(self, websites):
+        """
+        Check every site's pha_url; returns one row per site
+
+        Args:
+            websites: Site dicts from load_state_websites / load_all_websites
+        """
+        # One queue per host; the CSV lists a state's sites together, and
+        # sites sharing a host would otherwise reach the workers in a clump
+        queues = {}
+        for site in websites:
+            queues.setdefault(host_key(site['pha_url']), deque()).append(site)
+        # Hosts with sites left and a free slot, served round-robin
+        ready = deque(queues)
+        running = Counter()
+
+        rows = []
+        print(f"Checking {len(websites)} URLs with {self.workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {}
+            while ready or futures:
+                while ready and len(futures) < self.workers:
+                    host = ready.popleft()
+                    site = queues[host].popleft()
+                    running[host] += 1
+                    futures[pool.submit(self.check_url, site['pha_url'])] = (host, site)
+                    if queues[host] and running[host] < self.per_host:
+                        ready.append(host)
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host, site = futures.pop(future)
+                    running[host] -= 1
+                    if queues[host] and running[host] == self.per_host - 1:
+                        # The host was full, so it was left out of ready
+                        ready.append(host)
+                    row = {'community_id': site['community_id'], 'state_id': site['state_id'],
+                           'pha_url': site['pha_url']}
+                    row.update(future.result())
+                    rows.append(row)
+                    if len(rows) % 100 == 0:
+                        print(f"  {len(rows)}/{len(websites)} checked")
+        rows.sort(key=lambda row: row['community_id'])
+        return rows
+
+    def write_csv(self, rows, filename="url_sweep.csv"):
+        with open(filename, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=SWEEP_COLUMNS, delimiter=';')
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Sweep results saved to {filename}")
+
+    def print_summary(self, rows):
+        print(f"\n=== URL SWEEP SUMMARY ===")
+        print(f"URLs checked: {len(rows)}")
+        print(f"Dead: {sum(1 for row in rows if is_dead(row))}")
+        print(f"Timed out (kept): {sum(1 for row in rows if row['error'] == 'Timeout')}")
+        print(f"Redirected: {sum(1 for row in rows if is_redirected(row))}")
+        print(f"Needed GET: {sum(1 for row in rows if row['method'] == 'GET')}")
+
+        statuses = Counter(row['status'] or row['error'] for row in rows)
+        print("Status codes:")
+        for status, count in statuses.most_common(10):
+            print(f"  {status}: {count}")
+
+        answered = sorted(float(row['latency']) for row in rows if int(row['status']))
+        if answered:
+            print(f"Latency: median {answered[len(answered) // 2]:.2f}s, "
+                  f"slowest {answered[-1]:.2f}s")
+        for row in sorted(rows, key=lambda row: -float(row['latency']))[:5]:
+            print(f"  {float(row['latency']):.2f}s  {row['community_id']}  {row['pha_url']}")
+
+
+def error_name(error):
+    """Name a failed request: DNSFailure, ConnectionRefused, Timeout or the exception"""
+    # requests wraps urllib3's MaxRetryError, whose reason was raised
+    # from the socket error
+    reason = error.args[0] if error.args else None
+    cause = getattr(getattr(reason, 'reason', reason), '__cause__', None)
+    if isinstance(cause, socket.gaierror):
+        return 'DNSFailure'
+    if isinstance(cause, ConnectionRefusedError):
+        return 'ConnectionRefused'
+    if isinstance(error, requests.Timeout):
+        return 'Timeout'
+    return type(error).__name__
+
+
+def is_dead(row):
+    """
+    The host does not resolve, refuses connections, or the page is gone
+
+    Timeouts and other failures are not dead: the site may just be slow
+    or having a bad day, so it stays in the crawl.
+    """
+    return int(row['status']) in DEAD_STATUSES or row['error'] in DEAD_ERRORS
+
+
+def is_redirected(row):
+    return bool(row['final_url']) and row['final_url'].rstrip('/') != row['pha_url'].rstrip('/')
+
+
+def load_sweep(filename):
+    """Read a sweep CSV into {community_id: row}"""
+    with open(filename, 'r', newline='', encoding='utf-8') as file:
+        return {row['community_id']: row for row in csv.DictReader(file, delimiter=';')}
+
+
+def apply_sweep(websites, sweep):
+    """
+    Drop sites whose URL the sweep found dead
+
+    Sites that timed out are kept (see is_dead). Sites missing from the sweep are kept. pha_url is never changed, so
+    results and stored pages stay keyed on the CSV address; redirects
+    are followed by seeding a RedirectMap with RedirectMap.seed_from_sweep().
+    """
+    kept = []
+    for site in websites:
+        row = sweep.get(site['community_id'])
+        if row and row['pha_url'] == site['pha_url'] and is_dead(row):
+            continue
+        kept.append(site)
+    return kept
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check every pha_url with HEAD requests")
+    parser.add_argument('states', nargs='*', help="State codes (default: all states)")
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--per-host', type=int, default=2)
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--output', default="url_sweep.csv")
+    args = parser.parse_args()
+
+    # Loading the CSVs only needs the csv module, not the crawler
+    loader = NationalBatchCrawler(timings_file=None)
+    websites = loader.load_all_websites(args.states or None)
+
+    url_sweep = UrlHealthSweep(workers=args.workers, per_host=args.per_host, timeout=args.timeout)
+    sweep_rows = url_sweep.sweep(websites)
+    url_sweep.print_summary(sweep_rows)
+    url_sweep.write_csv(sweep_rows, args.output)
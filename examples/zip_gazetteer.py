@@ -0,0 +1,274 @@
+"""
+Offline ZIP Code Gazetteer
+Checks extracted addresses without calling a geocoder: is the ZIP real,
+is it in the state we are crawling, and which county is it in?
+
+Two levels of data:
+- zip3_states.csv (bundled): the state(s) for every 3-digit ZIP prefix.
+  Always available, but it cannot tell counties apart.
+- zip_gazetteer.bin (built once with `python zip_gazetteer.py build`):
+  every 5-digit ZIP with its city, county and state, from a CSV with
+  county names such as the free "uszips.csv" list. The HUD USPS
+  ZIP-county crosswalk only has county FIPS codes and is rejected.
+
+The .bin file is a sorted array of fixed-size records followed by a
+list of city and county names:
+
+    header    'ZIPG', record count, name count
+    records   zip (uint32), city name index, county name index, state
+    names     UTF-8 names separated by newlines
+
+It is memory-mapped and searched with bisect, so a lookup reads a few
+records from the page cache instead of loading a dict of 40,000 ZIPs.
+A ZIP that crosses county lines has one record per county.
+"""
+
+import bisect
+import csv
+import mmap
+import os
+import re
+import struct
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+GAZETTEER_FILE = os.path.join(DATA_DIR, "zip_gazetteer.bin")
+ZIP3_FILE = os.path.join(DATA_DIR, "zip3_states.csv")
+
+MAGIC = b'ZIPG'
+HEADER = struct.Struct('<4sII')
+RECORD = struct.Struct('<IHH2s')
+
+# Column names used by common ZIP files, in order of preference
+ZIP_COLUMNS = ['zip', 'zipcode', 'zip_code', 'zcta', 'zcta5']
+CITY_COLUMNS = ['city', 'primary_city', 'usps_zip_pref_city', 'po_name']
+COUNTY_COLUMNS = ['county_names_all', 'county_name', 'county', 'countyname']
+STATE_COLUMNS = ['state_id', 'state', 'usps_zip_pref_state', 'stusps']
+
+# check() results
+IN_STATE = 'in_state'        # ZIP is in the right state
+OTHER_STATE = 'other_state'  # ZIP belongs to another state
+UNKNOWN_ZIP = 'unknown_zip'  # No such ZIP
+NO_ZIP = 'no_zip'            # The address has no ZIP to check
+
+# Confidence multipliers for extracted addresses
+CONFIDENCE_FACTORS = {
+    IN_STATE: 1.0,
+    NO_ZIP: 1.0,
+    OTHER_STATE: 0.6,
+    UNKNOWN_ZIP: 0.5,
+}
+
+AREA_WORDS = re.compile(r'\b(county|parish|borough|census area|city and borough|'
+                        r'municipality|muny|cty&bor)\b')
+# 'City of Orange', and Virginia's independent cities ('Alexandria City')
+CITY_WORDS = re.compile(r'^(city|town|village|township) of | city$')
+
+
+def place_key(name):
+    """'St. Louis County' -> 'st louis', 'Alexandria City' -> 'alexandria'"""
+    name = name.lower().replace('saint ', 'st ').replace('sainte ', 'ste ')
+    name = AREA_WORDS.sub(' ', name)
+    return CITY_WORDS.sub('', " ".join(re.findall(r'[a-z0-9]+', name)))
+
+
+def in_community(place, name, category):
+    """
+    Is a gazetteer place inside the community of a websites CSV row?
+
+    Counties, parishes and boroughs are compared with the ZIP's county
+    (or any of them, for 'Fulton|DeKalb'), cities and towns with its
+    city. Returns None for other categories (states, groups) or when the
+    place has no county data.
+    """
+    if 'county' not in place:
+        return None
+    if category in ('County', 'Parish', 'Borough', 'Census Area'):
+        return any(place_key(county) == place_key(name) for county in place['county'].split('|'))
+    if category in ('City', 'Town', 'Township', 'Village'):
+        return place_key(place['city']) == place_key(name)
+    return None
+
+
+def first_column(row, names):
+    for name in names:
+        if row.get(name):
+            return row[name].strip()
+    return ''
+
+
+def build_gazetteer(source, output=GAZETTEER_FILE):
+    """
+    Build zip_gazetteer.bin from a ZIP CSV file
+
+    Args:
+        source: CSV (comma or semicolon) with zip, city, county and state
+                columns; 'county_names_all' may list several counties
+                separated by '|'
+        output: Where to write the binary index
+    """
+    with open(source, 'r', encoding='utf-8-sig', newline='') as file:
+        sample = file.read(4096)
+        file.seek(0)
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        reader = csv.DictReader(file, delimiter=delimiter)
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+
+        names = {}
+        records = set()
+        for row in reader:
+            zip_code = first_column(row, ZIP_COLUMNS)
+            state = first_column(row, STATE_COLUMNS).upper()
+            if not zip_code.isdigit() or len(state) != 2:
+                continue
+            city = first_column(row, CITY_COLUMNS).title()
+            counties = first_column(row, COUNTY_COLUMNS) or ''
+            for county in counties.split('|'):
+                city_index = names.setdefault(city, len(names))
+                county = county.strip()
+                if county.isdigit():
+                    raise ValueError(f"{source} has county FIPS codes ({county}), not names. "
+                                     f"The HUD crosswalk cannot be used; build from a "
+                                     f"file with a county_name column, such as uszips.csv")
+                county_index = names.setdefault(county, len(names))
+                records.add((int(zip_code), city_index, county_index, state.encode('ascii')))
+
+    if len(names) > 0xFFFF:
+        raise ValueError("Too many distinct names for a 16-bit index")
+
+    with open(output, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(records), len(names)))
+        for record in sorted(records):
+            file.write(RECORD.pack(*record))
+        file.write("\n".join(names).encode('utf-8'))
+    print(f"Wrote {len(records)} ZIP records ({len(names)} names) to {output}")
+
+
+def load_zip3_states(path=ZIP3_FILE):
+    """Read zip3_states.csv into a 1000-entry list of state sets"""
+    table = [frozenset()] * 1000
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.DictReader(file, delimiter=';'):
+            states = frozenset(row['states'].split('|'))
+            for prefix in range(int(row['zip3_start']), int(row['zip3_end']) + 1):
+                table[prefix] = states
+    return table
+
+
+class ZipGazetteer:
+    def __init__(self, path=GAZETTEER_FILE, zip3_path=ZIP3_FILE):
+        """
+        Args:
+            path: Built zip_gazetteer.bin (optional; without it only the
+                  state of a ZIP can be checked)
+            zip3_path: Bundled ZIP prefix -> state table
+        """
+        self.zip3_states = load_zip3_states(zip3_path)
+        self.map = None
+        self.count = 0
+        self.names = []
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count, name_count = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a ZIP gazetteer file")
+            names_start = HEADER.size + self.count * RECORD.size
+            self.names = self.map[names_start:].decode('utf-8').split("\n")
+
+    @property
+    def has_counties(self):
+        return self.map is not None
+
+    # bisect needs len() and indexing by position
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from('<I', self.map, HEADER.size + i * RECORD.size)[0]
+
+    def lookup(self, zip_code):
+        """
+        Return [{'city', 'county', 'state'}] for a ZIP ('94577' or '94577-1234')
+
+        Empty if the ZIP is unknown or no gazetteer has been built.
+        """
+        if not self.map:
+            return []
+        number = int(zip_code[:5])
+        places = []
+        i = bisect.bisect_left(self, number)
+        while i < self.count:
+            found, city, county, state = RECORD.unpack_from(self.map, HEADER.size + i * RECORD.size)
+            if found != number:
+                break
+            places.append({'city': self.names[city], 'county': self.names[county],
+                           'state': state.decode('ascii')})
+            i += 1
+        return places
+
+    def states_for(self, zip_code):
+        """States a ZIP can belong to, from its first three digits"""
+        return self.zip3_states[int(zip_code[:3])]
+
+    def check(self, components, state_id=None):
+        """
+        Check a parsed address against the gazetteer
+
+        Args:
+            components: Dict from AddressRecognizer.parse()
+            state_id: State of the site being crawled (default: the
+                      state written in the address)
+
+        Returns (result, place) where place is the gazetteer entry for
+        the ZIP (only 'state' is known without zip_gazetteer.bin) and
+        result is one of 'in_state', 'other_state', 'unknown_zip' or
+        'no_zip'.
+        """
+        zip_code = components.get('zip')
+        if not zip_code:
+            return NO_ZIP, None
+
+        states = self.states_for(zip_code)
+        places = self.lookup(zip_code)
+        if not states or (self.has_counties and not places):
+            return UNKNOWN_ZIP, None
+        if not places:
+            places = [{'state': state} for state in sorted(states)]
+
+        expected = (state_id or components.get('state') or '').upper()
+        if not expected:
+            return IN_STATE, places[0]
+        same_state = [place for place in places if place['state'] == expected]
+        if not same_state:
+            return OTHER_STATE, places[0]
+        place = same_state[0]
+        if len(same_state) > 1:
+            # ZIP crosses county lines: 'Fulton|DeKalb'
+            place = dict(place, county="|".join(p['county'] for p in same_state))
+        return IN_STATE, place
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'build':
+        build_gazetteer(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else GAZETTEER_FILE)
+        sys.exit()
+
+    gazetteer = ZipGazetteer()
+    if not gazetteer.has_counties:
+        print("No zip_gazetteer.bin yet - checking states only.")
+        print("Build it with: python zip_gazetteer.py build uszips.csv\n")
+    samples = [{'zip': '94577', 'state': 'CA'}, {'zip': '10001', 'state': 'NY'},
+               {'zip': '00012'}, {'city': 'Oakland'}]
+    for components in samples:
+        result, place = gazetteer.check(components, 'CA')
+        print(f"{components}: {result} {place or ''}")
+        if place and 'county' in place:
+            print(f"  in Alameda County: {in_community(place, 'Alameda County', 'County')}")
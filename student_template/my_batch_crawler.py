@@ -65,8 +65,18 @@ class MyBatchCrawler:
         - Handle errors gracefully (some sites might be down)
         - Keep track of your results
         """
-        results = []
+        return list(self.iter_multiple_sites(websites, max_sites))
+    
+    def iter_multiple_sites(self, websites, max_sites=3):
+        """
+        Crawl websites one at a time and yield each site's results
         
+        Use this instead of crawl_multiple_sites when you want to look at
+        (or save) results while the crawl is still running:
+        
+            for site_results in batch_crawler.iter_multiple_sites(websites):
+                print(site_results['url'])
+        """
         # TODO: Loop through websites (limit to max_sites for testing)
         for i, site in enumerate(websites[:max_sites]):
             print(f"\n[{i+1}/{min(len(websites), max_sites)}] Crawling {site['county']} County")
@@ -84,9 +94,6 @@ class MyBatchCrawler:
                     'population': site['population']
                 })
                 
-                # TODO: Add the results to your list
-                results.append(site_results)
-                
                 # Show quick summary
                 num_resources = len(site_results.get('resources', []))
                 print(f"✅ Found {num_resources} resources")
@@ -94,21 +101,24 @@ class MyBatchCrawler:
             except Exception as e:
                 print(f"❌ Error crawling {site['county']}: {e}")
                 # TODO: Add error result so we don't lose track
-                results.append({
+                site_results = {
                     'county': site['county'],
                     'department_name': site['department_name'],
                     'url': site['website_url'],
                     'error': str(e),
                     'resources': []
-                })
+                }
+            
+            # Hand the results to the caller before moving on
+            yield site_results
             
             # TODO: Wait between requests (time.sleep)
             # Be polite - don't hammer the servers!
+            # BONUS: ../examples/rate_control.py picks the delay per website
+            # from how fast it answers (and backs off on 429/503 errors)
             if i < min(len(websites), max_sites) - 1:
                 print("Waiting 2 seconds...")
                 time.sleep(2)
-        
-        return results
     
     def save_batch_results(self, results, state_code):
         """
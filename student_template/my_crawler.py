@@ -213,14 +213,18 @@ class MyCategorizedCrawler:
         - Should be reasonable length
         """
         # TODO: Implement address validation logic
-        street_words = ['street', 'st', 'avenue', 'ave', 'road', 'rd', 
-                       'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln']
+        street_words = {'street', 'st', 'avenue', 'ave', 'road', 'rd', 
+                        'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln'}
         
-        text_lower = text.lower()
-        has_number = any(char.isdigit() for char in text)
-        has_street_word = any(word in text_lower for word in street_words)
+        # Compare whole words: 'st' should match "Main St." but not "first"
+        words = re.findall(r'[a-z0-9]+', text.lower())
+        has_number = any(word.isdigit() for word in words)
+        has_street_word = any(word in street_words for word in words)
         is_reasonable_length = 10 < len(text) < 200
         
+        # Hint: for a full parser (city, state, ZIP, PO Box) see
+        # ../examples/address_parser.py
+        
         return has_number and has_street_word and is_reasonable_length
     
     def looks_like_facility_name(self, text):
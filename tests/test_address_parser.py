@@ -0,0 +1,37 @@
+from address_parser import AddressRecognizer, format_address
+
+recognizer = AddressRecognizer()
+
+
+def test_street_address_with_city_state_zip():
+    assert recognizer.parse("1000 San Leandro Blvd, San Leandro, CA 94577") == {
+        'number': '1000', 'street': 'San Leandro', 'suffix': 'Blvd',
+        'city': 'San Leandro', 'state': 'CA', 'zip': '94577'
+    }
+
+
+def test_unit_after_comma_and_particles_in_street_name():
+    address = recognizer.parse("Visit us at 2000 Alameda de las Pulgas, Suite 100, San Mateo, CA 94403")
+    assert address['street'] == 'Alameda de las Pulgas'
+    assert address['unit'] == 'Suite 100'
+    assert (address['city'], address['state'], address['zip']) == ('San Mateo', 'CA', '94403')
+
+
+def test_po_box_with_state_name():
+    address = recognizer.parse("P.O. Box 1234, Sacramento, California 95814")
+    assert address == {'po_box': '1234', 'city': 'Sacramento', 'state': 'CA', 'zip': '95814'}
+
+
+def test_suffix_must_be_a_whole_word_after_a_street_name():
+    assert recognizer.parse("Services for 2024 and beyond: first-aid, street safety") is None
+    assert recognizer.parse("Call Dr. Smith at 555-123-4567") is None
+
+
+def test_street_without_suffix_needs_a_full_last_line():
+    assert recognizer.parse("123 Main, Anytown, CA 94000")['street'] == 'Main'
+    assert recognizer.parse("123 Main, Anytown") is None
+
+
+def test_format_address_round_trip():
+    text = "1000 San Leandro Blvd, San Leandro, CA 94577"
+    assert format_address(recognizer.parse(text)) == text
@@ -0,0 +1,43 @@
+from area_codes import (INVALID, OTHER_STATE, OUTSIDE_US, TOLL_FREE_NUMBER, VALID,
+                        AreaCodeValidator)
+from zip_gazetteer import IN_STATE, NO_ZIP, OTHER_STATE as ZIP_OTHER_STATE, ZipGazetteer
+
+validator = AreaCodeValidator()
+
+
+def test_digits_strips_formatting_and_country_code():
+    assert validator.digits("(510) 267-8000") == '5102678000'
+    assert validator.digits("+1 510.267.8000") == '5102678000'
+    assert validator.digits("267-8000") is None
+
+
+def test_area_code_checks():
+    assert validator.check("510-267-8000", 'CA') == (VALID, 'CA')
+    assert validator.check("510-267-8000", 'NY') == (OTHER_STATE, 'CA')
+    assert validator.check("800-273-8255", 'CA')[0] == TOLL_FREE_NUMBER
+    assert validator.check("416-392-2489", 'CA')[0] == OUTSIDE_US
+
+
+def test_impossible_numbers_are_invalid():
+    # Unassigned area code, exchange starting with 0/1, N11 and 555-01xx
+    assert validator.check("999-267-8000")[0] == INVALID
+    assert validator.check("510-167-8000")[0] == INVALID
+    assert validator.check("510-411-8000")[0] == INVALID
+    assert validator.check("510-555-0100")[0] == INVALID
+
+
+def test_unknown_site_state_is_not_compared():
+    assert validator.check("510-267-8000", 'TEST') == (VALID, 'CA')
+
+
+def test_zip3_states():
+    gazetteer = ZipGazetteer(path="missing.bin")
+    assert gazetteer.states_for("94577") == {'CA'}
+    assert gazetteer.states_for("10001-1234") == {'NY'}
+
+
+def test_zip_check_without_gazetteer_file():
+    gazetteer = ZipGazetteer(path="missing.bin")
+    assert gazetteer.check({'zip': '94577'}, 'CA') == (IN_STATE, {'state': 'CA'})
+    assert gazetteer.check({'zip': '94577'}, 'NV')[0] == ZIP_OTHER_STATE
+    assert gazetteer.check({'city': 'San Leandro'}, 'CA') == (NO_ZIP, None)
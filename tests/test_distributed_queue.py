@@ -0,0 +1,66 @@
+import time
+
+from distributed_crawler import DEFAULT_LEASE_SECONDS, SharedWorkQueue
+
+
+def sites(*urls):
+    return [{'community_id': str(i), 'pha_url': url} for i, url in enumerate(urls, 1)]
+
+
+def test_one_lease_per_host_and_complete(tmp_path):
+    queue = SharedWorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(sites("http://a.gov/", "http://a.gov/health", "http://b.gov/"))
+
+    first = queue.lease("w1")
+    second = queue.lease("w2")
+    assert first[1]['pha_url'] == "http://a.gov/"
+    assert second[1]['pha_url'] == "http://b.gov/"
+    # a.gov is busy until w1 finishes
+    assert queue.lease("w3") is None
+
+    assert not queue.complete("w2", first[0], {}, delay=0)
+    assert queue.complete("w1", first[0], {'url': "http://a.gov/"}, delay=0)
+    assert queue.lease("w3")[1]['pha_url'] == "http://a.gov/health"
+    assert queue.progress() == {'done': 1, 'leased': 2}
+    queue.close()
+
+
+def test_expired_leases_are_requeued_then_failed(tmp_path):
+    queue = SharedWorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.01, max_attempts=2)
+    queue.enqueue(sites("http://a.gov/"))
+
+    item_id, _ = queue.lease("w1")
+    time.sleep(0.02)
+    assert queue.requeue_expired() == 1
+    assert not queue.heartbeat("w1", item_id)
+
+    assert queue.lease("w2")[0] == item_id
+    time.sleep(0.02)
+    queue.requeue_expired()
+    assert queue.progress() == {'failed': 1}
+    queue.close()
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = SharedWorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.05)
+    queue.enqueue(sites("http://a.gov/"))
+    item_id, _ = queue.lease("w1")
+    for _ in range(3):
+        time.sleep(0.03)
+        assert queue.heartbeat("w1", item_id)
+    assert queue.requeue_expired() == 0
+    queue.close()
+
+
+def test_workers_read_the_stored_lease_length(tmp_path):
+    path = str(tmp_path / "queue.db")
+    worker = SharedWorkQueue(path)
+    assert worker.lease_seconds == DEFAULT_LEASE_SECONDS
+
+    coordinator = SharedWorkQueue(path, lease_seconds=30)
+    coordinator.enqueue(sites("http://a.gov/"))
+    worker.lease("w1")
+    assert worker.lease_seconds == 30
+    assert SharedWorkQueue(path).lease_seconds == 30
+    worker.close()
+    coordinator.close()
@@ -0,0 +1,37 @@
+from near_duplicates import BANDS, NearDuplicateIndex, PageFingerprint, hamming
+
+WORDS = ("county public health department clinic hours immunization flu shots dental "
+         "services family planning wic nutrition mental health crisis line appointments "
+         "walk in vaccines children adults seniors").split()
+
+
+def page(seed, length=120):
+    words = [WORDS[(i * 7 + seed) % len(WORDS)] + str(i % 13) for i in range(length)]
+    return "<html><body>" + "".join(f"<p>{' '.join(words[i:i + 10])}</p>"
+                                    for i in range(0, length, 10)) + "</body></html>"
+
+
+def test_bands_split_the_hash_into_bytes():
+    index = NearDuplicateIndex()
+    assert index.bands(0x0102030405060708) == [8, 7, 6, 5, 4, 3, 2, 1]
+    assert len(index.bands(0)) == BANDS
+
+
+def test_edited_copy_is_found_and_other_pages_are_not():
+    index = NearDuplicateIndex()
+    original = page(0)
+    index.add(PageFingerprint(original), "http://a.gov/", 'CA', [])
+
+    edited = PageFingerprint(original.replace("<p>", "<p>updated ", 1))
+    assert hamming(edited.value, PageFingerprint(original).value) <= index.max_distance
+    assert index.find(edited, 'CA')['url'] == "http://a.gov/"
+    assert index.find(edited, 'NV') is None
+    assert index.find(PageFingerprint(page(5)), 'CA') is None
+
+
+def test_short_pages_are_not_indexed():
+    index = NearDuplicateIndex(min_words=80)
+    short = PageFingerprint(page(0, length=40))
+    index.add(short, "http://a.gov/", 'CA', [])
+    assert index.pages == []
+    assert index.find(short, 'CA') is None
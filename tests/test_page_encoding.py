@@ -0,0 +1,28 @@
+import codecs
+
+from page_encoding import decode_html, resolve_charset
+
+
+def test_bom_wins_over_header_and_meta():
+    content = codecs.BOM_UTF8 + b'<meta charset="windows-1252"><p>caf\xc3\xa9</p>'
+    assert resolve_charset(content, 'text/html; charset=iso-8859-1') == ('utf-8-sig', 'bom')
+
+
+def test_header_wins_over_meta():
+    content = b'<meta charset="utf-8"><p>caf\xe9</p>'
+    assert resolve_charset(content, 'text/html; charset=windows-1252') == ('cp1252', 'header')
+
+
+def test_meta_is_used_without_a_header_charset():
+    content = b'<head><meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1">'
+    assert resolve_charset(content, 'text/html') == ('cp1252', 'meta')
+
+
+def test_meta_claiming_utf16_is_ignored():
+    assert resolve_charset(b'<meta charset="utf-16"><p>x</p>') == (None, None)
+
+
+def test_undeclared_pages_try_utf8_then_windows_1252():
+    assert decode_html('café'.encode('utf-8')) == ('café', 'utf-8')
+    text, _ = decode_html(b'<p>\x93quoted\x94 caf\xe9</p>')
+    assert text == '<p>“quoted” café</p>'
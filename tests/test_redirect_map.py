@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from redirect_map import RedirectMap, is_permanent
+
+
+def response(url, history=()):
+    return SimpleNamespace(url=url, history=[SimpleNamespace(url=u, status_code=code)
+                                             for u, code in history])
+
+
+def test_is_permanent():
+    assert is_permanent([301])
+    assert is_permanent(['301', '308'])
+    assert not is_permanent([301, 302])
+    assert not is_permanent([])
+
+
+def test_permanent_redirect_is_recorded_and_resolved():
+    redirects = RedirectMap(filename=None)
+    redirects.record("http://a.gov/", response("https://www.a.gov/", [("http://a.gov/", 301)]))
+    assert redirects.resolve("http://a.gov/") == "https://www.a.gov/"
+    assert redirects.entries["http://a.gov/"]['chain'] == ["http://a.gov/", "https://www.a.gov/"]
+
+
+def test_temporary_redirect_is_not_pinned():
+    redirects = RedirectMap(filename=None)
+    redirects.record("http://a.gov/", response("https://a.gov/login",
+                                               [("http://a.gov/", 301), ("https://a.gov/", 302)]))
+    assert redirects.resolve("http://a.gov/") == "http://a.gov/"
+
+
+def test_url_that_stopped_redirecting_is_forgotten():
+    redirects = RedirectMap(filename=None)
+    redirects.record("http://a.gov/", response("https://a.gov/", [("http://a.gov/", 308)]))
+    redirects.record("http://a.gov/", response("http://a.gov/"))
+    assert "http://a.gov/" not in redirects.entries
+
+
+def test_seed_from_sweep_only_takes_live_permanent_redirects():
+    redirects = RedirectMap(filename=None)
+    rows = [
+        {'pha_url': 'http://a.gov/', 'final_url': 'https://a.gov/', 'status': '200',
+         'error': '', 'redirects': '301'},
+        {'pha_url': 'http://b.gov/', 'final_url': 'https://b.gov/x', 'status': '200',
+         'error': '', 'redirects': '302'},
+        {'pha_url': 'http://c.gov/', 'final_url': 'https://c.gov/', 'status': '404',
+         'error': '', 'redirects': '301'},
+    ]
+    assert redirects.seed_from_sweep(rows) == 1
+    assert list(redirects.entries) == ['http://a.gov/']